@@ -6,7 +6,7 @@ from .main import run_pipeline
 from .embeddings import get_embeddings_for_docs
 from .ingestion import discover_and_chunk_docs, build_or_update_index
 from .drift import detect_drift
-from .rag import query_index
+from .rag import query_index, stream_query_index, aquery_index
 from .utils import hash_file, batch_items
 
 __all__ = [
@@ -16,6 +16,8 @@ __all__ = [
     "build_or_update_index",
     "detect_drift",
     "query_index",
+    "stream_query_index",
+    "aquery_index",
     "hash_file",
     "batch_items"
 ]
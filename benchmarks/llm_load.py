@@ -0,0 +1,192 @@
+# benchmarks/llm_load.py
+"""
+Load-test the LLM client and embedding router against the local fake GenAI backend.
+
+Sends synthetic documentation prompts through LLMClient (thread pool),
+AsyncLLMClient (one event loop) and the embedding router, with the fake
+backend (llm/fake_genai.py) enforcing server-side RPM/TPM limits, sampling
+latencies and injecting 429/503 errors. Reports throughput, latency
+percentiles, retries and how much of the TPM limit was used, so changes to
+throttling, retries or concurrency can be compared without the live API.
+
+Injected errors are retried with LLMClient's real backoff (10s, 30s, 60s).
+When the client limits do not exceed the server's, the client limiter must
+keep every request within them: a limit 429 from the fake server fails the
+run (exit status 1).
+
+Usage:
+    python packages/knowledge/benchmarks/llm_load.py [--scenario all] [--requests 100] [--workers 8]
+        [--rpm 600] [--tpm 1000000] [--latency 0.5] [--error-503 0.0] [--client-rpm N] [--client-tpm N]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PACKAGE_ROOT) not in sys.path:
+    sys.path.insert(0, str(PACKAGE_ROOT))
+
+# Isolate the run: fake key (own limiter state), no response cache, scratch limiter directory
+os.environ["GOOGLE_API_KEY"] = "fake-load-test"
+os.environ["GLASSOPS_LLM_CACHE"] = "off"
+os.environ["GLASSOPS_RATE_LIMIT_DIR"] = tempfile.mkdtemp(prefix="glassops-load-")
+
+from knowledge.embeddings.router_embedding import get_embeddings_for_docs
+from knowledge.llm import AsyncLLMClient, LLMClient, RateLimiter
+from knowledge.llm.fake_genai import install_fake_backend
+
+MODEL = "gemma-3-27b-it"
+CODE = "def handle_{n}(request, config):\n    value = config.get('{n}', 0)\n    return process(request, value * {n})\n"
+PROSE = "The service {n} reads its configuration and forwards each request to the processing pipeline. "
+
+
+def build_prompts(count: int, seed: int):
+    """Synthetic documentation prompts of varying size and code/prose mix."""
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(count):
+        body = "".join(
+            (CODE if rng.random() < 0.7 else PROSE).format(n=i * 100 + j) for j in range(rng.randint(5, 60))
+        )
+        prompts.append(f"Document the following source file.\n\n```\n{body}```\n")
+    return prompts
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def make_client(cls, limiter):
+    llm = cls(model=MODEL)
+    llm.rate_limiter = limiter
+    return llm
+
+
+def run_sync(args, prompts, limiter):
+    llm = make_client(LLMClient, limiter)
+    latencies = []
+
+    def one(prompt):
+        start = time.perf_counter()
+        text = llm.generate(prompt, max_output_tokens=args.max_output_tokens)
+        latencies.append(time.perf_counter() - start)
+        return text
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(one, prompts))
+    return results, latencies, time.perf_counter() - start, llm.requests_sent
+
+
+def run_async(args, prompts, limiter):
+    llm = make_client(AsyncLLMClient, limiter)
+    latencies = []
+
+    async def main():
+        semaphore = asyncio.Semaphore(args.workers)
+
+        async def one(prompt):
+            async with semaphore:
+                start = time.perf_counter()
+                text = await llm.agenerate(prompt, max_output_tokens=args.max_output_tokens)
+                latencies.append(time.perf_counter() - start)
+                return text
+
+        return await asyncio.gather(*(one(p) for p in prompts))
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    return results, latencies, time.perf_counter() - start, llm.requests_sent
+
+
+def run_embed(args, prompts, limiter):
+    docs = [{"content": p} for p in prompts]
+    start = time.perf_counter()
+    results = get_embeddings_for_docs(docs, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    return [vector for _, vector in results], [], elapsed, None
+
+
+def report(name, backend, before, results, latencies, elapsed, attempts, tpm):
+    stats = backend.stats()
+    delta = {key: stats[key] - before[key] for key in stats}
+    ok = sum(1 for r in results if r)
+    print(f"[RESULT] {name}: {ok}/{len(results)} succeeded in {elapsed:.1f}s ({len(results) / elapsed:.1f}/s)")
+    if latencies:
+        print(f"   latency p50 {percentile(latencies, 0.5):.2f}s  p95 {percentile(latencies, 0.95):.2f}s  "
+              f"max {max(latencies):.2f}s  mean {statistics.mean(latencies):.2f}s")
+    if attempts is not None:
+        print(f"   client attempts {attempts} (retries {attempts - len(results)})")
+    print(f"   server requests {delta['requests']}, rejected by limits {delta['rejected_429']}, "
+          f"injected 429 {delta['injected_429']}, injected 503 {delta['injected_503']}")
+    if tpm:
+        # Limits are per sliding minute, so a shorter run still had one minute's budget
+        window = max(elapsed, 60.0)
+        used = delta["prompt_tokens"] / (tpm * window / 60)
+        print(f"   input tokens {delta['prompt_tokens']:,} ({used:.0%} of the TPM budget over {window:.0f}s)")
+    return delta
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test LLM calls against the local fake GenAI backend")
+    parser.add_argument("--scenario", choices=["sync", "async", "embed", "all"], default="all")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="Threads (sync) or in-flight requests (async)")
+    parser.add_argument("--batch-size", type=int, default=10, help="Embedding batch size")
+    parser.add_argument("--max-output-tokens", type=int, default=1024)
+    parser.add_argument("--rpm", type=int, default=600, help="Fake server requests per minute")
+    parser.add_argument("--tpm", type=int, default=1000000, help="Fake server input tokens per minute")
+    parser.add_argument("--client-rpm", type=int, default=None, help="Client limiter RPM (default: --rpm)")
+    parser.add_argument("--client-tpm", type=int, default=None, help="Client limiter TPM (default: --tpm)")
+    parser.add_argument("--latency", type=float, default=0.5, help="Median seconds to first token (lognormal)")
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--output-tokens", type=int, default=400, help="Median output tokens (lognormal)")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Injected 429 rate")
+    parser.add_argument("--error-503", type=float, default=0.0, help="Injected 503 rate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = install_fake_backend({
+        "seed": args.seed,
+        "latency": {"distribution": "lognormal", "median": args.latency, "sigma": args.latency_sigma},
+        "output_tokens": {"distribution": "lognormal", "median": args.output_tokens, "sigma": 0.5},
+        "errors": {"429": args.error_429, "503": args.error_503},
+        "limits": {"default": {"rpm": args.rpm, "tpm": args.tpm, "rpd": None}},
+    })
+    prompts = build_prompts(args.requests, args.seed)
+    print(f"[INFO] {len(prompts)} prompts, fake server {args.rpm} RPM / {args.tpm:,} TPM, "
+          f"median latency {args.latency}s, errors 429={args.error_429} 503={args.error_503}")
+
+    # Client-side limiter under test (defaults to the fake server's limits). Scenarios share it, as
+    # all clients of a process do, since the server's window carries over from one scenario to the next.
+    limiter = RateLimiter(args.client_rpm or args.rpm, args.client_tpm or args.tpm)
+    # Within the server's limits the client limiter alone must prevent limit 429s
+    client_within_limits = (args.client_rpm or args.rpm) <= args.rpm and (args.client_tpm or args.tpm) <= args.tpm
+    failed = []
+    scenarios = {"sync": run_sync, "async": run_async, "embed": run_embed}
+    for name, run in scenarios.items():
+        if args.scenario not in (name, "all"):
+            continue
+        before = backend.stats()
+        results, latencies, elapsed, attempts = run(args, prompts, limiter)
+        # Embeddings use their own model's limits (unlimited TPM by default) and no client limiter
+        limited = name != "embed"
+        delta = report(name, backend, before, results, latencies, elapsed, attempts, args.tpm if limited else None)
+        if limited and client_within_limits and delta["rejected_429"]:
+            failed.append(name)
+    if failed:
+        print(f"[ERROR] The client limiter let requests exceed the server limits in: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
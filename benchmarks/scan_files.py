@@ -0,0 +1,129 @@
+# benchmarks/scan_files.py
+"""
+Benchmark Generator.scan_files against the previous glob-per-pattern scan.
+
+Builds a synthetic monorepo in a temporary directory: a few packages with
+source files, each with a large node_modules tree, then times both scanners
+with the default --generate patterns and checks they return the same files.
+
+Usage:
+    python packages/knowledge/benchmarks/scan_files.py [--packages 10] [--node-modules-files 20000]
+"""
+
+import argparse
+import glob
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent.parent
+if str(PACKAGE_ROOT) not in sys.path:
+    sys.path.insert(0, str(PACKAGE_ROOT))
+
+from knowledge.generation import Generator
+
+PATTERNS = [
+    "packages/**/*.go",
+    "packages/**/*.py",
+    "packages/**/*.ts",
+    "packages/**/*.js",
+    "packages/**/*.mjs",
+    "packages/**/*.tsx",
+    "packages/**/*.jsx",
+    "packages/**/*.yml",
+    "packages/**/*.yaml",
+    "packages/**/*.json",
+    "packages/**/*.tf",
+    "packages/**/*.cls",
+    "packages/**/*.trigger",
+    "packages/**/Dockerfile",
+    "!**/node_modules/**",
+    "!**/dist/**",
+    "!**/venv/**",
+    "!**/__pycache__/**",
+]
+
+
+def build_tree(root: Path, packages: int, node_modules_files: int) -> None:
+    """Create packages/<n>/src sources plus a node_modules tree per package."""
+    per_package = max(1, node_modules_files // packages)
+    for p in range(packages):
+        pkg = root / "packages" / f"pkg{p}"
+        for sub in ("src", "src/lib", "config"):
+            (pkg / sub).mkdir(parents=True, exist_ok=True)
+        for i in range(20):
+            (pkg / "src" / f"mod{i}.ts").write_text("export const x = 1;\n")
+            (pkg / "src" / "lib" / f"util{i}.py").write_text("x = 1\n")
+        (pkg / "config" / "settings.json").write_text("{}\n")
+        (pkg / "Dockerfile").write_text("FROM scratch\n")
+
+        for i in range(per_package):
+            module = pkg / "node_modules" / f"dep{i // 50}" / "lib"
+            if i % 50 == 0:
+                module.mkdir(parents=True, exist_ok=True)
+            (module / f"file{i % 50}.js").write_text("module.exports = {};\n")
+    (root / ".gitignore").write_text("dist/\n")
+
+
+def legacy_ignored(generator: Generator, path: Path) -> bool:
+    """The previous per-file ignore check: ignored directory names, then the root .gitignore."""
+    if any(ignored in path.parts for ignored in generator.IGNORED_DIRS):
+        return True
+    if generator.gitignore_spec:
+        try:
+            return generator.gitignore_spec.match_file(path.relative_to(generator.root_dir).as_posix())
+        except ValueError:
+            pass
+    return False
+
+
+def legacy_scan(generator: Generator, patterns):
+    """The previous implementation: one glob per include and per exclusion."""
+    matched = set()
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            continue
+        for match in glob.glob(str(generator.root_dir / pattern), recursive=True):
+            path = Path(match)
+            if path.is_file() and not legacy_ignored(generator, path):
+                matched.add(path)
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            for match in glob.glob(str(generator.root_dir / pattern[1:]), recursive=True):
+                matched.discard(Path(match))
+    return sorted(matched)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark Generator.scan_files")
+    parser.add_argument("--packages", type=int, default=10)
+    parser.add_argument("--node-modules-files", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        print(f"[INFO] Building tree: {args.packages} packages, {args.node_modules_files} node_modules files")
+        build_tree(root, args.packages, args.node_modules_files)
+
+        generator = Generator(str(root))
+        legacy, legacy_time = timed(legacy_scan, generator, PATTERNS)
+        current, current_time = timed(generator.scan_files, PATTERNS)
+
+        if legacy != current:
+            print(f"[ERROR] Results differ: legacy {len(legacy)} files, scan_files {len(current)} files")
+            sys.exit(1)
+
+        print(f"[RESULT] {len(current)} files matched")
+        print(f"   legacy glob scan: {legacy_time * 1000:8.1f} ms")
+        print(f"   scan_files:       {current_time * 1000:8.1f} ms  ({legacy_time / current_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,7 @@
 # Expose drift detection API
 
 from .detect_drift import detect_drift
+from .history import DriftHistory
+from .near_duplicates import find_near_duplicates
 
-__all__ = ["detect_drift"]
+__all__ = ["detect_drift", "DriftHistory", "find_near_duplicates"]
@@ -1,37 +1,162 @@
 # detect-drift.py
 # Compares new embeddings with old snapshots to detect drift
 
+import hashlib
+
 import numpy as np
 import os
 
+from .history import DriftHistory
+from .near_duplicates import find_near_duplicates
+
+DEFAULT_REPORT_PATH = os.path.join(os.path.dirname(__file__), "..", "docs", "generated", "drift_report.md")
+# Report sections are capped so the query-time injection of drift_report.md
+# stays small; full detail lives in the drift history store.
+MAX_REPORTED_ITEMS = 50
+TOP_MOVER_RUNS = 5
+TREND_RUNS = 10
+
+def default_snapshot_path():
+    return os.path.join(os.getcwd(), "glassops_index", "drift_snapshot.npz")
+
+def chunk_hash(doc):
+    """
+    Hash of a chunk's own text. doc["hash"] can be shared by every chunk of a generated
+    doc (its front matter carries the source file's hash), so the content is hashed when present.
+    """
+    content = doc.get("content")
+    if content is None:
+        return doc["hash"]
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
 def cosine_similarity(a, b):
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
-def detect_drift(embeddings, threshold=0.85):
+def normalize_rows(vectors):
+    """
+    vectors: sequence of equal-length embedding vectors
+    returns: float32 matrix (n, dim) with unit-length rows, so a row-wise dot product is the cosine
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.maximum(norms, 1e-12, out=norms)
+    matrix /= norms
+    return matrix
+
+def load_snapshot(snapshot_path):
+    """returns: (ids, hashes, matrix) from a previous run, or None if there is no usable snapshot"""
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        with np.load(snapshot_path, allow_pickle=False) as data:
+            return data["ids"], data["hashes"], data["vectors"]
+    except Exception as e:
+        print(f"[WARNING] Could not read drift snapshot {snapshot_path}: {e}")
+        return None
+
+def save_snapshot(snapshot_path, ids, hashes, matrix):
+    """Write the snapshot atomically so a crash never leaves a truncated file behind."""
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, ids=np.asarray(ids, dtype=str), hashes=np.asarray(hashes, dtype=str), vectors=matrix)
+    os.replace(tmp_path, snapshot_path)
+
+def membership_changes(ids, snapshot):
+    """returns: (added_ids, removed_ids) relative to the previous snapshot"""
+    prev_ids = snapshot[0]
+    cur_ids = np.asarray(ids, dtype=str)
+    added = np.setdiff1d(cur_ids, prev_ids, assume_unique=True)
+    removed = np.setdiff1d(prev_ids, cur_ids, assume_unique=True)
+    return added.tolist(), removed.tolist()
+
+def compare_to_snapshot(ids, hashes, matrix, snapshot):
+    """
+    Vectorized comparison of the current run against the previous snapshot.
+    Only chunks present in both runs whose content hash changed are compared;
+    an unchanged hash means unchanged text and therefore no drift.
+    returns: list of (chunk_id, similarity) for every compared chunk
+    """
+    prev_ids, prev_hashes, prev_matrix = snapshot
+    if prev_matrix.shape[1:] != matrix.shape[1:]:
+        print(f"[WARNING] Embedding dimension changed ({prev_matrix.shape[1]} -> {matrix.shape[1]}); skipping drift comparison.")
+        return []
+
+    # Align both runs by chunk id without a Python-level loop
+    _, cur_rows, prev_rows = np.intersect1d(
+        np.asarray(ids, dtype=str), prev_ids, return_indices=True
+    )
+    changed = np.asarray(hashes, dtype=str)[cur_rows] != prev_hashes[prev_rows]
+    cur_rows = cur_rows[changed]
+    prev_rows = prev_rows[changed]
+    if cur_rows.size == 0:
+        return []
+
+    # Row-wise dot product of unit vectors == cosine similarity, in one pass
+    sims = np.einsum("ij,ij->i", matrix[cur_rows], prev_matrix[prev_rows])
+    return [(ids[i], float(s)) for i, s in zip(cur_rows.tolist(), sims.tolist())]
+
+def detect_drift(embeddings, threshold=0.85, snapshot_path=None, report_path=None,
+                 duplicate_threshold=0.95, history_path=None):
     """
     embeddings: list of tuples (doc_dict, embedding_vector)
     returns: list of doc paths that drifted
+    Compares each chunk against the embedding snapshot saved by the previous run and
+    reports chunks whose cosine similarity fell below `threshold`. The snapshot is then
+    replaced with the current run. Near-duplicate clusters (similarity >= `duplicate_threshold`)
+    are found with LSH and listed in the report. Each run is appended to the drift history
+    (by default next to the snapshot), from which the report's trend sections are read.
     """
-    # TODO: load real previous embeddings snapshot for actual drift detection
-    # For now, we simulate "conflicts" or "drift" by checking if any documents have very similar content (duplicates/redundancy)
-    # or just saving a state report.
-    
-    # Let's pivot: "Conflict/Drift Report"
     # To make the RAG "aware", we write a markdown file summarizing the current state/changes.
-    
-    report_path = os.path.join(os.path.dirname(__file__), "..", "docs", "generated", "drift_report.md")
+    report_path = report_path or DEFAULT_REPORT_PATH
+    snapshot_path = snapshot_path or default_snapshot_path()
+    history_path = history_path or os.path.join(os.path.dirname(snapshot_path), "drift_history.sqlite")
     os.makedirs(os.path.dirname(report_path), exist_ok=True)
-    
-    drifted = []
-    # Real drift logic would go here.
-    # For the sake of the user request "conflicting documentation", 
-    # let's audit for "Near Duplicate Documents" which implies conflict/redundancy.
-    
+
+    ids = [doc["path"] for doc, _ in embeddings]
+    # Per-chunk content hashes: an edited chunk body must be compared even if the source hash did not change
+    hashes = [chunk_hash(doc) for doc, _ in embeddings]
+
+    compared = []
+    added = []
+    removed = []
+    clusters = []
+    if embeddings:
+        matrix = normalize_rows([emb for _, emb in embeddings])
+        snapshot = load_snapshot(snapshot_path)
+        if snapshot is not None:
+            compared = compare_to_snapshot(ids, hashes, matrix, snapshot)
+            added, removed = membership_changes(ids, snapshot)
+        save_snapshot(snapshot_path, ids, hashes, matrix)
+
+        # Identical chunks are reported below; cluster one representative per chunk text
+        _, first_rows = np.unique(np.asarray(hashes, dtype=str), return_index=True)
+        first_rows.sort()
+        clusters = find_near_duplicates(
+            [ids[i] for i in first_rows],
+            [embeddings[i][0].get("content", "") for i in first_rows],
+            matrix[first_rows],
+            threshold=duplicate_threshold,
+        )
+
+    drifted = [chunk_id for chunk_id, sim in sorted(compared, key=lambda p: p[1]) if sim < threshold]
+
+    history = DriftHistory(history_path)
+    try:
+        run_id = history.record_run(threshold, len(ids), compared, added, removed)
+        drifted_rows = history.drifted_in_run(run_id, threshold, limit=MAX_REPORTED_ITEMS)
+        movers = history.top_movers(runs=TOP_MOVER_RUNS, limit=MAX_REPORTED_ITEMS // 2)
+        runs = history.recent_runs(limit=TREND_RUNS)
+    finally:
+        history.close()
+
+    # Let's audit for "Near Duplicate Documents" which implies conflict/redundancy.
     potential_conflicts = []
     seen_hashes = {}
-    
-    for (doc, emb) in embeddings:
-        h = doc["hash"]
+
+    for (doc, emb), h in zip(embeddings, hashes):
         if h in seen_hashes:
             potential_conflicts.append((doc["path"], seen_hashes[h]))
         else:
@@ -40,15 +165,48 @@ def detect_drift(embeddings, threshold=0.85):
     with open(report_path, "w", encoding="utf-8") as f:
         f.write("# Knowledge Base Health Report\n\n")
         f.write(f"**Generated:** {os.path.basename(__file__)}\n\n")
-        
+
         if potential_conflicts:
             f.write("## Conflicting / Duplicate Documentation Detected\n\n")
             f.write("The following documents have identical content:\n\n")
-            for path_a, path_b in potential_conflicts:
+            for path_a, path_b in potential_conflicts[:MAX_REPORTED_ITEMS]:
                 f.write(f"- `{path_a}` is identical to `{path_b}`\n")
+            if len(potential_conflicts) > MAX_REPORTED_ITEMS:
+                f.write(f"\n...and {len(potential_conflicts) - MAX_REPORTED_ITEMS} more.\n")
         else:
             f.write("## No Content Conflicts Detected\n\nAll indexed documents appear unique.\n")
-            
-        f.write("\n## Drift Status\n\nNo significant semantic drift detected in this run.\n")
+
+        if clusters:
+            f.write("\n## Near-Duplicate Clusters\n\n")
+            f.write(f"The following groups of chunks are nearly identical (cosine similarity >= {duplicate_threshold}):\n\n")
+            for n, (members, min_sim) in enumerate(clusters[:MAX_REPORTED_ITEMS], 1):
+                f.write(f"{n}. (min similarity {min_sim:.3f}) " + ", ".join(f"`{m}`" for m in members) + "\n")
+            if len(clusters) > MAX_REPORTED_ITEMS:
+                f.write(f"\n...and {len(clusters) - MAX_REPORTED_ITEMS} more clusters.\n")
+
+        f.write("\n## Drift Status\n\n")
+        f.write(f"Changed since last run: {len(compared)} changed, {len(added)} added, {len(removed)} removed.\n\n")
+        if drifted:
+            f.write(f"The following chunks changed meaning since the previous run (cosine similarity below {threshold}):\n\n")
+            for chunk_id, sim, first_run, first_seen in drifted_rows:
+                since = "new this run" if first_run == run_id else f"drifting since {first_seen}"
+                f.write(f"- `{chunk_id}` (similarity {sim:.3f}, {since})\n")
+            if len(drifted) > len(drifted_rows):
+                f.write(f"\n...and {len(drifted) - len(drifted_rows)} more.\n")
+        else:
+            f.write("No significant semantic drift detected in this run.\n")
+
+        if movers:
+            f.write(f"\n## Top Movers (last {TOP_MOVER_RUNS} runs)\n\n")
+            for chunk_id, times_changed, lowest in movers:
+                f.write(f"- `{chunk_id}` changed {times_changed}x, lowest similarity {lowest:.3f}\n")
+
+        if len(runs) > 1:
+            f.write("\n## Change Rate\n\n")
+            f.write("| Run | Date | Chunks | Changed | Drifted | Added | Removed |\n")
+            f.write("|-----|------|--------|---------|---------|-------|---------|\n")
+            for r in runs:
+                f.write(f"| {r['id']} | {r['created_at']} | {r['chunk_count']} | {r['changed']} | "
+                        f"{r['drifted']} | {r['added']} | {r['removed']} |\n")
 
     return drifted
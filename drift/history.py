@@ -0,0 +1,116 @@
+# history.py
+# Append-only drift history in SQLite. Each run stores only the chunks that were
+# added, changed or removed (unchanged chunks are implicitly similarity 1.0), so
+# the store grows with the rate of change rather than with the corpus size.
+
+import os
+import sqlite3
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    changed INTEGER NOT NULL,
+    drifted INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunk_changes (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    chunk_id TEXT NOT NULL,
+    status TEXT NOT NULL,          -- added | changed | removed
+    similarity REAL                -- NULL unless status = changed
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_changes_run ON chunk_changes(run_id);
+CREATE INDEX IF NOT EXISTS idx_chunk_changes_chunk ON chunk_changes(chunk_id);
+"""
+
+
+class DriftHistory:
+    """Append-only per-run drift store with the queries the incremental report needs."""
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, threshold, chunk_count, changed, added, removed):
+        """
+        changed: list of (chunk_id, similarity)
+        added / removed: lists of chunk ids
+        returns: the new run id
+        """
+        drifted = sum(1 for _, sim in changed if sim < threshold)
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (created_at, threshold, chunk_count, changed, drifted, added, removed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), threshold, chunk_count,
+                 len(changed), drifted, len(added), len(removed)),
+            )
+            run_id = cur.lastrowid
+            self.conn.executemany(
+                "INSERT INTO chunk_changes (run_id, chunk_id, status, similarity) VALUES (?, ?, ?, ?)",
+                [(run_id, c, "changed", s) for c, s in changed]
+                + [(run_id, c, "added", None) for c in added]
+                + [(run_id, c, "removed", None) for c in removed],
+            )
+        return run_id
+
+    def recent_runs(self, limit=10):
+        """returns: list of run rows (dicts), newest first"""
+        rows = self.conn.execute(
+            "SELECT id, created_at, threshold, chunk_count, changed, drifted, added, removed "
+            "FROM runs ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+        keys = ("id", "created_at", "threshold", "chunk_count", "changed", "drifted", "added", "removed")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def drifted_in_run(self, run_id, threshold, limit=50):
+        """
+        returns: list of (chunk_id, similarity, first_run_id, first_seen_at) for chunks that
+        drifted in `run_id`, lowest similarity first. first_* is the earliest run in which the
+        chunk fell below the threshold (i.e. when it started drifting).
+        """
+        return self.conn.execute(
+            """
+            SELECT c.chunk_id, c.similarity, f.first_run, r.created_at
+            FROM chunk_changes c
+            JOIN (
+                SELECT chunk_id, MIN(run_id) AS first_run FROM chunk_changes
+                WHERE status = 'changed' AND similarity < ?
+                  AND chunk_id IN (SELECT chunk_id FROM chunk_changes WHERE run_id = ?)
+                GROUP BY chunk_id
+            ) f ON f.chunk_id = c.chunk_id
+            JOIN runs r ON r.id = f.first_run
+            WHERE c.run_id = ? AND c.status = 'changed' AND c.similarity < ?
+            ORDER BY c.similarity ASC
+            LIMIT ?
+            """,
+            (threshold, run_id, run_id, threshold, limit),
+        ).fetchall()
+
+    def top_movers(self, runs=5, limit=20):
+        """
+        returns: list of (chunk_id, times_changed, lowest_similarity) over the last `runs` runs,
+        most frequently changed (then most drifted) first
+        """
+        return self.conn.execute(
+            """
+            SELECT chunk_id, COUNT(*) AS times_changed, MIN(similarity) AS lowest
+            FROM chunk_changes
+            WHERE status = 'changed'
+              AND run_id > COALESCE((SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?), 0)
+            GROUP BY chunk_id
+            ORDER BY times_changed DESC, lowest ASC
+            LIMIT ?
+            """,
+            (runs, limit),
+        ).fetchall()
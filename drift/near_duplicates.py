@@ -0,0 +1,201 @@
+# near_duplicates.py
+# Finds near-duplicate chunks in roughly linear time with locality-sensitive hashing:
+# - SimHash over normalized text catches copies differing by whitespace, dates, numbers
+# - Random-hyperplane LSH over embeddings catches paraphrased copies
+# Candidate pairs from both are verified with exact cosine similarity.
+
+import math
+
+import numpy as np
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4          # 4 x 16-bit bands: catches Hamming distance <= 3
+SIMHASH_BLOCK = 2000       # documents whose token votes are summed at once
+
+# Hyperplane bits per band grow with log2(n) so random collisions stay rare;
+# the band count is then chosen to reach TARGET_RECALL at the similarity threshold.
+MIN_HYPERPLANE_ROWS = 8
+MAX_HYPERPLANE_ROWS = 24
+MAX_HYPERPLANE_BANDS = 64
+TARGET_RECALL = 0.99
+
+PROJECTION_BLOCK = 20000   # rows projected at once (bounds memory at 300k+ chunks)
+VERIFY_BLOCK = 50000       # candidate pairs verified at once (2 x 50k x dim floats)
+
+# Buckets larger than this are linked as a star (first member to all others)
+# instead of all pairs, so one crowded bucket cannot go quadratic.
+MAX_ALL_PAIRS_BUCKET = 16
+
+_DIGITS_TO_ZERO = str.maketrans("123456789", "000000000")
+
+
+def _tokens(text):
+    """Lowercase whitespace tokens with digits zeroed, so dates/versions/spacing do not matter."""
+    return text.lower().translate(_DIGITS_TO_ZERO).split()
+
+
+def simhash_signatures(texts):
+    """
+    texts: list of strings
+    returns: uint64 array of 64-bit SimHash signatures (one per text)
+    Token hashes use Python's built-in (per-process salted) string hash: it runs at C
+    speed, and signatures only need to be consistent within a single run.
+    """
+    signatures = np.zeros(len(texts), dtype=np.uint64)
+
+    for start in range(0, len(texts), SIMHASH_BLOCK):
+        block = [_tokens(t) for t in texts[start:start + SIMHASH_BLOCK]]
+        lengths = np.fromiter((len(toks) for toks in block), dtype=np.int64, count=len(block))
+        nonempty = np.flatnonzero(lengths)
+        if nonempty.size == 0:
+            continue
+
+        hashes = np.fromiter(
+            (hash(tok) for toks in block for tok in toks), dtype=np.int64, count=int(lengths.sum())
+        )
+        # (tokens, 64) matrix of hash bits, then per-document bit counts
+        bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1)
+        offsets = (np.cumsum(lengths) - lengths)[nonempty]
+        ones = np.add.reduceat(bits, offsets, axis=0, dtype=np.int32)
+        majority = (2 * ones > lengths[nonempty, None])
+        signatures[start + nonempty] = np.packbits(majority, axis=1).view(np.uint64).ravel()
+
+    return signatures
+
+
+def _bucket_pairs(keys):
+    """
+    keys: int array, one bucket key per item
+    returns: (m, 2) int array of candidate pairs (i < j) sharing a bucket
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(keys)]))
+
+    sizes = ends - starts
+    # Most collisions are pairs; handle those without a Python-level loop
+    pairs = [np.stack((order[starts[sizes == 2]], order[starts[sizes == 2] + 1]), axis=1)]
+    for start, end in zip(starts[sizes > 2], ends[sizes > 2]):
+        members = order[start:end]
+        if len(members) <= MAX_ALL_PAIRS_BUCKET:
+            i, j = np.triu_indices(len(members), k=1)
+            pairs.append(np.stack((members[i], members[j]), axis=1))
+        else:
+            pairs.append(np.stack((np.full(len(members) - 1, members[0]), members[1:]), axis=1))
+
+    return np.concatenate(pairs)
+
+
+def text_candidate_pairs(signatures, bands=SIMHASH_BANDS):
+    """Candidate pairs whose SimHash signatures agree exactly on at least one band."""
+    width = SIMHASH_BITS // bands
+    mask = np.uint64((1 << width) - 1)
+    pairs = [
+        _bucket_pairs(((signatures >> np.uint64(b * width)) & mask).astype(np.int64))
+        for b in range(bands)
+    ]
+    return np.concatenate(pairs)
+
+
+def hyperplane_parameters(n, threshold):
+    """
+    returns: (bands, rows) for random-hyperplane LSH over n vectors.
+    A pair at cosine `threshold` agrees on one hyperplane with probability
+    1 - angle/pi, so it shares a band with probability p**rows.
+    """
+    rows = min(MAX_HYPERPLANE_ROWS, max(MIN_HYPERPLANE_ROWS, math.ceil(math.log2(max(n, 2))) + 2))
+    p_band = (1.0 - math.acos(min(max(threshold, -1.0), 1.0)) / math.pi) ** rows
+    if p_band >= 1.0:
+        return 1, rows
+    bands = math.ceil(math.log(1.0 - TARGET_RECALL) / math.log(1.0 - p_band))
+    return min(MAX_HYPERPLANE_BANDS, max(1, bands)), rows
+
+
+def embedding_candidate_pairs(matrix, threshold=0.95, seed=0):
+    """
+    Random-hyperplane LSH on (unit-normalized) embeddings.
+    Vectors are mean-centered before hashing: embedding spaces are anisotropic
+    (all-positive mock vectors are the extreme case), and without centering
+    most pairs would land in the same buckets.
+    """
+    n, dim = matrix.shape
+    bands, rows = hyperplane_parameters(n, threshold)
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((dim, bands * rows)).astype(np.float32)
+    mean = matrix.mean(axis=0, dtype=np.float64).astype(np.float32)
+    weights = (1 << np.arange(rows)).astype(np.int64)
+
+    keys = np.empty((n, bands), dtype=np.int64)
+    for start in range(0, n, PROJECTION_BLOCK):
+        block = (matrix[start:start + PROJECTION_BLOCK] - mean) @ planes
+        bits = (block > 0).reshape(-1, bands, rows).astype(np.int64)
+        keys[start:start + PROJECTION_BLOCK] = bits @ weights
+
+    pairs = [_bucket_pairs(keys[:, b]) for b in range(bands)]
+    return np.concatenate(pairs)
+
+
+def _clusters_from_pairs(n, pairs, sims):
+    """Union-find over verified pairs. returns: list of (index list, min pair similarity)"""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    members = {}
+    min_sims = {}
+    for (i, j), s in zip(pairs, sims):
+        root = find(i)
+        members.setdefault(root, set()).update((i, j))
+        min_sims[root] = min(min_sims.get(root, 1.0), s)
+    return [(sorted(members[root]), min_sims[root]) for root in members]
+
+
+def find_near_duplicates(ids, texts, matrix, threshold=0.95):
+    """
+    ids: chunk ids
+    texts: chunk contents (same order)
+    matrix: unit-normalized float32 embeddings (same order), see detect_drift.normalize_rows
+    returns: list of (cluster_ids, min_similarity), largest clusters first
+    """
+    n = len(ids)
+    if n < 2:
+        return []
+
+    candidates = np.concatenate((
+        text_candidate_pairs(simhash_signatures(texts)),
+        embedding_candidate_pairs(matrix, threshold),
+    ))
+    if candidates.size == 0:
+        return []
+
+    # Normalize to i < j and dedupe across bands / methods
+    candidates = np.unique(np.sort(candidates, axis=1), axis=0)
+
+    # Exact verification, vectorized over blocks of candidate pairs
+    sims = np.empty(len(candidates), dtype=np.float32)
+    for start in range(0, len(candidates), VERIFY_BLOCK):
+        block = candidates[start:start + VERIFY_BLOCK]
+        sims[start:start + VERIFY_BLOCK] = np.einsum("ij,ij->i", matrix[block[:, 0]], matrix[block[:, 1]])
+    keep = sims >= threshold
+    verified = candidates[keep]
+    verified_sims = sims[keep]
+    if verified.size == 0:
+        return []
+
+    clusters = [
+        ([ids[m] for m in members], min_sim)
+        for members, min_sim in _clusters_from_pairs(n, verified.tolist(), verified_sims.tolist())
+    ]
+    clusters.sort(key=lambda c: (-len(c[0]), c[0]))
+    return clusters
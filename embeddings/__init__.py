@@ -3,10 +3,11 @@
 
 from .gemini_embedding import GeminiEmbedding
 from .gemma_12b_it_embedding import Gemma12bItEmbedding
-from .router_embedding import get_embeddings_for_docs
+from .router_embedding import get_embeddings_for_docs, aget_embeddings_for_docs
 
 __all__ = [
     "GeminiEmbedding",
     "Gemma12bItEmbedding",
-    "get_embeddings_for_docs"
+    "get_embeddings_for_docs",
+    "aget_embeddings_for_docs"
 ]
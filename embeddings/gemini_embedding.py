@@ -11,25 +11,33 @@ try:
 except ImportError:
     genai = None
 
+from knowledge.llm.fake_genai import active_fake_backend
+
+DEFAULT_MODEL = "models/text-embedding-004"
+
 class GeminiEmbedding:
-    def __init__(self):
+    def __init__(self, model=None):
+        self.model = model or DEFAULT_MODEL
         self.api_key = os.getenv("GOOGLE_API_KEY")
+        # Load tests route embedding calls to the local fake backend (llm/fake_genai.py)
+        fake = active_fake_backend()
+        self.genai = fake.legacy if fake else genai
         if not self.api_key:
              print("[WARNING] Warning: GOOGLE_API_KEY not set. GeminiEmbedding will return mock data.")
-        elif genai:
-            genai.configure(api_key=self.api_key)
+        elif self.genai:
+            self.genai.configure(api_key=self.api_key)
 
     def get_embeddings(self, texts: list[str]) -> list[list[float]]:
-        if self.api_key and genai:
+        if self.api_key and self.genai:
             try:
                 # Try batched call first
-                model = "models/text-embedding-004" 
+                model = self.model
                 
                 # Check for list support in embed_content (older SDK behavior)
                 # or use batch_embed_contents if available (newer SDK)
                 # Ideally, we just try to pass the list.
                 
-                result = genai.embed_content(
+                result = self.genai.embed_content(
                     model=model,
                     content=texts,
                     task_type="retrieval_document"
@@ -57,21 +65,20 @@ class GeminiEmbedding:
                 pass
 
         # Fallback: Sequential processing
-        if self.api_key and genai:
+        if self.api_key and self.genai:
              embeddings = []
              for text in texts:
                  try:
-                     result = genai.embed_content(
-                        model="models/text-embedding-004",
+                     result = self.genai.embed_content(
+                        model=self.model,
                         content=text,
                         task_type="retrieval_document"
                      )
                      embeddings.append(result['embedding'])
                  except Exception as e:
                      print(f"[ERROR] Error embedding chunk: {e}")
-                     # Random fallback for failed chunk to keep alignment
-                     import random
-                     embeddings.append([random.random() for _ in range(768)])
+                     # None keeps alignment and marks the failure (the router substitutes a placeholder)
+                     embeddings.append(None)
              return embeddings
 
         # Mock 768-dim vectors
@@ -10,28 +10,36 @@ try:
 except ImportError:
     genai = None
 
+from knowledge.llm.fake_genai import active_fake_backend
+
+DEFAULT_MODEL = "models/text-embedding-004"
+
 class Gemma12bItEmbedding:
-    def __init__(self):
+    def __init__(self, model=None):
+        self.model = model or DEFAULT_MODEL
         self.api_key = os.getenv("GOOGLE_API_KEY")
+        # Load tests route embedding calls to the local fake backend (llm/fake_genai.py)
+        fake = active_fake_backend()
+        self.genai = fake.legacy if fake else genai
         if not self.api_key:
              print("[WARNING] Warning: GOOGLE_API_KEY not set. Gemma12bItEmbedding will return mock data.")
-        elif genai:
-            genai.configure(api_key=self.api_key)
+        elif self.genai:
+            self.genai.configure(api_key=self.api_key)
 
     def get_embeddings(self, texts: list[str]) -> list[list[float]]:
         """
         Generates embeddings using the Google GenAI API.
         Acts as a functional fallback/alternative to GeminiEmbedding.
         """
-        if self.api_key and genai:
+        if self.api_key and self.genai:
             try:
                 # Using the standard embedding model as Gemma instruction-tuned models 
                 # don't typically expose a direct public embedding endpoint in the SDK 
                 # different from the main text-embedding-models.
                 # using 004 as it is the most capable.
-                model = "models/text-embedding-004" 
+                model = self.model
                 
-                result = genai.embed_content(
+                result = self.genai.embed_content(
                     model=model,
                     content=texts,
                     task_type="retrieval_document"
@@ -49,20 +57,20 @@ class Gemma12bItEmbedding:
                 pass
 
         # Sequential Fallback
-        if self.api_key and genai:
+        if self.api_key and self.genai:
              embeddings = []
              for text in texts:
                  try:
-                     result = genai.embed_content(
-                        model="models/text-embedding-004",
+                     result = self.genai.embed_content(
+                        model=self.model,
                         content=text,
                         task_type="retrieval_document"
                      )
                      embeddings.append(result['embedding'])
                  except Exception as e:
                      print(f"[ERROR] Error embedding chunk: {e}")
-                     import random
-                     embeddings.append([random.random() for _ in range(768)])
+                     # None keeps alignment and marks the failure (the router substitutes a placeholder)
+                     embeddings.append(None)
              return embeddings
 
         # Final Mock Fallback
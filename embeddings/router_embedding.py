@@ -1,25 +1,92 @@
 # router-embedding.py
 # Routes embedding requests based on quota / fallback
 
-from .gemini_embedding import GeminiEmbedding
+import asyncio
+import json
+import random
+import threading
+
+from .gemini_embedding import GeminiEmbedding, DEFAULT_MODEL
 from .gemma_12b_it_embedding import Gemma12bItEmbedding
+from knowledge.llm.response_cache import ReplayMissError, get_response_cache
 
 class RPDLimitError(Exception):
     pass
 
-def get_embeddings_for_docs(docs, batch_size=10):
-    primary = GeminiEmbedding()
-    fallback = Gemma12bItEmbedding()
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+def _get_embedders(model=None):
+    """Create the primary/fallback embedders once per process (and model) and reuse them."""
+    model = model or DEFAULT_MODEL
+    with _embedders_lock:
+        if model not in _embedders:
+            _embedders[model] = (GeminiEmbedding(model), Gemma12bItEmbedding(model))
+        return _embedders[model]
+
+def _embed(primary, fallback, texts):
+    """
+    Embed with the primary model, switching to the fallback once its daily quota is spent.
+
+    Returns:
+        (vectors, embedder that produced them); a vector is None where its request failed.
+    """
+    try:
+        return primary.get_embeddings(texts), primary
+    except RPDLimitError:
+        return fallback.get_embeddings(texts), fallback
+
+def _placeholders(vectors):
+    """Replace failed (None) vectors with random ones of the same dimension to keep docs aligned."""
+    failed = sum(1 for vector in vectors if vector is None)
+    if not failed:
+        return vectors
+    print(f"[WARNING] {failed} embedding(s) failed; using random placeholder vectors")
+    dim = next((len(vector) for vector in vectors if vector is not None), 768)
+    return [vector if vector is not None else [random.random() for _ in range(dim)] for vector in vectors]
+
+def _cached_embeddings(texts, model, primary, fallback):
+    """Embed texts through the LLM response cache (see llm/response_cache.py); only misses are sent."""
+    cache = get_response_cache()
+    if not cache:
+        return _placeholders(_embed(primary, fallback, texts)[0])
+    keys = [cache.key("embed", model, text) for text in texts]
+    vectors = [cache.get(key) for key in keys]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing and cache.replay:
+        raise ReplayMissError(f"No recorded {model} embedding for {len(missing)} text(s) (replay mode)")
+    if missing:
+        fresh, embedder = _embed(primary, fallback, [texts[i] for i in missing])
+        # Keys name the primary model, and without an API key the embedders return random mock vectors;
+        # record only vectors the primary model actually returned
+        record = embedder is primary and primary.api_key and primary.genai
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+            if record and vector is not None:
+                cache.put(keys[i], "embed", model, json.dumps(vector))
+    return _placeholders([json.loads(vector) if isinstance(vector, str) else vector for vector in vectors])
+
+def get_embeddings_for_docs(docs, batch_size=10, model=None):
+    """
+    docs: list of dicts with a "content" key
+    model: embedding model name (defaults to DEFAULT_MODEL)
+    returns: list of (doc, embedding_vector)
+    """
+    primary, fallback = _get_embedders(model)
     embeddings = []
 
     for i in range(0, len(docs), batch_size):
         print(f"  Processed {i}/{len(docs)}...", end='\r')
         batch = docs[i:i+batch_size]
-        try:
-            emb = primary.get_embeddings([d["content"] for d in batch])
-            embeddings.extend(zip(batch, emb))
-        except RPDLimitError:
-            emb = fallback.get_embeddings([d["content"] for d in batch])
-            embeddings.extend(zip(batch, emb))
+        emb = _cached_embeddings([d["content"] for d in batch], primary.model, primary, fallback)
+        embeddings.extend(zip(batch, emb))
     print(f"  Processed {len(docs)}/{len(docs)}... Done.")
     return embeddings
+
+async def aget_embeddings_for_docs(docs, batch_size=10, model=None):
+    """
+    Awaitable variant of get_embeddings_for_docs.
+    The embedding SDK is blocking, so the call runs in the default thread pool
+    and the event loop stays free to serve other requests meanwhile.
+    """
+    return await asyncio.to_thread(get_embeddings_for_docs, docs, batch_size, model)
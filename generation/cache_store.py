@@ -0,0 +1,255 @@
+# generation/cache_store.py
+"""
+Transactional cache store for the documentation generator.
+
+File entries (content hash + generated outputs) and per-chunk LLM outputs
+live in one SQLite database (WAL mode on a local disk, the rollback journal
+on a network filesystem; see utils/sqlite_journal.py). Every chunk output
+and every finished file is committed as soon as it is produced, so an
+interrupted run resumes exactly where it stopped. Lookups go to the
+database on demand; nothing is loaded up front.
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from knowledge.utils import configure_journal
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    generated_files TEXT NOT NULL,  -- JSON list of output paths
+    timestamp TEXT NOT NULL,
+    fingerprint TEXT                -- change-detection fingerprint (see change_detector.py)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    path TEXT NOT NULL,
+    key TEXT NOT NULL,
+    output TEXT NOT NULL,
+    PRIMARY KEY (path, key)
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_key ON chunks(key);
+"""
+
+
+class CacheStore:
+    """
+    SQLite-backed generator cache shared by all worker threads.
+    """
+
+    def __init__(self, db_path: Path, read_only: bool = False):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path: Path to the SQLite file.
+            read_only: Open an existing database for lookups only (dry runs):
+                       nothing is created, migrated or written.
+        """
+        self.db_path = Path(db_path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            self.conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                        timeout=30.0, check_same_thread=False)
+            self.journal_mode = self.conn.execute("PRAGMA journal_mode").fetchone()[0].upper()
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+            self._has_fingerprints = "fingerprint" in columns
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Queue workers in other processes may share the store; wait out their write locks
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30.0, check_same_thread=False)
+        # WAL on a local disk; queue workers on other hosts need the rollback journal (utils/sqlite_journal.py)
+        self.journal_mode = configure_journal(self.conn, self.db_path)
+        self.conn.executescript(SCHEMA)
+        # Stores created before change detection lack the fingerprint column
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(files)")}
+        if "fingerprint" not in columns:
+            self.conn.execute("ALTER TABLE files ADD COLUMN fingerprint TEXT")
+        self._has_fingerprints = True
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.conn.close()
+
+    def is_empty(self) -> bool:
+        """Return True if the store holds no file or chunk entries."""
+        with self._lock:
+            return (
+                self.conn.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+                and self.conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None
+            )
+
+    def get_file(self, path: str) -> Optional[dict]:
+        """
+        Look up the cache entry for a source file.
+
+        Args:
+            path: Source path relative to the repository root.
+
+        Returns:
+            {"hash", "generatedFiles", "timestamp"} or None if not cached.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT hash, generated_files, timestamp FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"hash": row[0], "generatedFiles": json.loads(row[1]), "timestamp": row[2]}
+
+    def put_file(self, path: str, entry: dict) -> None:
+        """
+        Record a finished file (committed immediately).
+
+        Args:
+            path: Source path relative to the repository root.
+            entry: {"hash", "generatedFiles", "timestamp"} as in doc-cache.json,
+                   plus an optional "fingerprint".
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, hash, generated_files, timestamp, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, entry["hash"], json.dumps(entry.get("generatedFiles", [])), entry["timestamp"],
+                 entry.get("fingerprint")),
+            )
+
+    def fingerprints(self) -> Dict[str, str]:
+        """
+        Return the recorded change-detection fingerprint of every cached file.
+
+        Returns:
+            {path: fingerprint} for files that have one.
+        """
+        if not self._has_fingerprints:  # read-only store from before change detection
+            return {}
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, fingerprint FROM files WHERE fingerprint IS NOT NULL"
+            ).fetchall()
+        return dict(rows)
+
+    def set_fingerprint(self, path: str, fingerprint: str) -> None:
+        """
+        Record the fingerprint of a file verified to match its cache entry.
+
+        Args:
+            path: Source path relative to the repository root.
+            fingerprint: Current change-detection fingerprint.
+        """
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE files SET fingerprint = ? WHERE path = ?", (fingerprint, path))
+
+    def get_chunks(self, path: str) -> Dict[str, str]:
+        """
+        Return the cached chunk outputs of a source file.
+
+        Args:
+            path: Source path relative to the repository root.
+
+        Returns:
+            {chunk_key: output}
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT key, output FROM chunks WHERE path = ?", (path,)).fetchall()
+        return dict(rows)
+
+    def find_chunk(self, key: str) -> Optional[str]:
+        """
+        Look up a chunk output by key regardless of which file produced it.
+
+        Args:
+            key: Chunk cache key.
+
+        Returns:
+            The stored output, or None.
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT output FROM chunks WHERE key = ? LIMIT 1", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put_chunk(self, path: str, key: str, output: str) -> None:
+        """
+        Store one chunk output (committed immediately, so it survives a crash).
+
+        Args:
+            path: Source path relative to the repository root.
+            key: Chunk cache key.
+            output: Cleaned LLM output for the chunk.
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chunks (path, key, output) VALUES (?, ?, ?)",
+                (path, key, output),
+            )
+
+    def retain_chunks(self, path: str, keys: Iterable[str]) -> None:
+        """
+        Drop a file's chunk outputs that are not in `keys` (older versions).
+
+        Args:
+            path: Source path relative to the repository root.
+            keys: Chunk keys used by the latest generation of the file.
+        """
+        keys = list(keys)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"DELETE FROM chunks WHERE path = ? AND key NOT IN ({','.join('?' * len(keys))})",
+                (path, *keys),
+            )
+
+    def paths(self) -> List[str]:
+        """Return every source path with a file or chunk entry."""
+        with self._lock:
+            rows = self.conn.execute("SELECT path FROM files UNION SELECT path FROM chunks").fetchall()
+        return [row[0] for row in rows]
+
+    def remove_paths(self, paths: Iterable[str]) -> None:
+        """
+        Delete all entries for the given source paths.
+
+        Args:
+            paths: Source paths relative to the repository root.
+        """
+        rows = [(p,) for p in paths]
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", rows)
+            self.conn.executemany("DELETE FROM chunks WHERE path = ?", rows)
+
+    def import_json(self, doc_cache_path: Path, chunk_cache_path: Optional[Path] = None) -> int:
+        """
+        One-time migration from the legacy doc-cache.json / chunk-cache.json files.
+
+        Args:
+            doc_cache_path: Path to doc-cache.json.
+            chunk_cache_path: Optional path to chunk-cache.json.
+
+        Returns:
+            Number of file entries imported.
+        """
+        files = {}
+        chunks = {}
+        if doc_cache_path.exists():
+            files = json.loads(doc_cache_path.read_text(encoding="utf-8"))
+        if chunk_cache_path and chunk_cache_path.exists():
+            chunks = json.loads(chunk_cache_path.read_text(encoding="utf-8"))
+
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files (path, hash, generated_files, timestamp) VALUES (?, ?, ?, ?)",
+                [
+                    (path, e["hash"], json.dumps(e.get("generatedFiles", [])), e.get("timestamp", ""))
+                    for path, e in files.items() if e.get("hash")
+                ],
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (path, key, output) VALUES (?, ?, ?)",
+                [(path, key, output) for path, entries in chunks.items() for key, output in entries.items()],
+            )
+        return len(files)
@@ -0,0 +1,145 @@
+# generation/change_detector.py
+"""
+Change detection for documentation generation.
+
+Gives every source file a cheap fingerprint that changes whenever its
+content may have changed, without reading the file:
+
+- In a git work tree, tracked files that git reports as unmodified are
+  fingerprinted by their blob id from the index (``git ls-files -s``).
+- Modified, untracked and non-git files fall back to their
+  (size, mtime, inode) stat signature.
+
+The generator stores the fingerprint of each file it has verified. On the
+next run only files whose fingerprint differs are read and hashed.
+"""
+
+import os
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+
+class ChangeDetector:
+    """
+    Computes change-detection fingerprints for files under a root directory.
+    """
+
+    def __init__(self, root_dir: Path, use_git: bool = True):
+        """
+        Initialize the detector.
+
+        Args:
+            root_dir: Root directory the generator scans.
+            use_git: Ask git for blob ids when root_dir is in a git work tree.
+        """
+        self.root_dir = Path(root_dir)
+        self.use_git = use_git
+        self.mode = "stat"
+
+    def _git(self, *args: str) -> Optional[str]:
+        """Run a git command in root_dir; None if git is unavailable or fails."""
+        try:
+            result = subprocess.run(
+                ["git", "-C", str(self.root_dir), *args],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                check=True,
+            )
+            return result.stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _git_blobs(self) -> Optional[Dict[str, str]]:
+        """
+        Return {relative_path: blob id} for tracked files whose work tree
+        copy matches the index, or None when git cannot be used.
+        """
+        staged = self._git("ls-files", "-s", "-z")
+        if staged is None:
+            return None
+        dirty = self._git("ls-files", "-m", "-o", "--exclude-standard", "-z")
+        if dirty is None:
+            return None
+
+        dirty_paths: Set[str] = set(filter(None, dirty.split("\0")))
+        blobs: Dict[str, str] = {}
+        for record in filter(None, staged.split("\0")):
+            # "<mode> <blob> <stage>\t<path>"
+            info, _, path = record.partition("\t")
+            if path not in dirty_paths:
+                blobs[path] = info.split()[1]
+        return blobs
+
+    @staticmethod
+    def _stat_fingerprint(file_path: Path) -> Optional[str]:
+        """Return the stat signature of a file, or None if it cannot be stat'ed."""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return f"stat:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"
+
+    def fingerprints(self, files: List[Path]) -> Dict[str, str]:
+        """
+        Fingerprint the given files.
+
+        Args:
+            files: Absolute paths under root_dir.
+
+        Returns:
+            {relative_path: fingerprint} (files that cannot be stat'ed are omitted).
+        """
+        blobs = self._git_blobs() if self.use_git else None
+        self.mode = "git" if blobs is not None else "stat"
+
+        result: Dict[str, str] = {}
+        for file_path in files:
+            relative_path = file_path.relative_to(self.root_dir).as_posix()
+            blob = blobs.get(relative_path) if blobs else None
+            fingerprint = f"git:{blob}" if blob else self._stat_fingerprint(file_path)
+            if fingerprint:
+                result[relative_path] = fingerprint
+        return result
+
+    def last_changed(self, files: List[Path], since_days: float) -> Dict[str, float]:
+        """
+        Estimate when each file last changed (for scheduling, not correctness).
+
+        In a git work tree this is the last commit touching the file within
+        `since_days`, or now for modified and untracked files; files with no
+        commit in the window are omitted. Outside git the mtime is used.
+
+        Args:
+            files: Absolute paths under root_dir.
+            since_days: How far back to read the commit log.
+
+        Returns:
+            {relative_path: unix time}
+        """
+        now = time.time()
+        wanted = {f.relative_to(self.root_dir).as_posix(): f for f in files}
+        log = self._git("-c", "core.quotePath=false", "log", f"--since={int(since_days * 86400)}.seconds.ago", "--relative",
+                        "--name-only", "--format=@%ct") if self.use_git else None
+        dirty = self._git("ls-files", "-m", "-o", "--exclude-standard", "-z") if log is not None else None
+
+        if log is None or dirty is None:
+            result = {}
+            for path, file_path in wanted.items():
+                try:
+                    result[path] = os.stat(file_path).st_mtime
+                except OSError:
+                    continue
+            return result
+
+        result = {path: now for path in filter(None, dirty.split("\0")) if path in wanted}
+        commit_time = now
+        # Newest commits come first, so the first time a path appears is its latest change
+        for line in log.splitlines():
+            if line.startswith("@"):
+                commit_time = float(line[1:])
+            elif line in wanted and line not in result:
+                result[line] = commit_time
+        return result
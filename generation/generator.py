@@ -4,18 +4,19 @@ Documentation generator orchestrator.
 Scans files, selects adapters, invokes LLM, and writes output.
 """
 
-import glob
 import hashlib
-import json
 import os
 import re
+import socket
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import pathspec
 import yaml
-from ..llm.client import LLMClient
+from ..llm.client import DEFAULT_MAX_OUTPUT_TOKENS, LLMClient
 
 from knowledge.adapters import (
     BaseAdapter,
@@ -29,7 +30,12 @@ from knowledge.adapters import (
     ApexAdapter,
     LWCAdapter,
 )
+from knowledge.generation.cache_store import CacheStore
+from knowledge.generation.change_detector import ChangeDetector
+from knowledge.generation.scanner import FileScanner
+from knowledge.generation.scheduler import PriorityScheduler, QuotaBudget
 from knowledge.generation.validator import Validator
+from knowledge.generation.work_queue import WorkQueue
 
 
 class Generator:
@@ -61,7 +67,48 @@ class Generator:
         ".trigger": "apex",
     }
 
-    def __init__(self, root_dir: str, output_dir: Optional[str] = None):
+    # Generation plan estimates: completion size relative to the prompt, and
+    # the typical latency of one generate call
+    PLAN_OUTPUT_RATIO = 0.5
+    PLAN_MAX_OUTPUT_TOKENS = 8192
+    PLAN_REQUEST_SECONDS = 10.0
+
+    # Request packing (--pack): files up to PACK_MAX_CHARS that parse into a
+    # single chunk are grouped by prompt type, up to PACK_MAX_FILES files and
+    # PACK_MAX_TOKENS estimated prompt tokens per request
+    PACK_MAX_CHARS = 3000
+    PACK_MAX_FILES = 8
+    PACK_MAX_TOKENS = 6000
+    PACK_MIN_SECTION_CHARS = 80
+    PACK_INSTRUCTIONS = """You will document {count} separate files in one response. Each file is given below between a line <<<FILE n: path>>> and a line <<<END FILE n>>>.
+
+For EACH file, in the same order, output exactly:
+<<<FILE n>>>
+(the complete document for that file only)
+<<<END FILE n>>>
+
+Write every document as if it were generated on its own and do not refer to the other files. Output nothing outside these sections."""
+
+    # Placeholders for a file's own paths in deduplicated prompts and outputs
+    ABS_PATH_TOKEN = "\x00SOURCE_PATH\x00"
+    REL_PATH_TOKEN = "\x00SOURCE_RELPATH\x00"
+
+    # Separator between partial documents in the reduce prompt
+    REDUCE_SEPARATOR = "\n\n---- NEXT PARTIAL DOCUMENT ----\n\n"
+
+    def __init__(
+        self,
+        root_dir: str,
+        output_dir: Optional[str] = None,
+        workers: int = 1,
+        chunk_workers: int = 4,
+        reduce: bool = False,
+        pack: bool = False,
+        api_key_env: str = "GOOGLE_API_KEY",
+        priority: Optional[Dict[str, Any]] = None,
+        max_requests: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ):
         """
         Initialize the generator.
 
@@ -69,13 +116,45 @@ class Generator:
             root_dir: Root directory of the repository.
             output_dir: Optional output directory for generated docs.
                         If None, docs are placed alongside source files.
+            workers: Number of files generated concurrently. All workers share
+                     the LLM client's rate limiter.
+            chunk_workers: Number of chunks of one file generated concurrently
+                           (same shared rate limiter).
+            reduce: Merge the per-chunk outputs of multi-chunk files with an
+                    extra LLM call instead of just joining them.
+            pack: Generate small single-chunk files several per request
+                  (see PACK_* settings); files whose section cannot be
+                  split out of the response are retried one by one.
+            api_key_env: Environment variable holding the API key (queue
+                         workers can each use their own key).
+            priority: Scheduling weights overriding scheduler.DEFAULT_PRIORITY.
+            max_requests: Request budget per run; lower-priority files that
+                          do not fit are deferred to the backlog.
+            max_tokens: Estimated token budget per run (same behaviour).
         """
         self.root_dir = Path(root_dir).resolve()
         self.output_dir = Path(output_dir).resolve() if output_dir else None
-        self.llm = LLMClient()
-        self.cache_path = self.root_dir / "config" / "doc-cache.json"
+        self.workers = max(1, workers)
+        self.chunk_workers = max(1, chunk_workers)
+        self.reduce = reduce
+        self.pack = pack
+        self.llm = LLMClient(api_key_env=api_key_env)
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.cache_path = self.root_dir / "config" / "doc-cache.sqlite"
+        # Legacy JSON caches, imported into the store on first use
+        self.legacy_cache_path = self.root_dir / "config" / "doc-cache.json"
+        self.legacy_chunk_cache_path = self.root_dir / "config" / "chunk-cache.json"
         self.prompts_path = Path(__file__).parent.parent / "config" / "prompts.yml"
-        self.cache: Dict[str, dict] = {}
+        self.cache: Optional[CacheStore] = None
+        # LLM requests of the current run by key, shared by files with identical prompts
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        # Change-detection fingerprints of this run's files: {relative_path: fingerprint}
+        self._fingerprints: Dict[str, str] = {}
+        self.scheduler = PriorityScheduler(
+            self.root_dir, priority, self.root_dir / "config" / "generation-backlog.json", self.IGNORED_DIRS
+        )
         self.prompts: Dict[str, Any] = {}
         self.gitignore_spec = self._load_gitignore()
 
@@ -92,26 +171,48 @@ class Generator:
             ApexAdapter(),
         ]
 
-    def _load_cache(self) -> None:
-        """Load the documentation cache from disk."""
+    def _load_cache(self, read_only: bool = False) -> None:
+        """
+        Open the documentation cache store (entries are read on demand).
+
+        Args:
+            read_only: Open for lookups only (dry runs): no store is created
+                       and legacy JSON caches are not imported.
+        """
         try:
-            if self.cache_path.exists():
-                self.cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
-                print(f"[CACHE] Loaded cache ({len(self.cache)} entries)")
+            if read_only and not self.cache_path.exists():
+                print(f"[CACHE] No cache store {self.cache_path.name} yet; planning as if nothing were cached")
+                self.cache = None
+                return
+            self.cache = CacheStore(self.cache_path, read_only=read_only)
+            if not read_only and self.cache.is_empty() and self.legacy_cache_path.exists():
+                count = self.cache.import_json(self.legacy_cache_path, self.legacy_chunk_cache_path)
+                print(f"[CACHE] Imported {count} entries from {self.legacy_cache_path.name}")
+            print(f"[CACHE] Using cache store {self.cache_path.name}")
         except Exception as e:
-            print(f"[ERROR] Failed to load cache: {e}")
-            self.cache = {}
+            print(f"[ERROR] Failed to open cache: {e}")
+            self.cache = None
 
     def _save_cache(self) -> None:
-        """Save the documentation cache to disk."""
+        """
+        Finish the run's cache updates.
+
+        Entries are committed as they are produced, so this only drops
+        entries for source files that no longer exist and closes the store
+        (a read-only store is only closed).
+        """
+        if self.cache is None:
+            return
         try:
-            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
-            self.cache_path.write_text(
-                json.dumps(self.cache, indent=2),
-                encoding="utf-8"
-            )
+            missing = [] if self.cache.read_only else [
+                p for p in self.cache.paths() if not (self.root_dir / p).exists()
+            ]
+            if missing:
+                self.cache.remove_paths(missing)
+            self.cache.close()
         except Exception as e:
             print(f"[ERROR] Failed to save cache: {e}")
+        self.cache = None
 
     def _load_prompts(self) -> None:
         """Load prompts configuration from YAML file."""
@@ -128,10 +229,11 @@ class Generator:
             print(f"[ERROR] Failed to load prompts: {e}")
             self.prompts = {}
 
-    def _get_prompt_for_file(self, file_path: Path, parsed_content: str) -> Optional[str]:
+    def _get_prompt_parts(self, file_path: Path) -> Optional[Tuple[str, str, str]]:
         """
-        Get the prompt for a file from the prompts config.
-        Returns None if no prompt config is found (falls back to adapter).
+        Resolve the prompts config entry for a file.
+        Returns (prompt_key, system, user_template) with shared rules filled in,
+        or None if no prompt config is found (falls back to adapter).
         """
         if not self.prompts:
             return None
@@ -163,6 +265,19 @@ class Generator:
 
         # Replace placeholders
         system = system.replace("{{shared_rules}}", shared_rules)
+
+        return prompt_key, system, user
+
+    def _get_prompt_for_file(self, file_path: Path, parsed_content: str) -> Optional[str]:
+        """
+        Get the prompt for a file from the prompts config.
+        Returns None if no prompt config is found (falls back to adapter).
+        """
+        parts = self._get_prompt_parts(file_path)
+        if not parts:
+            return None
+
+        _, system, user = parts
         user = user.replace("{{content}}", parsed_content)
 
         return f"{system}\n\n{user}"
@@ -178,25 +293,6 @@ class Generator:
                 print(f"[ERROR] Failed to load .gitignore: {e}")
         return None
 
-    def _should_ignore(self, path: Path) -> bool:
-        """Check if a path should be ignored."""
-        # Check hardcoded ignores first
-        parts = path.parts
-        if any(ignored in parts for ignored in self.IGNORED_DIRS):
-            return True
-        
-        # Check .gitignore
-        if self.gitignore_spec:
-            try:
-                # relative_to can fail if path is not relative to root_dir
-                rel_path = path.relative_to(self.root_dir).as_posix()
-                if self.gitignore_spec.match_file(rel_path):
-                    return True
-            except ValueError:
-                pass
-                
-        return False
-
     def _generate_frontmatter(self, source_path: Path, content: str) -> str:
         """
         Generate YAML front matter for the documentation file.
@@ -290,35 +386,18 @@ hash: {content_hash}
         """
         Scan for files matching the given glob patterns.
 
+        Includes, "!" exclusions, IGNORED_DIRS and .gitignore are compiled
+        into one matcher and the tree is walked once, pruning excluded
+        directories before descending (see scanner.FileScanner).
+
         Args:
             patterns: List of glob patterns (relative to root_dir).
 
         Returns:
             List of matching file paths.
         """
-        matched_files = set()
-
-        for pattern in patterns:
-            # Handle negation patterns (starting with !)
-            if pattern.startswith("!"):
-                continue  # We'll handle exclusions separately
-
-            full_pattern = str(self.root_dir / pattern)
-            for match in glob.glob(full_pattern, recursive=True):
-                path = Path(match)
-                if path.is_file() and not self._should_ignore(path):
-                    matched_files.add(path)
-
-        # Apply exclusion patterns
-        for pattern in patterns:
-            if pattern.startswith("!"):
-                exclude_pattern = pattern[1:]  # Remove the !
-                full_pattern = str(self.root_dir / exclude_pattern)
-                for match in glob.glob(full_pattern, recursive=True):
-                    path = Path(match)
-                    matched_files.discard(path)
-
-        return sorted(matched_files)
+        scanner = FileScanner(self.root_dir, patterns, self.IGNORED_DIRS, self.gitignore_spec)
+        return scanner.scan()
 
     def _clean_llm_output(self, output: str) -> str:
         """Clean up LLM output by removing markdown code block wrappers."""
@@ -327,29 +406,136 @@ hash: {content_hash}
         output = re.sub(r'\s*```\s*$', '', output)
         return output.strip()
 
-    def generate_for_file(self, file_path: Path) -> Optional[str]:
+    def _build_chunk_prompt(self, file_path: Path, adapter: BaseAdapter, chunk: str) -> str:
+        """Prompt for one chunk: from the prompts config, falling back to the adapter."""
+        prompt = self._get_prompt_for_file(file_path, chunk)
+        if not prompt:
+            prompt = adapter.get_prompt(file_path, chunk)
+        return prompt
+
+    def _neutralize_paths(self, text: str, file_path: Path) -> str:
+        """Replace a file's own paths with placeholders so identical files share prompts."""
+        relative_path = file_path.relative_to(self.root_dir).as_posix()
+        return text.replace(str(file_path), self.ABS_PATH_TOKEN).replace(relative_path, self.REL_PATH_TOKEN)
+
+    def _localize_paths(self, text: str, file_path: Path) -> str:
+        """Inverse of _neutralize_paths for the given file."""
+        relative_path = file_path.relative_to(self.root_dir).as_posix()
+        return text.replace(self.ABS_PATH_TOKEN, str(file_path)).replace(self.REL_PATH_TOKEN, relative_path)
+
+    def _chunk_cache_key(self, adapter: BaseAdapter, prompt: str, file_path: Path) -> str:
         """
-        Generate documentation for a single file.
+        Cache key for one chunk's output.
+
+        The rendered prompt contains both the prompt template and the chunk
+        content, so editing either (or switching adapter or model) misses.
+        The file's own path is neutralized, so copies of a file in different
+        places share one key.
+        """
+        payload = f"{type(adapter).__name__}\0{self.llm.model}\0{self._neutralize_paths(prompt, file_path)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _generate_deduplicated(
+        self,
+        file_path: Path,
+        adapter: BaseAdapter,
+        prompt: str,
+        cached: Dict[str, str],
+        fresh: Dict[str, str],
+    ) -> Tuple[Optional[str], str]:
+        """
+        Return the output for a prompt, calling the LLM at most once per
+        unique prompt: reuse this file's cached output, then any file's
+        stored output for the same key, then a request already in flight
+        for another file in this run.
 
         Args:
             file_path: Path to the source file.
+            adapter: Adapter for the file (part of the key).
+            prompt: Rendered prompt.
+            cached: The file's chunk cache entries from the previous run.
+            fresh: The file's chunk cache entries for this run (updated in place).
 
         Returns:
-            Generated documentation string, or None on failure.
+            (output with this file's paths, source) where source is
+            "cached", "shared" or "generated"; output is None on failure.
         """
-        adapter = self._find_adapter(file_path)
-        if not adapter:
-            print(f"[SKIP] No adapter for: {file_path.name}")
-            return None
+        relative_path = file_path.relative_to(self.root_dir).as_posix()
+        key = self._chunk_cache_key(adapter, prompt, file_path)
+
+        if key in cached:
+            fresh[key] = cached[key]
+            return self._localize_paths(cached[key], file_path), "cached"
+
+        neutral = self.cache.find_chunk(key) if self.cache else None
+        source = "shared"
+        if neutral is None:
+            with self._inflight_lock:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._inflight[key] = Future()
+            if owner:
+                try:
+                    result = self.llm.generate(prompt)
+                    future.set_result(
+                        self._neutralize_paths(self._clean_llm_output(result), file_path) if result else None
+                    )
+                except BaseException as e:
+                    future.set_exception(e)
+                    raise
+                source = "generated"
+            neutral = future.result()
+
+        if neutral is None:
+            return None, source
+
+        fresh[key] = neutral
+        if self.cache:
+            # Committed right away so an interrupted run keeps finished chunks
+            self.cache.put_chunk(relative_path, key, neutral)
+        return self._localize_paths(neutral, file_path), source
+
+    def _read_source(self, file_path: Path) -> Optional[str]:
+        """
+        Read a source file with normalized line endings.
+
+        Args:
+            file_path: Path to the source file.
 
+        Returns:
+            File content, or None if it cannot be read.
+        """
         try:
             content = file_path.read_text(encoding="utf-8-sig")
             # Normalize line endings to LF for consistent hashing across OS
-            content = content.replace("\r\n", "\n")
+            return content.replace("\r\n", "\n")
         except Exception as e:
             print(f"[ERROR] Failed to read {file_path}: {e}")
             return None
 
+    def generate_for_file(self, file_path: Path, content: Optional[str] = None) -> Optional[str]:
+        """
+        Generate documentation for a single file.
+
+        Args:
+            file_path: Path to the source file.
+            content: Already-read file content (from _read_source). Read
+                     from disk if omitted.
+
+        Returns:
+            Generated documentation string, or None on failure.
+        """
+        adapter = self._find_adapter(file_path)
+        if not adapter:
+            print(f"[SKIP] No adapter for: {file_path.name}")
+            return None
+
+        if content is None:
+            content = self._read_source(file_path)
+            if content is None:
+                return None
+
         if not content.strip():
             print(f"[SKIP] Empty file: {file_path.name}")
             return None
@@ -358,47 +544,467 @@ hash: {content_hash}
         relative_path = file_path.relative_to(self.root_dir).as_posix()
         content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
 
-        if relative_path in self.cache:
-            if self.cache[relative_path].get("hash") == content_hash:
-                print(f"[SKIP] Unchanged (cached): {file_path.name}")
-                return None  # Skip, already generated
+        entry = self.cache.get_file(relative_path) if self.cache else None
+        if entry and entry.get("hash") == content_hash:
+            print(f"[SKIP] Unchanged (cached): {file_path.name}")
+            # Remember the current fingerprint so the next run skips without reading
+            if relative_path in self._fingerprints:
+                self.cache.set_fingerprint(relative_path, self._fingerprints[relative_path])
+            return None  # Skip, already generated
 
         # Parse into chunks
         chunks = adapter.parse(file_path, content)
         print(f"[PROCESSING] {file_path.name} ({len(chunks)} chunk(s))")
 
-        # Generate documentation for each chunk
-        outputs = []
-        for i, chunk in enumerate(chunks):
-            # Try to get prompt from config first, fall back to adapter
-            prompt = self._get_prompt_for_file(file_path, chunk)
-            if not prompt:
-                prompt = adapter.get_prompt(file_path, chunk)
-            
-            result = self.llm.generate(prompt)
+        # Outputs of unchanged chunks are reused from the chunk cache
+        cached_chunks = self.cache.get_chunks(relative_path) if self.cache else {}
+        fresh_chunks: Dict[str, str] = {}
 
-            if result:
-                # Clean up LLM output
-                result = self._clean_llm_output(result)
-                outputs.append(result)
-                if len(chunks) > 1:
-                    print(f"   [OK] Chunk {i + 1}/{len(chunks)}")
-            else:
+        # Map: generate documentation for each chunk (in parallel, order preserved)
+        def generate_chunk(item):
+            i, chunk = item
+            prompt = self._build_chunk_prompt(file_path, adapter, chunk)
+            output, source = self._generate_deduplicated(file_path, adapter, prompt, cached_chunks, fresh_chunks)
+
+            if output is None:
                 print(f"   [FAILED] Chunk {i + 1}/{len(chunks)} failed")
+            elif source == "shared":
+                print(f"   [SHARED] Chunk {i + 1}/{len(chunks)} (same prompt as another file)")
+            elif len(chunks) > 1:
+                print(f"   [{'CACHED' if source == 'cached' else 'OK'}] Chunk {i + 1}/{len(chunks)}")
+            return output
+
+        if len(chunks) > 1 and self.chunk_workers > 1:
+            with ThreadPoolExecutor(max_workers=min(len(chunks), self.chunk_workers)) as executor:
+                results = list(executor.map(generate_chunk, enumerate(chunks)))
+        else:
+            results = [generate_chunk(item) for item in enumerate(chunks)]
+
+        outputs = [r for r in results if r]
+        reduced = None
+
+        # Reduce: merge partial documents into one, falling back to the adapter's join
+        if self.reduce and len(outputs) > 1:
+            reduced = self._reduce_outputs(file_path, adapter, outputs, cached_chunks, fresh_chunks)
+
+        # Keep only this version's entries so the cache does not grow with old edits
+        if self.cache:
+            self.cache.retain_chunks(relative_path, fresh_chunks)
 
         if not outputs:
             return None
+        if reduced:
+            return reduced
 
         # Post-process and combine
         return adapter.post_process(file_path, outputs)
 
+    def _reduce_outputs(
+        self,
+        file_path: Path,
+        adapter: BaseAdapter,
+        outputs: List[str],
+        cached: Dict[str, str],
+        fresh: Dict[str, str],
+    ) -> Optional[str]:
+        """
+        Merge per-chunk documents into a single coherent document.
+
+        Args:
+            file_path: Path to the source file.
+            adapter: Adapter that produced the chunks (part of the cache key).
+            outputs: Cleaned LLM outputs for each chunk, in file order.
+            cached: The file's chunk cache entries from the previous run.
+            fresh: The file's chunk cache entries for this run (updated in place).
+
+        Returns:
+            The merged document, or None if no reduce prompt is configured
+            or the LLM call fails.
+        """
+        prompt_config = self.prompts.get("_reduce")
+        if not prompt_config:
+            return None
+
+        relative_path = file_path.relative_to(self.root_dir).as_posix()
+        system = prompt_config.get("system", "").replace(
+            "{{shared_rules}}", self.prompts.get("_shared_rules", "")
+        )
+        user = (
+            prompt_config.get("user", "")
+            .replace("{{file_path}}", relative_path)
+            .replace("{{content}}", self.REDUCE_SEPARATOR.join(outputs))
+        )
+
+        prompt = f"{system}\n\n{user}"
+
+        # Unchanged chunk outputs produce the same reduce prompt
+        merged, source = self._generate_deduplicated(file_path, adapter, prompt, cached, fresh)
+        if merged is None:
+            print(f"   [WARNING] Reduce step failed for {file_path.name}; joining chunk outputs")
+        elif source == "generated":
+            print(f"   [OK] Merged {len(outputs)} chunk outputs")
+        else:
+            print(f"   [{source.upper()}] Merged document")
+        return merged
+
+    def _write_doc(self, file_path: Path, doc: str, original_content: str) -> None:
+        """
+        Write generated documentation for a file and record it in the cache.
+
+        Args:
+            file_path: Path to the source file.
+            doc: Generated documentation body (without front matter).
+            original_content: Source content the doc was generated from.
+        """
+        output_path = self._get_output_path(file_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        content_hash = hashlib.sha256(original_content.encode("utf-8")).hexdigest()
+        frontmatter = self._generate_frontmatter(file_path, original_content)
+        final_content = frontmatter + doc
+
+        # Validate content
+        val_results = Validator.validate(final_content, str(output_path))
+
+        # Print Summary
+        Validator.print_report(val_results)
+
+        # Write-then-rename, so concurrent workers and readers never see a partial doc
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(final_content, encoding="utf-8")
+        os.replace(tmp_path, output_path)
+        print(f"   [SAVED] {output_path.relative_to(self.root_dir)}\n")
+
+        # Update cache (committed per file, so a killed run resumes after this file)
+        if self.cache:
+            relative_path = file_path.relative_to(self.root_dir).as_posix()
+            self.cache.put_file(relative_path, {
+                "hash": content_hash,
+                "generatedFiles": [output_path.relative_to(self.root_dir).as_posix()],
+                "timestamp": datetime.now().isoformat(),
+                "fingerprint": self._fingerprints.get(relative_path),
+            })
+
+    def _group_for_packing(self, items: List[Tuple[str, int, Any]]) -> List[List[Any]]:
+        """
+        Greedily group pack candidates of the same prompt type.
+
+        Args:
+            items: (prompt_key, estimated prompt tokens, payload) in file order.
+
+        Returns:
+            Groups of payloads, each within PACK_MAX_FILES / PACK_MAX_TOKENS.
+        """
+        open_groups: Dict[str, Tuple[List[Any], int]] = {}
+        groups: List[List[Any]] = []
+        for prompt_key, tokens, payload in items:
+            group, used = open_groups.get(prompt_key, (None, 0))
+            if group is None or len(group) >= self.PACK_MAX_FILES or used + tokens > self.PACK_MAX_TOKENS:
+                group, used = [], 0
+                groups.append(group)
+            group.append(payload)
+            open_groups[prompt_key] = (group, used + tokens)
+        return groups
+
+    def _pack_candidate(self, file_path: Path, content: str) -> Optional[Dict[str, Any]]:
+        """
+        Check whether a file can be generated in a packed request.
+
+        Args:
+            file_path: Path to the source file.
+            content: File content.
+
+        Returns:
+            Pack entry (file, adapter, prompt parts, chunk, key, tokens) or
+            None if the file is unchanged, multi-chunk or has no config prompt.
+        """
+        adapter = self._find_adapter(file_path)
+        parts = self._get_prompt_parts(file_path)
+        if not adapter or not parts or not content.strip() or len(content) > self.PACK_MAX_CHARS:
+            return None
+
+        relative_path = file_path.relative_to(self.root_dir).as_posix()
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        entry = self.cache.get_file(relative_path) if self.cache else None
+        if entry and entry.get("hash") == content_hash:
+            return None
+
+        chunks = adapter.parse(file_path, content)
+        if len(chunks) != 1:
+            return None
+        prompt = self._build_chunk_prompt(file_path, adapter, chunks[0])
+        return {
+            "file_path": file_path,
+            "prompt_key": parts[0],
+            "system": parts[1],
+            "user": parts[2],
+            "chunk": chunks[0],
+            "key": self._chunk_cache_key(adapter, prompt, file_path),
+            "tokens": self.llm._estimate_tokens(prompt),
+        }
+
+    def _split_packed_output(self, text: str, count: int) -> Dict[int, str]:
+        """
+        Split a packed response into per-file documents.
+
+        Args:
+            text: Raw LLM response.
+            count: Number of files in the request.
+
+        Returns:
+            {file number: document} for sections that are present exactly
+            once, non-trivial and free of stray delimiters.
+        """
+        text = self._clean_llm_output(text)
+        found: Dict[int, List[str]] = {}
+        for match in re.finditer(r"<<<FILE (\d+)(?::[^\n>]*)?>>>[ \t]*\n(.*?)\n[ \t]*<<<END FILE \1>>>", text, re.DOTALL):
+            found.setdefault(int(match.group(1)), []).append(match.group(2))
+
+        sections = {}
+        for idx, bodies in found.items():
+            if not 1 <= idx <= count or len(bodies) != 1:
+                continue
+            body = self._clean_llm_output(bodies[0])
+            if len(body) >= self.PACK_MIN_SECTION_CHARS and "<<<FILE" not in body and "<<<END FILE" not in body:
+                sections[idx] = body
+        return sections
+
+    def _run_pack(self, pack: List[Dict[str, Any]], budget: Optional[QuotaBudget] = None) -> int:
+        """
+        Generate one packed request and store each split-out document in
+        the chunk cache under that file's own key.
+
+        Args:
+            pack: Pack entries sharing one prompt type.
+            budget: Optional quota guard; a pack that does not fit is not
+                    sent and its files are admitted one by one instead.
+
+        Returns:
+            Number of files whose document was split out successfully.
+        """
+        names = ", ".join(e["file_path"].name for e in pack)
+        paths = [e["file_path"].relative_to(self.root_dir).as_posix() for e in pack]
+        if budget and not budget.try_start_pack(paths):
+            print(f"   [PACK] Not sent ({names}): over the quota budget; files are admitted one by one")
+            return 0
+
+        sections = []
+        for idx, entry in enumerate(pack, 1):
+            user = entry["user"].replace("{{content}}", entry["chunk"])
+            sections.append(f"<<<FILE {idx}: {paths[idx - 1]}>>>\n{user}\n<<<END FILE {idx}>>>")
+        prompt = (
+            f"{pack[0]['system']}\n\n"
+            f"{self.PACK_INSTRUCTIONS.format(count=len(pack))}\n\n"
+            + "\n\n".join(sections)
+        )
+
+        outputs: Dict[int, str] = {}
+        stored: List[str] = []
+        try:
+            result = self.llm.generate(prompt)
+            outputs = self._split_packed_output(result, len(pack)) if result else {}
+            for idx, entry in enumerate(pack, 1):
+                if idx in outputs:
+                    neutral = self._neutralize_paths(outputs[idx], entry["file_path"])
+                    self.cache.put_chunk(paths[idx - 1], entry["key"], neutral)
+                    stored.append(paths[idx - 1])
+        finally:
+            if budget:
+                # The pack's request is now in the client's usage; its stored files are not charged again
+                budget.finish_pack(paths, stored)
+
+        if len(outputs) == len(pack):
+            print(f"   [PACK] {len(pack)} files in one request: {names}")
+        else:
+            print(f"   [PACK] Split {len(outputs)}/{len(pack)} files ({names}); "
+                  f"retrying the rest individually")
+        return len(outputs)
+
+    def _pack_small_files(self, files: List[Path], budget: Optional[QuotaBudget] = None) -> Dict[Path, str]:
+        """
+        Pre-generate small single-chunk files in packed requests. Their
+        documents land in the chunk cache, so the per-file pass that
+        follows assembles them without further LLM calls.
+
+        Args:
+            files: Candidate files for this run.
+            budget: Optional quota guard each pack must fit in.
+
+        Returns:
+            {file_path: content} for the files read here, so the per-file
+            pass does not read them again.
+        """
+        sources: Dict[Path, str] = {}
+        items: List[Tuple[str, int, Any]] = []
+        seen: Set[str] = set()
+        for file_path in files:
+            try:
+                # Bytes >= characters, so this is a safe pre-filter before reading
+                if file_path.stat().st_size > self.PACK_MAX_CHARS * 4:
+                    continue
+            except OSError:
+                continue
+            if not self._find_adapter(file_path):
+                continue
+            content = self._read_source(file_path)
+            if content is None:
+                continue
+            sources[file_path] = content
+
+            entry = self._pack_candidate(file_path, content)
+            # Identical prompts are generated once anyway (see _generate_deduplicated)
+            if entry and entry["key"] not in seen and not self.cache.find_chunk(entry["key"]):
+                seen.add(entry["key"])
+                items.append((entry["prompt_key"], entry["tokens"], entry))
+
+        packs = [group for group in self._group_for_packing(items) if len(group) > 1]
+        if not packs:
+            return sources
+
+        print(f"[PACK] Packing {sum(len(p) for p in packs)} small file(s) into {len(packs)} request(s)")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            packed = sum(executor.map(lambda pack: self._run_pack(pack, budget), packs))
+        print(f"[PACK] {packed} file(s) generated in packed requests\n")
+        return sources
+
+    def _select_candidates(self, files: List[Path]) -> List[Path]:
+        """
+        Fingerprint files and keep those that may have changed since they
+        were last generated (all files if no cache is open).
+
+        Args:
+            files: Matched source files.
+
+        Returns:
+            Files that need to be read and checked.
+        """
+        if not self.cache:
+            return files
+
+        detector = ChangeDetector(self.root_dir)
+        self._fingerprints = detector.fingerprints(files)
+        known = self.cache.fingerprints()
+        candidates = []
+        for file_path in files:
+            relative_path = file_path.relative_to(self.root_dir).as_posix()
+            fingerprint = self._fingerprints.get(relative_path)
+            if fingerprint is None or known.get(relative_path) != fingerprint:
+                candidates.append(file_path)
+        print(f"[INFO] Change detection ({detector.mode}): "
+              f"{len(candidates)} of {len(files)} file(s) may have changed\n")
+        return candidates
+
+    def _process_files(
+        self,
+        files: List[Path],
+        on_result: Optional[Callable[[Path, Optional[str], Optional[str]], None]] = None,
+        budget: Optional[QuotaBudget] = None,
+    ) -> Tuple[int, int]:
+        """
+        Generate, write and cache docs for the given files (cache left open).
+
+        Args:
+            files: Files to process, in output order.
+            on_result: Optional callback(file_path, doc, content) called on
+                       this thread after each file's doc is written (doc is
+                       None when nothing was generated).
+            budget: Optional quota guard checked before each file starts;
+                    deferred files are left out of the counts.
+
+        Returns:
+            (generated, skipped) counts.
+        """
+        success_count = 0
+        skip_count = 0
+        total_files = len(files)
+        self._inflight = {}
+
+        # Packed requests pre-fill the chunk cache for small files
+        sources = self._pack_small_files(files, budget) if self.pack and self.cache else {}
+
+        def generate_file(idx, file_path, relative_path):
+            print(f"[INFO] Processing {idx}/{total_files}: {relative_path}")
+            # Each source is read once: the same content feeds hashing, prompts and front matter
+            if not self._find_adapter(file_path):
+                return self.generate_for_file(file_path), None
+            content = sources.pop(file_path, None)
+            if content is None:
+                content = self._read_source(file_path)
+            if content is None:
+                return None, None
+            return self.generate_for_file(file_path, content), content
+
+        def generate(item):
+            idx, file_path = item
+            relative_path = file_path.relative_to(self.root_dir).as_posix()
+            if budget and not budget.try_start(relative_path):
+                return None, None
+            try:
+                return generate_file(idx, file_path, relative_path)
+            finally:
+                if budget:
+                    budget.finish(relative_path)
+
+        if self.workers > 1:
+            print(f"[INFO] Generating with {self.workers} workers")
+
+        # LLM calls run concurrently; outputs and cache updates are applied
+        # here on the calling thread, in file order, as results complete.
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            results = executor.map(generate, enumerate(files, 1))
+            for file_path, (doc, content) in zip(files, results):
+                if budget and file_path.relative_to(self.root_dir).as_posix() in budget.deferred:
+                    print(f"[DEFERRED] {file_path.relative_to(self.root_dir).as_posix()} (quota budget reached)")
+                    continue
+                if doc:
+                    self._write_doc(file_path, doc, content)
+                    success_count += 1
+                else:
+                    print(f"   [SKIPPED] (no content generated)\n")
+                    skip_count += 1
+                if on_result:
+                    on_result(file_path, doc, content)
+        finally:
+            # On interrupt, drop queued files instead of generating them
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return success_count, skip_count
+
+    def _generate_files(self, files: List[Path], skipped: int = 0, budget: Optional[QuotaBudget] = None) -> None:
+        """
+        Generate, write and cache docs for the given files, then close the cache.
+
+        Args:
+            files: Files to process, in output order.
+            skipped: Files already skipped before generation (for the summary).
+            budget: Optional quota guard; files that no longer fit are deferred.
+        """
+        try:
+            success_count, skip_count = self._process_files(files, budget=budget)
+        finally:
+            self._save_cache()
+
+        deferred = f", {len(budget.deferred)} deferred by the quota budget" if budget and budget.deferred else ""
+        print(f"\n[DONE] Generation complete: {success_count} generated, {skip_count + skipped} skipped{deferred}")
+
     def run(self, patterns: List[str]) -> None:
         """
         Run the documentation generator.
 
+        Changed files are generated in priority order (see scheduler.py),
+        so the most valuable docs refresh first if the run is cut short.
+
         Args:
             patterns: List of glob patterns to process.
         """
+        if self.max_requests is not None or self.max_tokens is not None:
+            # Budgeted runs need per-file cost estimates before anything is generated
+            plan = self.plan(patterns)
+            Generator.print_plan(plan)
+            self.run_plan(plan)
+            return
+
         print(f"[INFO] Scanning from: {self.root_dir}")
         self._load_cache()
         self._load_prompts()
@@ -407,54 +1013,400 @@ hash: {content_hash}
 
         if not files:
             print("[INFO] No files matched the patterns.")
+            self._save_cache()
             return
 
         print(f"[INFO] Found {len(files)} file(s) to process\n")
 
-        success_count = 0
-        skip_count = 0
-        total_files = len(files)
+        # Only files whose fingerprint changed since they were last generated are read
+        candidates = self.scheduler.order(self._select_candidates(files))
+        self._generate_files(candidates, skipped=len(files) - len(candidates))
+
+    def plan(self, patterns: List[str]) -> Dict[str, Any]:
+        """
+        Dry run: scan, check caches and parse chunks without calling the LLM.
+
+        Args:
+            patterns: List of glob patterns to process.
+
+        Returns:
+            Machine-readable plan (see run_plan) with per-file chunk counts,
+            token estimates and a wall-time prediction under the LLM
+            client's RPM/TPM limits.
+        """
+        print(f"[INFO] Planning from: {self.root_dir}")
+        # A dry run must not change the store: no legacy import, no pruning
+        self._load_cache(read_only=True)
+        self._load_prompts()
+
+        files = self.scan_files(patterns)
+        planned: List[Dict[str, Any]] = []
+        planned_keys: Set[str] = set()
+        pack_items: List[Tuple[str, int, Any]] = []
 
         try:
-            for idx, file_path in enumerate(files, 1):
+            # Highest priority first, so packing and budgets favour the most valuable docs
+            candidates = self._select_candidates(files)
+            priorities = self.scheduler.scores(candidates)
+            for file_path in self.scheduler.order(candidates, priorities):
+                adapter = self._find_adapter(file_path)
+                content = self._read_source(file_path) if adapter else None
+                if not content or not content.strip():
+                    continue
+
                 relative_path = file_path.relative_to(self.root_dir).as_posix()
-                print(f"[INFO] Processing {idx}/{total_files}: {relative_path}")
-                
-                doc = self.generate_for_file(file_path)
+                content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                entry = self.cache.get_file(relative_path) if self.cache else None
+                if entry and entry.get("hash") == content_hash:
+                    continue
+
+                chunks = adapter.parse(file_path, content)
+                cached_chunks = self.cache.get_chunks(relative_path) if self.cache else {}
+                chunk_requests = 0
+                input_tokens = 0
+                output_tokens = 0
+                for chunk in chunks:
+                    prompt = self._build_chunk_prompt(file_path, adapter, chunk)
+                    key = self._chunk_cache_key(adapter, prompt, file_path)
+                    # Identical prompts (this run or stored for any file) are generated once
+                    if key in cached_chunks or key in planned_keys or (self.cache and self.cache.find_chunk(key)):
+                        continue
+                    planned_keys.add(key)
+                    tokens = self.llm._estimate_tokens(prompt)
+                    chunk_requests += 1
+                    input_tokens += tokens
+                    output_tokens += self._estimate_output_tokens(tokens)
+
+                # The merge call reads every partial document
+                reduce_requests = 1 if self.reduce and len(chunks) > 1 and chunk_requests else 0
+                if reduce_requests:
+                    input_tokens += output_tokens
+                    output_tokens += self._estimate_output_tokens(output_tokens)
+
+                planned.append({
+                    "path": relative_path,
+                    "hash": content_hash,
+                    "chunks": len(chunks),
+                    "cached_chunks": len(chunks) - chunk_requests,
+                    "requests": chunk_requests + reduce_requests,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "priority": round(priorities[relative_path], 4),
+                })
+
+                parts = self._get_prompt_parts(file_path)
+                if self.pack and parts and len(chunks) == 1 and chunk_requests == 1 \
+                        and len(content) <= self.PACK_MAX_CHARS:
+                    pack_items.append((parts[0], input_tokens, planned[-1]))
+        finally:
+            self._save_cache()
 
-                if doc:
-                    output_path = self._get_output_path(file_path)
-                    output_path.parent.mkdir(parents=True, exist_ok=True)
-
-                    # Read original content for hashing
-                    original_content = file_path.read_text(encoding="utf-8-sig")
-                    original_content = original_content.replace("\r\n", "\n")
-                    content_hash = hashlib.sha256(original_content.encode("utf-8")).hexdigest()
-                    frontmatter = self._generate_frontmatter(file_path, original_content)
-                    final_content = frontmatter + doc
-
-                    # Validate content
-                    val_results = Validator.validate(final_content, str(output_path))
-                    
-                    # Print Summary
-                    Validator.print_report(val_results)
-
-                    output_path.write_text(final_content, encoding="utf-8")
-                    print(f"   [SAVED] {output_path.relative_to(self.root_dir)}\n")
-
-                    # Update cache
-                    relative_path = file_path.relative_to(self.root_dir).as_posix()
-                    self.cache[relative_path] = {
-                        "hash": content_hash,
-                        "generatedFiles": [output_path.relative_to(self.root_dir).as_posix()],
-                        "timestamp": datetime.now().isoformat(),
-                    }
+        # Packed files share one request per group
+        for group_id, group in enumerate(self._group_for_packing(pack_items)):
+            if len(group) > 1:
+                for entry in group:
+                    entry["requests"] = 0
+                    entry["packed"] = True
+                    entry["pack_group"] = group_id
+
+        # Under a budget, files that do not fit are deferred (see scheduler.py)
+        changed_count = len(planned)
+        deferred: List[Dict[str, Any]] = []
+        if self.max_requests is not None or self.max_tokens is not None:
+            planned, deferred = self.scheduler.admit(planned, self.max_requests, self.max_tokens)
+        pack_requests = len({f["pack_group"] for f in planned if f.get("packed")})
+
+        totals = {
+            "files_matched": len(files),
+            "files_to_generate": len(planned),
+            "files_unchanged": len(files) - changed_count,
+            "files_deferred": len(deferred),
+            "chunks": sum(f["chunks"] for f in planned),
+            "requests": sum(f["requests"] for f in planned) + pack_requests,
+            "packed_requests": pack_requests,
+            "input_tokens": sum(f["input_tokens"] for f in planned),
+            "output_tokens": sum(f["output_tokens"] for f in planned),
+        }
+        return {
+            "version": 1,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "root_dir": self.root_dir.as_posix(),
+            "model": self.llm.model,
+            "reduce": self.reduce,
+            "pack": self.pack,
+            "files": planned,
+            "deferred": deferred,
+            "totals": totals,
+            "estimate": self._estimate_wall_time(planned, pack_requests),
+        }
+
+    def _estimate_output_tokens(self, input_tokens: int) -> int:
+        """Expected completion size for a prompt of `input_tokens` tokens."""
+        return min(int(input_tokens * self.PLAN_OUTPUT_RATIO), self.PLAN_MAX_OUTPUT_TOKENS)
+
+    def _estimate_wall_time(self, planned: List[Dict[str, Any]], pack_requests: int = 0) -> Dict[str, Any]:
+        """
+        Predict wall time from the LLM client's throttle limits.
 
-                    success_count += 1
-                else:
-                    print(f"   [SKIPPED] (no content generated)\n")
-                    skip_count += 1
+        Args:
+            planned: Per-file plan entries.
+            pack_requests: Packed requests covering entries marked "packed".
+
+        Returns:
+            {"minutes", "limited_by", ...} where limited_by is "rpm", "tpm" or "latency".
+        """
+        requests = sum(f["requests"] for f in planned) + pack_requests
+        # The throttle reserves estimate_request(): the calibrated prompt estimate (the
+        # entries' input_tokens) plus the learned output size of each request
+        expected_output = self.llm.estimator.estimate_output(DEFAULT_MAX_OUTPUT_TOKENS)
+        reserved_tokens = sum(f["input_tokens"] for f in planned) + expected_output * requests
+
+        rpm_minutes = requests / self.llm._rpm_limit
+        tpm_minutes = reserved_tokens / self.llm._tpm_limit
+
+        # Latency bound: requests spread over file workers and, within multi-chunk files, chunk workers
+        avg_chunks = requests / len(planned) if planned else 1
+        concurrency = self.workers * max(1, min(self.chunk_workers, round(avg_chunks)))
+        latency_minutes = requests * self.PLAN_REQUEST_SECONDS / 60 / concurrency
+
+        bounds = {"rpm": rpm_minutes, "tpm": tpm_minutes, "latency": latency_minutes}
+        limited_by = max(bounds, key=bounds.get)
+        return {
+            "minutes": round(bounds[limited_by], 1),
+            "limited_by": limited_by,
+            "rpm_limit": self.llm._rpm_limit,
+            "tpm_limit": self.llm._tpm_limit,
+            "reserved_tokens": reserved_tokens,
+            "concurrency": concurrency,
+            "request_seconds": self.PLAN_REQUEST_SECONDS,
+        }
+
+    @staticmethod
+    def print_plan(plan: Dict[str, Any]) -> None:
+        """Print a human-readable summary of a generation plan."""
+        totals = plan["totals"]
+        estimate = plan["estimate"]
+        print(f"\n[PLAN] {totals['files_to_generate']} of {totals['files_matched']} file(s) to regenerate "
+              f"({totals['files_unchanged']} unchanged)")
+        print(f"[PLAN] {totals['chunks']} chunk(s), {totals['requests']} LLM request(s)"
+              f"{' including merge calls' if plan.get('reduce') else ''}")
+        if totals.get("files_deferred"):
+            print(f"[PLAN] {totals['files_deferred']} lower-priority file(s) deferred by the quota budget")
+        if totals.get("packed_requests"):
+            packed_files = sum(1 for f in plan["files"] if f.get("packed"))
+            print(f"[PLAN] {packed_files} small file(s) packed into {totals['packed_requests']} request(s)")
+        print(f"[PLAN] {plan['model']}: ~{totals['input_tokens']:,} input tokens, "
+              f"~{totals['output_tokens']:,} output tokens")
+
+        minutes = estimate["minutes"]
+        hours, mins = divmod(int(round(minutes)), 60)
+        duration = f"{hours}h {mins}m" if hours else f"{minutes:.1f}m"
+        limits = {
+            "rpm": f"RPM limit {estimate['rpm_limit']}/min",
+            "tpm": f"TPM limit {estimate['tpm_limit']}/min",
+            "latency": f"~{estimate['request_seconds']:.0f}s per request x {estimate['concurrency']} concurrent",
+        }
+        print(f"[PLAN] Estimated wall time: {duration} (bound by {limits[estimate['limited_by']]})")
+
+        largest = sorted(plan["files"], key=lambda f: f["input_tokens"], reverse=True)[:10]
+        if largest:
+            print("[PLAN] Largest files:")
+            for f in largest:
+                print(f"   {f['path']}: {f['chunks']} chunk(s), {f['requests']} request(s), "
+                      f"~{f['input_tokens']:,} input tokens")
+
+    def run_plan(self, plan: Dict[str, Any]) -> None:
+        """
+        Execute a plan produced by plan() (e.g. loaded from --plan-out JSON).
+
+        Only the planned files are processed, in plan order. They go through
+        the usual cache checks, so a file generated since the plan was made
+        is skipped and one edited since is generated from its current content.
+        Under a quota budget, files are no longer started once the budget
+        would be exceeded, and deferred files are saved as the backlog.
+
+        Args:
+            plan: Plan dictionary.
+        """
+        print(f"[INFO] Executing plan from {plan.get('created_at', 'unknown time')} "
+              f"({len(plan['files'])} file(s))")
+        self._load_cache()
+        self._load_prompts()
+
+        files = []
+        for entry in plan["files"]:
+            file_path = self.root_dir / entry["path"]
+            if not file_path.is_file():
+                print(f"[WARNING] Planned file no longer exists: {entry['path']}")
+                continue
+            files.append(file_path)
+
+        if self.cache:
+            self._fingerprints = ChangeDetector(self.root_dir).fingerprints(files)
+
+        budget = None
+        if self.max_requests is not None or self.max_tokens is not None:
+            budget = QuotaBudget(self.llm, self.max_requests, self.max_tokens, self.scheduler.costs(plan["files"]))
+        self._generate_files(files, budget=budget)
+
+        if budget:
+            # Files deferred at plan time or at run time become the next run's backlog
+            deferred = plan.get("deferred", []) + [e for e in plan["files"] if e["path"] in budget.deferred]
+            deferred.sort(key=lambda e: -e.get("priority", 0.0))
+            self.scheduler.save_backlog(plan, deferred)
+
+    def enqueue(self, queue_path: Path, patterns: Optional[List[str]] = None,
+                plan: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Fill a shared work queue for distributed generation (see work()).
+
+        Files come from a plan (in plan order) or from scanning `patterns`;
+        with patterns, only files whose fingerprint changed are enqueued,
+        in priority order.
+
+        Args:
+            queue_path: Path to the queue database.
+            patterns: Glob patterns to scan (ignored when a plan is given).
+            plan: Plan dictionary from plan().
+
+        Returns:
+            Number of files (re)queued.
+        """
+        if plan is not None:
+            paths = [entry["path"] for entry in plan["files"]]
+        else:
+            print(f"[INFO] Scanning from: {self.root_dir}")
+            self._load_cache()
+            try:
+                files = self.scheduler.order(self._select_candidates(self.scan_files(patterns or [])))
+            finally:
+                self._save_cache()
+            paths = [f.relative_to(self.root_dir).as_posix() for f in files]
+
+        queue = WorkQueue(queue_path)
+        try:
+            queued = queue.enqueue(paths)
+            counts = queue.counts()
         finally:
-            self._save_cache()
+            queue.close()
+        print(f"[QUEUE] Enqueued {queued} of {len(paths)} file(s) in {queue_path} "
+              f"({counts['pending']} pending, {counts['leased']} leased)")
+        return queued
+
+    def work(
+        self,
+        queue_path: Path,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 900.0,
+        max_attempts: int = 3,
+    ) -> Tuple[int, int]:
+        """
+        Process files from a shared work queue until none can be claimed.
+
+        Any number of workers (processes, containers or machines sharing the
+        checkout) may run against one queue. Files are claimed in batches
+        under a lease that a background thread keeps renewing; if a worker
+        dies, its files are reclaimed by other workers once the lease
+        expires. Docs are written with an atomic rename and cache entries are
+        committed per file, so a file finished twice is harmless.
 
-        print(f"\n[DONE] Generation complete: {success_count} generated, {skip_count} skipped")
+        Args:
+            queue_path: Path to the queue database.
+            worker_id: Lease owner name (default: host-pid).
+            lease_seconds: Lease duration; renewed every third of it.
+            max_attempts: Claims after which a file that keeps failing is
+                          marked failed instead of being requeued.
+
+        Returns:
+            (completed, failed) counts for this worker.
+        """
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        batch_size = max(self.workers * 2, self.PACK_MAX_FILES if self.pack else 1)
+        print(f"[QUEUE] Worker {worker_id} using {queue_path}")
+
+        self._load_cache()
+        self._load_prompts()
+        queue = WorkQueue(queue_path)
+        held: Set[str] = set()
+        held_lock = threading.Lock()
+        stop = threading.Event()
+        completed = 0
+        failed = 0
+
+        def heartbeat():
+            # Own connection: WorkQueue instances are not shared between threads
+            renewer = WorkQueue(queue_path)
+            try:
+                while not stop.wait(lease_seconds / 3):
+                    with held_lock:
+                        paths = list(held)
+                    if paths:
+                        lost = set(paths) - set(renewer.renew(worker_id, paths, lease_seconds))
+                        for path in sorted(lost):
+                            print(f"[WARNING] Lease on {path} was reclaimed by another worker")
+            finally:
+                renewer.close()
+
+        def finish(file_path: Path, doc: Optional[str], content: Optional[str]) -> None:
+            nonlocal completed, failed
+            relative_path = file_path.relative_to(self.root_dir).as_posix()
+            error = None
+            if not doc and content and content.strip():
+                # Nothing new was written: fine if the cached doc is current, else the LLM failed
+                entry = self.cache.get_file(relative_path) if self.cache else None
+                content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+                if not entry or entry.get("hash") != content_hash:
+                    error = "no content generated"
+            elif content is None and self._find_adapter(file_path):
+                error = "source could not be read"
+
+            if error:
+                status = queue.fail(worker_id, relative_path, error, max_attempts)
+                if status == "failed":
+                    print(f"   [ERROR] Giving up on {relative_path} after {max_attempts} attempt(s)")
+                failed += 1
+            else:
+                queue.complete(worker_id, relative_path)
+                completed += 1
+            with held_lock:
+                held.discard(relative_path)
+
+        renewer_thread = threading.Thread(target=heartbeat, daemon=True)
+        renewer_thread.start()
+        try:
+            while True:
+                paths = queue.claim(worker_id, lease_seconds, batch_size)
+                if not paths:
+                    break
+                print(f"[QUEUE] Claimed {len(paths)} file(s)")
+                with held_lock:
+                    held.update(paths)
+
+                files = []
+                for path in paths:
+                    file_path = self.root_dir / path
+                    if file_path.is_file():
+                        files.append(file_path)
+                    else:
+                        print(f"[WARNING] Queued file no longer exists: {path}")
+                        queue.complete(worker_id, path)
+                        with held_lock:
+                            held.discard(path)
+
+                if self.cache:
+                    self._fingerprints.update(ChangeDetector(self.root_dir).fingerprints(files))
+                self._process_files(files, on_result=finish)
+
+            counts = queue.counts()
+        finally:
+            stop.set()
+            renewer_thread.join()
+            queue.close()
+            if self.cache:
+                self.cache.close()
+                self.cache = None
+
+        print(f"\n[DONE] Worker {worker_id}: {completed} completed, {failed} failed; queue has "
+              f"{counts['pending']} pending, {counts['leased']} leased by other workers, "
+              f"{counts['done']} done, {counts['failed']} failed")
+        return completed, failed
@@ -0,0 +1,205 @@
+# generation/scanner.py
+"""
+Single-pass source file scanner for documentation generation.
+
+Include patterns, ``!`` exclusions, ignored directory names and the root
+``.gitignore`` are compiled once into one matcher. The tree is walked a
+single time, and directories that can never yield a match are pruned
+before descending (e.g. ``node_modules`` under ``!**/node_modules/**``).
+
+Patterns follow ``glob.glob(recursive=True)`` semantics relative to the
+root: ``**`` spans any number of directories, and wildcards do not match
+names starting with a dot unless the pattern spells the dot out.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Pattern, Set
+
+import pathspec
+
+
+def _translate_segment(segment: str) -> str:
+    """Translate one glob path segment (no slashes) into a regex."""
+    out = []
+    i = 0
+    while i < len(segment):
+        c = segment[i]
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            # Bracket expression; "]" right after "[" or "[!" is a literal member
+            j = i + 1
+            if segment[j:j + 1] == "!":
+                j += 1
+            if segment[j:j + 1] == "]":
+                j += 1
+            end = segment.find("]", j)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = segment[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    # Hidden names only match a pattern segment that starts with a literal dot
+    prefix = "" if segment.startswith(".") else r"(?!\.)"
+    return prefix + "".join(out)
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translate a recursive glob pattern (relative, "/" separated) into a regex
+    matching relative POSIX paths.
+    """
+    segments = [s for s in pattern.strip("/").split("/") if s]
+    parts = []
+    for idx, segment in enumerate(segments):
+        last = idx == len(segments) - 1
+        if segment == "**":
+            # Zero or more directories; as the last segment, anything below
+            parts.append(r"(?:(?!\.)[^/]+/)*(?!\.)[^/]+" if last else r"(?:(?!\.)[^/]+/)*")
+        else:
+            parts.append(_translate_segment(segment) + ("" if last else "/"))
+    return "".join(parts)
+
+
+def _compile_segments(pattern: str) -> List[Optional[Pattern[str]]]:
+    """Per-segment regexes of a pattern; None stands for a "**" segment."""
+    return [
+        None if segment == "**" else re.compile(_translate_segment(segment) + r"\Z")
+        for segment in pattern.strip("/").split("/") if segment
+    ]
+
+
+class FileScanner:
+    """
+    Compiled include/exclude matcher with a pruning directory walk.
+    """
+
+    def __init__(
+        self,
+        root_dir: Path,
+        patterns: List[str],
+        ignored_dirs: Iterable[str] = (),
+        gitignore_spec: Optional[pathspec.PathSpec] = None,
+    ):
+        """
+        Compile the patterns.
+
+        Args:
+            root_dir: Directory patterns are relative to.
+            patterns: Glob patterns; entries starting with "!" exclude.
+            ignored_dirs: Directory names never descended into.
+            gitignore_spec: Parsed root .gitignore, if any.
+        """
+        self.root_dir = Path(root_dir)
+        self.ignored_dirs: Set[str] = set(ignored_dirs)
+        self.gitignore_spec = gitignore_spec
+
+        includes = [p for p in patterns if not p.startswith("!")]
+        excludes = [p[1:] for p in patterns if p.startswith("!")]
+
+        self._include = self._compile(includes)
+        self._exclude = self._compile(excludes)
+
+        # "<dir pattern>/**" exclusions drop whole directories, so they can be pruned
+        self._exclude_dirs = self._compile(
+            [p.rstrip("/")[:-3] for p in excludes if p.rstrip("/").endswith("/**") and p.rstrip("/")[:-3]]
+        )
+
+        # Used to prune directories that no include pattern can reach
+        self._include_segments = [_compile_segments(p) for p in includes]
+
+    @staticmethod
+    def _compile(patterns: List[str]) -> Optional[Pattern[str]]:
+        """Combine glob patterns into one anchored regex (None if there are none)."""
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{glob_to_regex(p)})" for p in patterns) + r"\Z")
+
+    def _may_contain_matches(self, parts: List[str]) -> bool:
+        """True if some include pattern can match below the directory `parts`."""
+        for segments in self._include_segments:
+            last = len(segments) - 1
+
+            def closure(states):
+                # A "**" may match zero directories
+                out = set(states)
+                for i in states:
+                    while i < last and segments[i] is None:
+                        i += 1
+                        out.add(i)
+                return out
+
+            states = closure({0})
+            for part in parts:
+                advanced = set()
+                for i in states:
+                    if segments[i] is None:
+                        if not part.startswith("."):
+                            advanced.add(i)
+                    elif i < last and segments[i].match(part):
+                        advanced.add(i + 1)
+                states = closure(advanced)
+                if not states:
+                    break
+            if states:
+                return True
+        return False
+
+    def _prune_dir(self, rel_dir: str, name: str) -> bool:
+        """Decide whether a directory (relative POSIX path) can be skipped entirely."""
+        if name in self.ignored_dirs:
+            return True
+        if self._exclude_dirs and self._exclude_dirs.match(rel_dir):
+            return True
+        if self.gitignore_spec and self.gitignore_spec.match_file(rel_dir + "/"):
+            return True
+        return not self._may_contain_matches(rel_dir.split("/"))
+
+    def _keep_file(self, rel_path: str) -> bool:
+        """Apply include, exclude and .gitignore rules to a file path."""
+        if not self._include or not self._include.match(rel_path):
+            return False
+        if self._exclude and self._exclude.match(rel_path):
+            return False
+        if self.gitignore_spec and self.gitignore_spec.match_file(rel_path):
+            return False
+        return True
+
+    def scan(self) -> List[Path]:
+        """
+        Walk the tree once.
+
+        Returns:
+            Sorted list of matching file paths.
+        """
+        matched = []
+        stack = [("", str(self.root_dir))]
+        while stack:
+            rel_dir, abs_dir = stack.pop()
+            try:
+                entries = os.scandir(abs_dir)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        # Directory symlinks are not followed (avoids cycles)
+                        if entry.is_dir(follow_symlinks=False):
+                            if not self._prune_dir(rel_path, entry.name):
+                                stack.append((rel_path, entry.path))
+                        elif entry.is_file() and self._keep_file(rel_path):
+                            matched.append(Path(entry.path))
+                    except OSError:
+                        continue
+        return sorted(matched)
@@ -0,0 +1,350 @@
+# generation/scheduler.py
+"""
+Priority scheduling for documentation generation under an LLM quota.
+
+Files are ordered by a weighted priority score, so the most valuable docs
+refresh first on every run:
+
+- recency:        recently changed files (exponential decay by age)
+- adr_references: files whose path is mentioned in an ADR
+- small_files:    cheaper files, so more docs complete per quota window
+- backlog:        files deferred by an earlier budgeted run (no starvation)
+
+The sum is multiplied by the first matching entry of ``package_weights``
+(glob pattern -> weight, default 1.0).
+
+With a request or token budget, files are admitted in priority order while
+their estimated cost fits. Files that do not fit are deferred to a backlog,
+which is a plan file (resumable with ``--from-plan``) and boosts the same
+files on the next run.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from knowledge.generation.change_detector import ChangeDetector
+from knowledge.generation.scanner import FileScanner, glob_to_regex
+
+DEFAULT_PRIORITY = {
+    "recency": 1.0,
+    "recency_half_life_days": 14,
+    "adr_references": 1.0,
+    "small_files": 0.25,
+    "small_file_bytes": 4000,
+    "backlog": 0.5,
+    "package_weights": {},
+    "adr_patterns": [
+        "docs/**/adr/**/*.md",
+        "docs/**/ADR-*.md",
+        "packages/**/adr/**/*.md",
+    ],
+}
+
+
+class PriorityScheduler:
+    """
+    Scores, orders and budgets generation candidates.
+    """
+
+    def __init__(self, root_dir: Path, settings: Optional[Dict[str, Any]] = None,
+                 backlog_path: Optional[Path] = None, ignored_dirs: Set[str] = frozenset()):
+        """
+        Initialize the scheduler.
+
+        Args:
+            root_dir: Repository root the generator scans.
+            settings: Overrides for DEFAULT_PRIORITY (``generation_priority`` in config.json).
+            backlog_path: Backlog plan file written by budgeted runs.
+            ignored_dirs: Directory names skipped when looking for ADRs.
+        """
+        self.root_dir = Path(root_dir)
+        self.settings = {**DEFAULT_PRIORITY, **(settings or {})}
+        self.backlog_path = Path(backlog_path) if backlog_path else None
+        self.ignored_dirs = set(ignored_dirs)
+        self._package_weights = [
+            (re.compile(glob_to_regex(pattern) + r"\Z"), float(weight))
+            for pattern, weight in self.settings["package_weights"].items()
+        ]
+
+    def _adr_texts(self) -> Tuple[str, Dict[str, str]]:
+        """
+        Read all ADR documents for reference lookups.
+
+        Returns:
+            (all ADR text, {package directory: text of that package's ADRs})
+        """
+        texts = []
+        by_package: Dict[str, List[str]] = {}
+        for path in FileScanner(self.root_dir, self.settings["adr_patterns"], self.ignored_dirs).scan():
+            try:
+                text = path.read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            texts.append(text)
+            package = self._package_dir(path.relative_to(self.root_dir).as_posix())
+            if package:
+                by_package.setdefault(package, []).append(text)
+        return "\n".join(texts), {package: "\n".join(t) for package, t in by_package.items()}
+
+    @staticmethod
+    def _package_dir(relative_path: str) -> Optional[str]:
+        """Return "packages/<name>" for paths inside a package, else None."""
+        parts = relative_path.split("/")
+        return "/".join(parts[:2]) if len(parts) > 2 and parts[0] == "packages" else None
+
+    def load_backlog(self) -> Dict[str, Any]:
+        """Return the backlog plan ({"files": [...], ...}), or an empty one."""
+        if not self.backlog_path or not self.backlog_path.exists():
+            return {"files": []}
+        try:
+            return json.loads(self.backlog_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read generation backlog {self.backlog_path}: {e}")
+            return {"files": []}
+
+    def save_backlog(self, plan: Dict[str, Any], deferred: List[Dict[str, Any]]) -> None:
+        """
+        Write deferred plan entries as the new backlog (removed when empty).
+
+        Args:
+            plan: Plan the entries come from (for its metadata).
+            deferred: Deferred per-file plan entries, in priority order.
+        """
+        if not self.backlog_path:
+            return
+        if not deferred:
+            if self.backlog_path.exists():
+                self.backlog_path.unlink()
+            return
+        backlog = {key: value for key, value in plan.items() if key not in ("files", "deferred", "totals", "estimate")}
+        backlog["files"] = deferred
+        self.backlog_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.backlog_path.with_name(self.backlog_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(backlog, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.backlog_path)
+        print(f"[SCHEDULE] {len(deferred)} file(s) deferred to {self.backlog_path.name}")
+
+    def _package_weight(self, relative_path: str) -> float:
+        """Weight of the first package_weights pattern matching the path (1.0 if none)."""
+        for pattern, weight in self._package_weights:
+            if pattern.match(relative_path):
+                return weight
+        return 1.0
+
+    def scores(self, files: List[Path]) -> Dict[str, float]:
+        """
+        Compute the priority score of each file.
+
+        Args:
+            files: Absolute paths under root_dir.
+
+        Returns:
+            {relative_path: score}; higher runs first.
+        """
+        s = self.settings
+        now = time.time()
+        half_life = max(float(s["recency_half_life_days"]), 0.01)
+
+        changed = ChangeDetector(self.root_dir).last_changed(files, since_days=half_life * 4) \
+            if s["recency"] else {}
+        adr_text, package_adr_text = self._adr_texts() if s["adr_references"] else ("", {})
+        backlog = {entry["path"] for entry in self.load_backlog().get("files", [])} if s["backlog"] else set()
+
+        result = {}
+        for file_path in files:
+            relative_path = file_path.relative_to(self.root_dir).as_posix()
+            score = 0.0
+
+            if relative_path in changed:
+                age_days = max(0.0, now - changed[relative_path]) / 86400
+                score += s["recency"] * math.pow(0.5, age_days / half_life)
+
+            if adr_text:
+                # ADRs cite paths from the repository root, or relative to their own package
+                refs = adr_text.count(relative_path)
+                package = self._package_dir(relative_path)
+                if not refs and package in package_adr_text:
+                    refs = package_adr_text[package].count(relative_path[len(package) + 1:])
+                score += s["adr_references"] * min(refs, 3) / 3
+
+            if s["small_files"]:
+                try:
+                    size = file_path.stat().st_size
+                except OSError:
+                    size = 0
+                score += s["small_files"] / (1 + size / s["small_file_bytes"])
+
+            if relative_path in backlog:
+                score += s["backlog"]
+
+            result[relative_path] = score * self._package_weight(relative_path)
+        return result
+
+    def order(self, files: List[Path], scores: Optional[Dict[str, float]] = None) -> List[Path]:
+        """
+        Sort files by priority (highest first, path order on ties).
+
+        Args:
+            files: Absolute paths under root_dir.
+            scores: Precomputed scores (computed if omitted).
+
+        Returns:
+            Files in scheduling order.
+        """
+        scores = scores if scores is not None else self.scores(files)
+        return sorted(
+            files,
+            key=lambda f: (-scores.get(f.relative_to(self.root_dir).as_posix(), 0.0), f),
+        )
+
+    @staticmethod
+    def costs(entries: List[Dict[str, Any]]) -> Dict[str, Tuple[float, int]]:
+        """
+        Estimated cost of each plan entry.
+
+        Args:
+            entries: Per-file plan entries.
+
+        Returns:
+            {path: (requests, tokens)}; packed files share their group's request.
+        """
+        pack_sizes: Dict[int, int] = {}
+        for entry in entries:
+            if entry.get("packed"):
+                pack_sizes[entry["pack_group"]] = pack_sizes.get(entry["pack_group"], 0) + 1
+        return {
+            entry["path"]: (
+                1 / pack_sizes[entry["pack_group"]] if entry.get("packed") else entry["requests"],
+                entry["input_tokens"] + entry["output_tokens"],
+            )
+            for entry in entries
+        }
+
+    def admit(
+        self,
+        entries: List[Dict[str, Any]],
+        max_requests: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Admit plan entries in priority order while their estimated cost fits.
+
+        An entry that does not fit is deferred, but cheaper entries after it
+        may still be admitted, so the budget completes as many files as it can.
+
+        Args:
+            entries: Per-file plan entries, already in priority order.
+            max_requests: Request budget (None = unlimited).
+            max_tokens: Token budget, prompt plus completion (None = unlimited).
+
+        Returns:
+            (admitted, deferred) entries, each in priority order.
+        """
+        costs = self.costs(entries)
+        admitted, deferred = [], []
+        used_requests = 0.0
+        used_tokens = 0
+        for entry in entries:
+            requests, tokens = costs[entry["path"]]
+            if (max_requests is not None and used_requests + requests > max_requests) or \
+                    (max_tokens is not None and used_tokens + tokens > max_tokens):
+                deferred.append(entry)
+                continue
+            used_requests += requests
+            used_tokens += tokens
+            admitted.append(entry)
+        return admitted, deferred
+
+
+class QuotaBudget:
+    """
+    Runtime guard that stops starting files before the quota runs out.
+
+    Estimates are only estimates (retries, failed pack splits), so before
+    each file the client's actual usage plus the estimates of files still
+    in flight is checked against the budget. Packed requests are admitted
+    the same way, as one request for all their files; files split out of a
+    pack are then prepaid and start without being charged again.
+    """
+
+    def __init__(self, llm, max_requests: Optional[int] = None, max_tokens: Optional[int] = None,
+                 costs: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        Args:
+            llm: LLMClient whose usage counters are checked.
+            max_requests: Request budget for the run (None = unlimited).
+            max_tokens: Token budget for the run (None = unlimited).
+            costs: {relative_path: (requests, tokens)} estimates.
+        """
+        self.llm = llm
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.costs = costs or {}
+        self.deferred: Set[str] = set()
+        self.prepaid: Set[str] = set()
+        self._inflight: Dict[Any, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._start_requests = llm.requests_sent
+        self._start_tokens = llm.tokens_sent
+
+    def _fits(self, requests: float, tokens: int) -> bool:
+        """Whether a cost fits next to actual usage and in-flight estimates (called with the lock held)."""
+        spent_requests = self.llm.requests_sent - self._start_requests + sum(r for r, _ in self._inflight.values())
+        spent_tokens = self.llm.tokens_sent - self._start_tokens + sum(t for _, t in self._inflight.values())
+        return not self.llm.quota_exhausted \
+            and (self.max_requests is None or spent_requests + requests <= self.max_requests) \
+            and (self.max_tokens is None or spent_tokens + tokens <= self.max_tokens)
+
+    def try_start(self, relative_path: str) -> bool:
+        """Reserve the file's estimated cost; False (and deferred) if it does not fit."""
+        with self._lock:
+            if relative_path in self.prepaid:
+                # Its packed request is already counted in the client's usage
+                return True
+            requests, tokens = self.costs.get(relative_path, (1, 0))
+            if not self._fits(requests, tokens):
+                self.deferred.add(relative_path)
+                return False
+            self._inflight[relative_path] = (requests, tokens)
+            return True
+
+    def finish(self, relative_path: str) -> None:
+        """Release a started file's reservation (its real usage is now counted)."""
+        with self._lock:
+            self._inflight.pop(relative_path, None)
+
+    def try_start_pack(self, relative_paths: List[str]) -> bool:
+        """
+        Reserve one packed request for several files.
+
+        Args:
+            relative_paths: Files in the pack.
+
+        Returns:
+            False if the request does not fit; the files are then left to
+            try_start one by one (nothing is deferred here).
+        """
+        tokens = sum(self.costs.get(path, (1, 0))[1] for path in relative_paths)
+        with self._lock:
+            if not self._fits(1, tokens):
+                return False
+            self._inflight[tuple(relative_paths)] = (1, tokens)
+            return True
+
+    def finish_pack(self, relative_paths: List[str], packed: Iterable[str]) -> None:
+        """
+        Release a pack's reservation and mark the files it produced as prepaid.
+
+        Args:
+            relative_paths: Files in the pack (as given to try_start_pack).
+            packed: Files whose document was split out of the response.
+        """
+        with self._lock:
+            self._inflight.pop(tuple(relative_paths), None)
+            self.prepaid.update(packed)
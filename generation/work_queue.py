@@ -0,0 +1,243 @@
+# generation/work_queue.py
+"""
+Shared work queue for distributed documentation generation.
+
+A planner enqueues source paths once; any number of worker processes (on
+one machine or on several machines sharing a checkout) claim items under a
+time-limited lease. A worker that dies stops renewing its leases, and once
+a lease expires the item is handed to the next worker that asks.
+
+The queue is a SQLite database. Claims run in an IMMEDIATE transaction, so
+two workers can never lease the same item. On a local disk it uses WAL mode;
+WAL relies on memory shared by the processes of one host, so on a network
+filesystem (or with GLASSOPS_SQLITE_JOURNAL=delete, see
+utils/sqlite_journal.py) it uses the rollback journal instead, which locks
+through the file system. Such storage must have working file locks.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from knowledge.utils import configure_journal
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    path TEXT PRIMARY KEY,          -- source path relative to the repository root
+    status TEXT NOT NULL,           -- pending | leased | done | failed
+    worker TEXT,                    -- lease owner
+    lease_expires REAL,             -- unix time the lease runs out
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    seq INTEGER NOT NULL,           -- enqueue order
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_status ON items(status, seq);
+"""
+
+
+class WorkQueue:
+    """
+    SQLite-backed queue of source files with leased claims.
+
+    Each process opens its own WorkQueue; instances are not shared between threads.
+    """
+
+    def __init__(self, db_path: Path, timeout: float = 30.0):
+        """
+        Open (or create) the queue database.
+
+        Args:
+            db_path: Path to the SQLite file.
+            timeout: Seconds to wait for another process's write lock.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(str(self.db_path), timeout=timeout, isolation_level=None)
+        # WAL on a local disk, the rollback journal on shared storage
+        self.journal_mode = configure_journal(self.conn, self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.conn.close()
+
+    def _transaction(self):
+        """Start a write transaction that holds the database lock until commit."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def enqueue(self, paths: Iterable[str]) -> int:
+        """
+        Add source paths to the queue.
+
+        New paths and paths that finished (done or failed) become pending
+        again; paths that are pending or under a live lease are left alone.
+
+        Args:
+            paths: Source paths relative to the repository root, in work order.
+
+        Returns:
+            Number of paths that were (re)queued.
+        """
+        now = time.time()
+        queued = 0
+        conn = self._transaction()
+        try:
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM items").fetchone()[0]
+            for path in paths:
+                row = conn.execute("SELECT status FROM items WHERE path = ?", (path,)).fetchone()
+                if row and row[0] in ("pending", "leased"):
+                    continue
+                seq += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO items (path, status, worker, lease_expires, attempts, error, seq, updated_at) "
+                    "VALUES (?, 'pending', NULL, NULL, 0, NULL, ?, ?)",
+                    (path, seq, now),
+                )
+                queued += 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return queued
+
+    def claim(self, worker: str, lease_seconds: float, limit: int = 1) -> List[str]:
+        """
+        Lease up to `limit` items for a worker.
+
+        Pending items are handed out in enqueue order, then items whose lease
+        has expired (their worker stopped renewing it).
+
+        Args:
+            worker: Worker identifier recorded as the lease owner.
+            lease_seconds: Lease duration.
+            limit: Maximum number of items to claim.
+
+        Returns:
+            Claimed source paths (empty when nothing is available).
+        """
+        now = time.time()
+        conn = self._transaction()
+        try:
+            rows = conn.execute(
+                "SELECT path FROM items "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                "ORDER BY status = 'leased', seq LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            paths = [row[0] for row in rows]
+            conn.executemany(
+                "UPDATE items SET status = 'leased', worker = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE path = ?",
+                [(worker, now + lease_seconds, now, path) for path in paths],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return paths
+
+    def renew(self, worker: str, paths: Iterable[str], lease_seconds: float) -> List[str]:
+        """
+        Extend the leases a worker still holds.
+
+        Args:
+            worker: Lease owner.
+            paths: Claimed source paths.
+            lease_seconds: New lease duration from now.
+
+        Returns:
+            Paths whose lease was renewed; the others were reclaimed by
+            another worker after expiring.
+        """
+        now = time.time()
+        renewed = []
+        conn = self._transaction()
+        try:
+            for path in paths:
+                cursor = conn.execute(
+                    "UPDATE items SET lease_expires = ?, updated_at = ? "
+                    "WHERE path = ? AND status = 'leased' AND worker = ?",
+                    (now + lease_seconds, now, path, worker),
+                )
+                if cursor.rowcount:
+                    renewed.append(path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return renewed
+
+    def complete(self, worker: str, path: str) -> bool:
+        """
+        Mark a leased item done.
+
+        Args:
+            worker: Lease owner.
+            path: Source path.
+
+        Returns:
+            False if the worker no longer held the lease (the item was
+            reclaimed); its output is still valid, since outputs and cache
+            entries are written atomically.
+        """
+        cursor = self.conn.execute(
+            "UPDATE items SET status = 'done', lease_expires = NULL, error = NULL, updated_at = ? "
+            "WHERE path = ? AND status = 'leased' AND worker = ?",
+            (time.time(), path, worker),
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, worker: str, path: str, error: str, max_attempts: int = 3) -> str:
+        """
+        Release a leased item after a failed attempt.
+
+        Args:
+            worker: Lease owner.
+            path: Source path.
+            error: Short failure description.
+            max_attempts: Attempts after which the item is marked failed
+                          instead of going back to pending.
+
+        Returns:
+            The item's new status ("pending" or "failed"), or "" if the
+            worker no longer held the lease.
+        """
+        conn = self._transaction()
+        try:
+            row = conn.execute(
+                "SELECT attempts FROM items WHERE path = ? AND status = 'leased' AND worker = ?",
+                (path, worker),
+            ).fetchone()
+            status = ""
+            if row:
+                status = "failed" if row[0] >= max_attempts else "pending"
+                conn.execute(
+                    "UPDATE items SET status = ?, worker = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                    "WHERE path = ?",
+                    (status, error, time.time(), path),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Return the number of items per status.
+
+        Returns:
+            {"pending", "leased", "done", "failed"} counts.
+        """
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update(dict(self.conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status")))
+        return counts
+
+    def next_expiry(self) -> Optional[float]:
+        """Return the earliest lease expiry among leased items, or None."""
+        row = self.conn.execute("SELECT MIN(lease_expires) FROM items WHERE status = 'leased'").fetchone()
+        return row[0]
@@ -3,8 +3,13 @@
 
 from .federated_loader import discover_and_chunk_docs
 from .index_builder import build_or_update_index
+from .summarizer import summarize_chunks
+from .index_store import current_generation_dir, staged_generation
 
 __all__ = [
     "discover_and_chunk_docs",
-    "build_or_update_index"
+    "build_or_update_index",
+    "summarize_chunks",
+    "current_generation_dir",
+    "staged_generation"
 ]
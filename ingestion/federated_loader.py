@@ -108,8 +108,10 @@ def discover_and_chunk_docs(root_dir: str = ".") -> List[Dict]:
                     "hash": hash_content(chunk_text)
                 }
                 
-                # Merge frontmatter metadata
-                doc_record.update(metadata)
+                # Merge frontmatter metadata; a generated doc's frontmatter carries its
+                # source file's hash, which must not replace the chunk's own fields
+                for key, value in (metadata or {}).items():
+                    doc_record.setdefault(key, value)
                 
                 docs.append(doc_record)
 
@@ -3,66 +3,78 @@
 
 import chromadb
 from chromadb.config import Settings
-import os
+from knowledge.rag.filters import path_prefix_fields, update_facets
+from knowledge.ingestion.index_versions import active_version, get_version_collection
+from knowledge.ingestion.index_store import close_chroma_client, current_generation_dir, staged_generation
 
 def build_or_update_index(embeddings):
     """
     embeddings: list of tuples (doc_dict, embedding_vector)
+    The update is written into a staged copy of the index and published atomically,
+    so queries keep serving the previous generation until the new one is complete.
     """
-    persist_dir = os.path.join(os.getcwd(), "glassops_index")
-    
-    # Initialize Chroma Client with persistence
-    client = chromadb.PersistentClient(path=persist_dir)
-    
-    # Create or get collection
-    collection = client.get_or_create_collection(
-        name="glassops_knowledge",
-        metadata={"hnsw:space": "cosine"}
-    )
-    
-    print(f"DEBUG: Using ChromaDB at {persist_dir}")
-    
+    if not embeddings:
+        print("No documents to index.")
+        return
+
+    # Check against the active embedding version (tagged with model + dimension)
+    active_name, active_info = active_version(current_generation_dir())
+    dimension = len(embeddings[0][1])
+    if active_info.get("dimension") not in (None, dimension):
+        print(f"[ERROR] Embeddings have dimension {dimension} but active index version {active_name} "
+              f"expects {active_info['dimension']}. Use --migrate-embeddings to switch models.")
+        return
+
     ids = []
     documents = []
     metadatas = []
     embedding_vectors = []
-    
+
     for doc, emb in embeddings:
         # doc is { "path": ..., "content": ..., "hash": ... }
         doc_id = doc["hash"] # Use hash as ID to avoid duplicates? Or path?
-        # Better to combine path + hash if we want versions, 
+        # Better to combine path + hash if we want versions,
         # but for now let's use path as ID to overwrite/update easiest.
         # Actually using hash as ID makes it immutable-ish.
         # Let's use path for update-in-place behavior.
-        
-        ids.append(doc["path"]) 
+
+        ids.append(doc["path"])
         documents.append(doc["content"])
-        
+
         # Merge system metadata with extracted doc metadata
         meta = {
-            "path": doc["path"], 
+            "path": doc["path"],
             "hash": doc["hash"]
         }
         # Copy relevant fields from doc if present (excluding content/path/hash which are handled)
         for k, v in doc.items():
             if k not in ["content", "path", "hash"] and isinstance(v, (str, int, float, bool)):
                 meta[k] = v
-                
+        # Directory prefixes enable path-prefix filters at query time
+        meta.update(path_prefix_fields(doc.get("source_file", doc["path"])))
+
         metadatas.append(meta)
         embedding_vectors.append(emb)
 
-    if not ids:
-        print("No documents to index.")
-        return
-
-    # ChromaDB upsert
+    # ChromaDB upsert into a staged generation; a failure discards the staging copy
     try:
-        collection.upsert(
-            ids=ids,
-            embeddings=embedding_vectors,
-            documents=documents,
-            metadatas=metadatas
-        )
+        with staged_generation() as persist_dir:
+            # Initialize Chroma Client with persistence
+            client = chromadb.PersistentClient(path=persist_dir)
+            try:
+                collection, name = get_version_collection(client, persist_dir, active_info["model"], dimension)
+                print(f"DEBUG: Using ChromaDB at {persist_dir} (collection {name})")
+
+                collection.upsert(
+                    ids=ids,
+                    embeddings=embedding_vectors,
+                    documents=documents,
+                    metadatas=metadatas
+                )
+                update_facets(persist_dir, metadatas)
+            finally:
+                # Flush and release the staging dir's handles before it is published
+                close_chroma_client(client)
         print(f"[SUCCESS] Successfully indexed {len(ids)} documents in ChromaDB.")
     except Exception as e:
         print(f"[ERROR] Error indexing documents: {e}")
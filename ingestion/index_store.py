@@ -0,0 +1,137 @@
+# index_store.py
+# Generation-based index layout so readers never see a half-written index:
+#
+#   glassops_index/
+#     CURRENT                  <- name of the generation readers use (replaced atomically)
+#     generations/<timestamp>/ <- complete Chroma persist dirs
+#     migrations/<model>/      <- re-embedded vectors of an embedding migration in progress
+#     drift_snapshot.npz, drift_history.sqlite (shared across generations)
+#
+# Writers copy the current generation into a new directory, update it there and
+# then publish it by replacing CURRENT. Readers resolve CURRENT per query, so
+# in-flight queries finish on the previous generation while new ones use the new.
+#
+# The copy is a full copy of the current generation (Chroma updates its sqlite and
+# HNSW files in place, so they cannot be shared by hard links). A build therefore
+# costs one read and one write of the whole index, however few files changed, and
+# the disk needs room for KEEP_GENERATIONS + 1 copies while a build is publishing.
+
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+from knowledge.utils.file_lock import FileLock
+
+CURRENT_FILENAME = "CURRENT"
+GENERATIONS_DIRNAME = "generations"
+MIGRATIONS_DIRNAME = "migrations"
+WRITER_LOCK_FILENAME = ".writer.lock"
+
+# Generations kept on disk (current included) so readers that resolved an
+# older pointer just before a publish can still finish their query.
+KEEP_GENERATIONS = 3
+
+# Entries of a pre-generation (legacy) index root that are not Chroma data
+_NON_INDEX_ENTRIES = {CURRENT_FILENAME, GENERATIONS_DIRNAME, MIGRATIONS_DIRNAME, WRITER_LOCK_FILENAME,
+                      "drift_snapshot.npz", "drift_history.sqlite",
+                      "drift_history.sqlite-wal", "drift_history.sqlite-shm"}
+
+
+def index_root():
+    return os.path.join(os.getcwd(), "glassops_index")
+
+
+def current_generation_dir(root=None):
+    """
+    returns: the directory readers should open, or None if no index exists yet.
+    An index built before generations existed (Chroma files directly in the root)
+    is served in place until the first staged build replaces it.
+    """
+    root = root or index_root()
+    try:
+        with open(os.path.join(root, CURRENT_FILENAME), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+        if name:
+            return os.path.join(root, GENERATIONS_DIRNAME, name)
+    except FileNotFoundError:
+        pass
+
+    if os.path.exists(os.path.join(root, "chroma.sqlite3")):
+        return root
+    return None
+
+
+def close_chroma_client(client):
+    """
+    Release a PersistentClient's shared Chroma system and its open sqlite handles.
+    Chroma caches one system per persist dir for the life of the process, so a
+    long-running process must call this for generations it no longer reads.
+    """
+    close = getattr(client, "close", None)
+    if close is not None:
+        close()  # reference-counted: stops the system once its last client is closed
+        return
+
+    # Older chromadb releases have no close(): drop the cached system directly (the
+    # attribute name is spelled that way in those releases)
+    from chromadb.api.client import SharedSystemClient
+    system = SharedSystemClient._identifer_to_system.pop(client.get_settings().persist_directory, None)
+    if system is not None:
+        system.stop()
+
+
+def _publish(root, name):
+    tmp_path = os.path.join(root, CURRENT_FILENAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILENAME))
+
+
+def _collect_garbage(root, current_name, keep):
+    """Remove old generations beyond `keep` and orphans left by crashed writers."""
+    gen_root = os.path.join(root, GENERATIONS_DIRNAME)
+    names = sorted(os.listdir(gen_root))
+    older = [n for n in names if n < current_name]
+    orphans = [n for n in names if n > current_name]  # only possible after a crash: we hold the writer lock
+    for name in older[:max(0, len(older) - (keep - 1))] + orphans:
+        shutil.rmtree(os.path.join(gen_root, name), ignore_errors=True)
+
+
+@contextmanager
+def staged_generation(root=None, keep=KEEP_GENERATIONS):
+    """
+    Yield a private copy of the current index to write into; publish it atomically
+    if the block succeeds, discard it if it raises. Writers are serialized by a
+    lock file so two builds cannot publish over each other.
+    The copy is a full copy of the index, so a build's cost grows with the index
+    size rather than with the number of changed files.
+    """
+    root = root or index_root()
+    os.makedirs(os.path.join(root, GENERATIONS_DIRNAME), exist_ok=True)
+
+    with FileLock(os.path.join(root, WRITER_LOCK_FILENAME)):
+        current = current_generation_dir(root)
+        name = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        staging = os.path.join(root, GENERATIONS_DIRNAME, name)
+
+        if current is None:
+            os.makedirs(staging)
+        elif current == root:
+            shutil.copytree(root, staging, ignore=lambda d, entries: [
+                e for e in entries if d == root and e in _NON_INDEX_ENTRIES
+            ])
+        else:
+            shutil.copytree(current, staging)
+
+        try:
+            yield staging
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        _publish(root, name)
+        print(f"[SUCCESS] Published index generation {name}.")
+        _collect_garbage(root, name, keep)
@@ -0,0 +1,251 @@
+# index_versions.py
+# Versioned embedding collections: each collection is tagged with the embedding
+# model and dimension that produced its vectors, and a small registry file names
+# the active version. Switching models re-embeds into a new version in the
+# background and then flips the registry pointer atomically.
+
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+import chromadb
+
+from knowledge.embeddings.router_embedding import get_embeddings_for_docs
+from knowledge.embeddings.gemini_embedding import DEFAULT_MODEL
+from knowledge.ingestion.index_store import MIGRATIONS_DIRNAME, current_generation_dir, index_root, staged_generation
+
+LEGACY_COLLECTION = "glassops_knowledge"
+REGISTRY_FILENAME = "index_versions.json"
+
+
+def default_index_dir():
+    """returns: the generation queries currently read (the index root if none is published yet)"""
+    return current_generation_dir() or index_root()
+
+
+def _model_slug(model):
+    """e.g. "models/text-embedding-004" -> "text-embedding-004" """
+    return re.sub(r"[^a-zA-Z0-9._-]+", "-", model.split("/")[-1]).strip("-._")
+
+
+def collection_name_for(model, dimension):
+    """e.g. ("models/text-embedding-004", 768) -> "glassops_knowledge__text-embedding-004__768d" """
+    return f"{LEGACY_COLLECTION}__{_model_slug(model)}__{dimension}d"
+
+
+def load_registry(persist_dir):
+    """
+    returns: {"active": <collection name>, "versions": {name: {...}}}
+    An index built before versioning is registered as the legacy collection,
+    attributed to the default embedding model.
+    """
+    try:
+        with open(os.path.join(persist_dir, REGISTRY_FILENAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, TypeError):  # no index yet (persist_dir None) or no registry
+        pass
+    except Exception as e:
+        print(f"[WARNING] Could not read index registry: {e}")
+
+    return {
+        "active": LEGACY_COLLECTION,
+        "versions": {
+            LEGACY_COLLECTION: {"model": DEFAULT_MODEL, "dimension": None, "status": "ready"},
+        },
+    }
+
+
+def save_registry(persist_dir, registry):
+    """Write the registry atomically (readers see either the old or the new active version)."""
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, REGISTRY_FILENAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def active_version(persist_dir):
+    """returns: (collection_name, version_info) for the version queries should use"""
+    registry = load_registry(persist_dir)
+    name = registry["active"]
+    return name, registry["versions"].get(name, {"model": DEFAULT_MODEL, "dimension": None})
+
+
+def get_version_collection(client, persist_dir, model, dimension):
+    """Get or create the collection for (model, dimension), registering it if new."""
+    registry = load_registry(persist_dir)
+    name = collection_name_for(model, dimension)
+    active_info = registry["versions"].get(registry["active"], {})
+
+    # A legacy collection of matching model/dimension keeps its name
+    if registry["active"] == LEGACY_COLLECTION and active_info.get("model") == model \
+            and active_info.get("dimension") in (None, dimension):
+        name = LEGACY_COLLECTION
+
+    collection = client.get_or_create_collection(
+        name=name,
+        metadata={"hnsw:space": "cosine", "embedding_model": model, "dimension": dimension},
+    )
+
+    info = registry["versions"].get(name)
+    if info is None or info.get("dimension") is None:
+        registry["versions"][name] = {
+            **(info or {}),
+            "model": model,
+            "dimension": dimension,
+            "status": (info or {}).get("status", "building"),
+            "created_at": (info or {}).get("created_at", datetime.now().isoformat(timespec="seconds")),
+        }
+        save_registry(persist_dir, registry)
+    return collection, name
+
+
+def activate_version(persist_dir, name):
+    """Atomically make `name` the version used by query_index."""
+    registry = load_registry(persist_dir)
+    if name not in registry["versions"]:
+        raise ValueError(f"Unknown index version: {name}")
+    registry["versions"][name]["status"] = "ready"
+    registry["previous"] = registry["active"]
+    registry["active"] = name
+    save_registry(persist_dir, registry)
+    print(f"[SUCCESS] Active index version is now {name}.")
+
+
+def _hashes_by_id(collection, page_size=5000):
+    """returns: {id: content hash} for every record (metadata only, paged)"""
+    hashes = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for doc_id, meta in zip(page["ids"], page["metadatas"]):
+            hashes[doc_id] = (meta or {}).get("hash")
+        offset += len(page["ids"])
+    return hashes
+
+
+def migrate_index(target_model, persist_dir=None, batch_size=50, max_batches=None,
+                  batch_delay=0.0, activate=True):
+    """
+    Re-embed the active version's documents with `target_model` into a new version.
+
+    Incremental and resumable: each run only embeds records that are missing from
+    the target or whose content hash differs from the active version, so it can be
+    stopped at any point (or capped with `max_batches` / paced with `batch_delay`
+    to spread quota use) and resumed later. Queries keep using the active version
+    throughout; once the target is complete it is activated atomically.
+
+    Without `persist_dir` the re-embedding reads the current generation of the
+    default index and writes to a work directory under migrations/, without the
+    index writer lock, so builds keep publishing meanwhile. Only once the target
+    is complete does a staged generation take the lock to copy the vectors in,
+    embed the documents that changed since, activate and publish.
+
+    returns: True if the target version is complete
+    """
+    if persist_dir is not None:
+        return _migrate_in(persist_dir, persist_dir, target_model, batch_size, max_batches, batch_delay, activate)
+
+    source_dir = default_index_dir()
+    source_name, source_info = active_version(source_dir)
+    if source_info.get("model") == target_model:
+        print(f"[INFO] Active version {source_name} already uses {target_model}.")
+        return True
+    work_dir = os.path.join(index_root(), MIGRATIONS_DIRNAME, _model_slug(target_model))
+    if not _migrate_in(source_dir, work_dir, target_model, batch_size, max_batches, batch_delay, activate=False):
+        return False
+
+    with staged_generation() as staging:
+        _copy_target(work_dir, staging, target_model)
+        complete = _migrate_in(staging, staging, target_model, batch_size, None, batch_delay, activate)
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return complete
+
+
+def _target_version(registry, target_model, source_name):
+    """returns: the name of an existing (dimensioned) version of `target_model` other than the source, or None"""
+    return next(
+        (name for name, info in registry["versions"].items()
+         if info.get("model") == target_model and info.get("dimension") and name != source_name),
+        None,
+    )
+
+
+def _copy_target(work_dir, persist_dir, target_model, page_size=1000):
+    """Copy the re-embedded records of `target_model` from a migration work directory into `persist_dir`."""
+    name = _target_version(load_registry(work_dir), target_model, None)
+    source = chromadb.PersistentClient(path=work_dir).get_or_create_collection(name=name)
+    client = chromadb.PersistentClient(path=persist_dir)
+    target = None
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        if target is None:
+            target, _ = get_version_collection(client, persist_dir, target_model, len(page["embeddings"][0]))
+        target.upsert(ids=page["ids"], embeddings=page["embeddings"],
+                      documents=page["documents"], metadatas=page["metadatas"])
+        offset += len(page["ids"])
+
+
+def _migrate_in(source_dir, persist_dir, target_model, batch_size, max_batches, batch_delay, activate):
+    """Re-embed the active version of `source_dir` into a `target_model` version in `persist_dir`."""
+    source_client = chromadb.PersistentClient(path=source_dir)
+    client = source_client if persist_dir == source_dir else chromadb.PersistentClient(path=persist_dir)
+    source_name, source_info = active_version(source_dir)
+    if source_info.get("model") == target_model:
+        print(f"[INFO] Active version {source_name} already uses {target_model}.")
+        return True
+
+    source = source_client.get_or_create_collection(name=source_name)
+    source_hashes = _hashes_by_id(source)
+
+    # Reuse a target version from an earlier (interrupted) run if there is one
+    target_name = _target_version(load_registry(persist_dir), target_model, source_name)
+    target = client.get_or_create_collection(name=target_name) if target_name else None
+    target_hashes = _hashes_by_id(target) if target else {}
+
+    pending = [doc_id for doc_id, h in source_hashes.items() if target_hashes.get(doc_id) != h]
+    stale = [doc_id for doc_id in target_hashes if doc_id not in source_hashes]
+    print(f"[MIGRATE] {source_name} -> {target_model}: {len(pending)} to embed, "
+          f"{len(source_hashes) - len(pending)} already done.")
+
+    for n, start in enumerate(range(0, len(pending), batch_size)):
+        if max_batches is not None and n >= max_batches:
+            print("[MIGRATE] Batch limit reached; run again to resume.")
+            return False
+
+        batch = source.get(ids=pending[start:start + batch_size], include=["documents", "metadatas"])
+        docs = [{"content": text} for text in batch["documents"]]
+        vectors = [emb for _, emb in get_embeddings_for_docs(docs, model=target_model)]
+
+        if target is None:
+            target, target_name = get_version_collection(client, persist_dir, target_model, len(vectors[0]))
+
+        target.upsert(
+            ids=batch["ids"],
+            embeddings=vectors,
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+        print(f"[MIGRATE] {min(start + batch_size, len(pending))}/{len(pending)} re-embedded.")
+        if batch_delay:
+            time.sleep(batch_delay)
+
+    if target is None:
+        print("[MIGRATE] Active version is empty; nothing to migrate.")
+        return False
+
+    if stale:
+        target.delete(ids=stale)
+
+    if activate:
+        activate_version(persist_dir, target_name)
+    return True
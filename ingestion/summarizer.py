@@ -0,0 +1,93 @@
+# summarizer.py
+# Optional ingestion stage: precompute a short summary per chunk so the query
+# engine can send compact context instead of raw chunks.
+
+import hashlib
+import json
+from pathlib import Path
+
+from knowledge.llm.client import LLMClient
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / "config" / "summary-cache.json"
+
+# Chunks shorter than this are used as their own summary (an LLM summary
+# would not be meaningfully smaller)
+DEFAULT_MIN_CHARS = 1500
+DEFAULT_MAX_WORDS = 80
+
+# Persist the cache every N new summaries so an interrupted run keeps its progress
+SAVE_EVERY = 20
+
+SUMMARY_PROMPT = """Summarize the following documentation excerpt in at most {max_words} words.
+Keep names of components, commands, configuration keys and decisions verbatim.
+Output plain prose only, no preamble.
+
+Excerpt:
+{content}"""
+
+
+def _load_cache(cache_path):
+    try:
+        if cache_path.exists():
+            return json.loads(cache_path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[WARNING] Failed to load summary cache: {e}")
+    return {}
+
+
+def _save_cache(cache_path, cache):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    except Exception as e:
+        print(f"[ERROR] Failed to save summary cache: {e}")
+
+
+def summarize_chunks(docs, model="gemma-3-27b-it", cache_path=None,
+                     min_chars=DEFAULT_MIN_CHARS, max_words=DEFAULT_MAX_WORDS, llm=None):
+    """
+    docs: list of chunk dicts from discover_and_chunk_docs
+    Adds a "summary" field to each doc in place (stored as sibling metadata by the
+    index builder). Summaries are cached by a hash of the chunk content, so only
+    new or changed chunks cost an LLM call.
+    returns: docs
+    """
+    cache_path = Path(cache_path) if cache_path else DEFAULT_CACHE_PATH
+    cache = _load_cache(cache_path)
+    llm = llm or LLMClient(model=model)
+
+    generated = 0
+    reused = 0
+    try:
+        for doc in docs:
+            content = doc["content"]
+            if len(content) < min_chars:
+                doc["summary"] = content
+                continue
+
+            key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            cached = cache.get(key)
+            if cached:
+                doc["summary"] = cached
+                reused += 1
+                continue
+
+            summary = llm.generate(
+                SUMMARY_PROMPT.format(max_words=max_words, content=content),
+                max_output_tokens=max_words * 3,
+            )
+            if not summary:
+                # No summary: the query engine falls back to full text for this chunk
+                continue
+
+            doc["summary"] = summary.strip()
+            cache[key] = doc["summary"]
+            generated += 1
+            if generated % SAVE_EVERY == 0:
+                _save_cache(cache_path, cache)
+    finally:
+        if generated:
+            _save_cache(cache_path, cache)
+
+    print(f"[SUMMARY] {generated} generated, {reused} reused from cache.")
+    return docs
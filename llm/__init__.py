@@ -1,6 +1,14 @@
 # llm/__init__.py
 """LLM client module for GlassOps Knowledge Pipeline."""
 
-from .client import LLMClient
+from .client import LLMClient, get_genai_client
+from .async_client import AsyncLLMClient
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .response_cache import ReplayMissError, ResponseCache, get_response_cache
+from .tokens import TokenEstimator, count_tokens, get_token_estimator
 
-__all__ = ["LLMClient"]
+__all__ = [
+    "LLMClient", "AsyncLLMClient", "get_genai_client", "RateLimiter", "get_rate_limiter",
+    "TokenEstimator", "count_tokens", "get_token_estimator",
+    "ResponseCache", "ReplayMissError", "get_response_cache",
+]
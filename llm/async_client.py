@@ -0,0 +1,130 @@
+# llm/async_client.py
+"""
+Async LLM client for GlassOps Knowledge Pipeline.
+
+Same behaviour as LLMClient (shared rate limiter, usage counters, retries,
+daily-quota detection, response cache), but requests go through the SDK's
+async interface (``client.aio``) on the pooled genai.Client, and throttle
+waits and retry backoff are awaited. Many requests can therefore be in
+flight on one event loop without a thread each.
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from google.genai import types
+
+from knowledge.llm.client import DEFAULT_MAX_OUTPUT_TOKENS, LLMClient
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    LLMClient with awaitable generation.
+
+    Cancelling a task that awaits agenerate() cancels its HTTP request; a
+    deadline bounds the whole call, including throttle waits and retries.
+    """
+
+    async def areserve(self, prompt: str, max_output_tokens: Optional[int] = None) -> Tuple[int, float]:
+        """Async variant of reserve(): waits for the shared limiter without blocking the loop."""
+        tokens = self.estimator.estimate_request(prompt, max_output_tokens)
+        reserved_at = await self.rate_limiter.aacquire(tokens)
+        self._count_request(tokens)
+        return tokens, reserved_at
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_retries: int = 3,
+        temperature: Optional[float] = 0.2,
+        max_output_tokens: Optional[int] = DEFAULT_MAX_OUTPUT_TOKENS,
+        deadline: Optional[float] = None,
+    ) -> Optional[str]:
+        """
+        Generate content from a prompt with retry logic.
+
+        Args:
+            prompt: The prompt to send to the model.
+            max_retries: Maximum number of retries on transient errors.
+            temperature: Sampling temperature (None = model default).
+            max_output_tokens: Max tokens for the response (None = model default).
+            deadline: Seconds the whole call may take (None = no limit).
+
+        Returns:
+            The generated text, or None on failure or when the deadline passes.
+        """
+        # Cache and limiter calls take thread/file locks; keep them off the event loop
+        key, text = await asyncio.to_thread(self.cache_lookup, prompt, temperature, max_output_tokens)
+        if text is not None or (self.cache and self.cache.replay):
+            return text
+        if not self.client or self.quota_exhausted:
+            return None
+
+        request = self._agenerate(prompt, max_retries, temperature, max_output_tokens, key)
+        if deadline is None:
+            return await request
+        try:
+            return await asyncio.wait_for(request, deadline)
+        except asyncio.TimeoutError:
+            print(f"[WARNING] LLM request exceeded its {deadline:.1f}s deadline")
+            return None
+
+    async def _agenerate(
+        self,
+        prompt: str,
+        max_retries: int,
+        temperature: Optional[float],
+        max_output_tokens: Optional[int],
+        cache_key: Optional[str] = None,
+    ) -> Optional[str]:
+        """The retry loop of agenerate() (without the deadline)."""
+        config = types.GenerateContentConfig(temperature=temperature, max_output_tokens=max_output_tokens)
+
+        for attempt in range(max_retries + 1):
+            # Retries are requests too, so each attempt waits for the shared limiter
+            reservation = await self.areserve(prompt, max_output_tokens)
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=config,
+                )
+                await asyncio.to_thread(self.record_usage, prompt, reservation, response, max_output_tokens)
+                text = self._response_text(response)
+                await asyncio.to_thread(self.cache_store, cache_key, text)
+                return text
+
+            except Exception as e:
+                wait = self._retry_delay(e, attempt, max_retries)
+                if wait is None:
+                    return None
+                await asyncio.sleep(wait)
+
+        return None
+
+    async def agenerate_many(
+        self,
+        prompts: List[str],
+        concurrency: int = 8,
+        deadline: Optional[float] = None,
+        **kwargs,
+    ) -> List[Optional[str]]:
+        """
+        Generate several prompts concurrently on the current event loop.
+
+        Args:
+            prompts: Prompts to send.
+            concurrency: Maximum requests in flight.
+            deadline: Per-request deadline in seconds (None = no limit).
+            **kwargs: Passed to agenerate (temperature, max_output_tokens, ...).
+
+        Returns:
+            Generated texts in prompt order (None for failed prompts).
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(prompt: str) -> Optional[str]:
+            async with semaphore:
+                return await self.agenerate(prompt, deadline=deadline, **kwargs)
+
+        return list(await asyncio.gather(*(run(p) for p in prompts)))
@@ -5,18 +5,49 @@ Handles API interaction, retry logic, and rate limiting.
 """
 
 import os
+import threading
 import time
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from pathlib import Path
 
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 
+from knowledge.llm.fake_genai import active_fake_backend
+from knowledge.llm.rate_limiter import get_rate_limiter, limits_for_model, state_dir
+from knowledge.llm.response_cache import get_response_cache
+from knowledge.llm.tokens import get_token_estimator, usage_tokens
+
 # Load .env from project root
 ROOT_DIR = Path(__file__).parent.parent.parent.parent
 load_dotenv(ROOT_DIR / ".env")
 
+DEFAULT_MAX_OUTPUT_TOKENS = 8192
+
+_CLIENT_POOL: Dict[str, genai.Client] = {}
+_CLIENT_POOL_LOCK = threading.Lock()
+
+
+def get_genai_client(api_key: str) -> genai.Client:
+    """
+    Return a process-wide genai.Client for the given API key.
+
+    Clients own their HTTP connection pools (sync and ``.aio``), so sharing
+    one instance per key lets concurrent callers reuse connections instead
+    of opening new ones per request. While a fake backend is active (see
+    fake_genai.py), its client is returned instead.
+    """
+    fake = active_fake_backend()
+    if fake:
+        return fake.client
+    with _CLIENT_POOL_LOCK:
+        client = _CLIENT_POOL.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)
+            _CLIENT_POOL[api_key] = client
+        return client
+
 
 class LLMClient:
     """
@@ -24,70 +55,132 @@ class LLMClient:
     Includes retry logic for transient errors (429, 503).
     """
 
-    def __init__(self, model: str = "gemma-3-27b-it"):
-        api_key = os.getenv("GOOGLE_API_KEY", "").strip().strip("'\"")
+    def __init__(self, model: str = "gemma-3-27b-it", api_key_env: str = "GOOGLE_API_KEY"):
+        # api_key_env lets each generation worker use its own key (and quota)
+        api_key = os.getenv(api_key_env, "").strip().strip("'\"")
+        self.model = model
+        self.cache = get_response_cache()
         if not api_key:
-            print("[WARNING] Warning: GOOGLE_API_KEY not found. LLMClient will be disabled.")
+            if not (self.cache and self.cache.replay):
+                print(f"[WARNING] Warning: {api_key_env} not found. LLMClient will be disabled.")
             self.client = None
+            self.rate_limiter = None
         else:
-            self.client = genai.Client(api_key=api_key)
-        self.model = model
-        self._request_history: list[dict] = []
-        self._rpm_limit = 28  # Safety buffer below 30
-        self._tpm_limit = 14000  # Safety buffer below 15000
+            self.client = get_genai_client(api_key)
+            self.rate_limiter = get_rate_limiter(api_key, model)
+        self.estimator = get_token_estimator(model, state_dir())
+        limits = limits_for_model(model)
+        self._rpm_limit = limits["rpm"]
+        self._tpm_limit = limits["tpm"]
+        self._usage_lock = threading.Lock()
+        # Usage of this client (API attempts and tokens, corrected to the provider's
+        # usage metadata when a response reports it), read by quota-aware schedulers
+        self.requests_sent = 0
+        self.tokens_sent = 0
+        # Set once the API reports a per-day quota as exhausted; retrying will not help until it resets
+        self.quota_exhausted = False
 
     def _estimate_tokens(self, text: str) -> int:
-        """Rough token estimation (4 chars per token)."""
-        return len(text) // 4
+        """Calibrated prompt token estimate (see tokens.py)."""
+        return self.estimator.estimate_input(text)
+
+    def reserve(self, prompt: str, max_output_tokens: Optional[int] = None) -> Tuple[int, Optional[float]]:
+        """
+        Wait for room in the shared rate limiter and count one request.
+
+        Args:
+            prompt: The prompt about to be sent.
+            max_output_tokens: The request's output limit.
+
+        Returns:
+            (tokens reserved, reservation time); pass it to record_usage once
+            the response arrives.
+        """
+        tokens = self.estimator.estimate_request(prompt, max_output_tokens)
+        reserved_at = self._throttle(tokens)
+        self._count_request(tokens)
+        return tokens, reserved_at
+
+    def record_usage(self, prompt: str, reservation: Tuple[int, Optional[float]], response,
+                     max_output_tokens: Optional[int] = None) -> None:
+        """
+        Book a response's actual token usage.
+
+        The difference to the reservation goes back into the rate limiter
+        (and usage counters), and the estimator is calibrated. Responses
+        without usage metadata keep their reservation.
+
+        Args:
+            prompt: The prompt that was sent.
+            reservation: What reserve() returned for it.
+            response: SDK response (or the last chunk of a stream).
+            max_output_tokens: The request's output limit.
+        """
+        usage = usage_tokens(response)
+        if usage is None:
+            return
+        prompt_tokens, output_tokens = usage
+        reserved, reserved_at = reservation
+        delta = prompt_tokens + output_tokens - reserved
+        if self.rate_limiter and reserved_at is not None:
+            self.rate_limiter.adjust(delta, reserved_at)
+        with self._usage_lock:
+            self.tokens_sent += delta
+        self.estimator.observe(prompt, prompt_tokens, output_tokens, max_output_tokens)
+
+    def cache_lookup(
+        self,
+        prompt: str,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Look a request up in the response cache.
+
+        Args:
+            prompt: The prompt to send to the model.
+            temperature: Sampling temperature (None = model default).
+            max_output_tokens: Max tokens for the response (None = model default).
 
-    def _throttle(self, estimated_tokens: int) -> None:
+        Returns:
+            (cache key, recorded text); the key is None without a cache and
+            the text is None on a miss.
         """
-        Simple throttle to stay within RPM/TPM limits.
-        Blocks if we're approaching the limit.
+        if not self.cache:
+            return None, None
+        key = self.cache.key("generate", self.model, prompt, temperature, max_output_tokens)
+        text = self.cache.get(key)
+        if text is None and self.cache.replay:
+            print(f"[WARNING] No recorded {self.model} response for this prompt (replay mode)")
+        return key, text
+
+    def cache_store(self, key: Optional[str], text: Optional[str]) -> None:
+        """Record a response under a key from cache_lookup (no-op without a cache or text)."""
+        if self.cache and key and text:
+            self.cache.put(key, "generate", self.model, text)
+
+    def _throttle(self, estimated_tokens: int) -> float:
+        """
+        Block until the shared rate limiter has room for the request.
+
+        The limiter is shared by every client (and process) using the same
+        API key and model, so concurrent callers cannot overshoot the quota.
+
+        Returns:
+            The reservation time.
         """
-        now = time.time()
-        window_size = 60  # 1 minute
-
-        # Clean old entries
-        self._request_history = [
-            entry for entry in self._request_history
-            if now - entry["time"] < window_size
-        ]
-
-        # Check RPM
-        if len(self._request_history) >= self._rpm_limit:
-            oldest = self._request_history[0]
-            wait_time = (oldest["time"] + window_size) - now
-            if wait_time > 0:
-                print(f"[THROTTLE] RPM Limit: Waiting {wait_time:.1f}s...")
-                time.sleep(wait_time)
-                return self._throttle(estimated_tokens)  # Re-check
-
-        # Check TPM
-        current_tokens = sum(e["tokens"] for e in self._request_history)
-        if current_tokens + estimated_tokens > self._tpm_limit:
-            # Find when we'll have enough headroom
-            freed_tokens = 0
-            wait_time = 0
-            for entry in self._request_history:
-                freed_tokens += entry["tokens"]
-                if current_tokens - freed_tokens + estimated_tokens <= self._tpm_limit:
-                    wait_time = (entry["time"] + window_size) - now
-                    break
-
-            if wait_time > 0:
-                print(f"[THROTTLE] TPM Limit ({current_tokens}/{self._tpm_limit}): Waiting {wait_time:.1f}s...")
-                time.sleep(wait_time)
-                return self._throttle(estimated_tokens)
-
-        self._request_history.append({"time": time.time(), "tokens": estimated_tokens})
+        return self.rate_limiter.acquire(estimated_tokens)
+
+    def headroom(self) -> Dict[str, float]:
+        """Return the requests/tokens currently available under this key's limits."""
+        return self.rate_limiter.headroom() if self.rate_limiter else {}
 
     def generate(
         self,
         prompt: str,
         max_retries: int = 3,
         temperature: float = 0.2,
-        max_output_tokens: int = 8192,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
     ) -> Optional[str]:
         """
         Generate content from a prompt with retry logic.
@@ -101,16 +194,15 @@ class LLMClient:
         Returns:
             The generated text, or None on failure.
         """
-        estimated_tokens = self._estimate_tokens(prompt) + 100  # Buffer for output
-        
-        if not self.client:
+        key, text = self.cache_lookup(prompt, temperature, max_output_tokens)
+        if text is not None or (self.cache and self.cache.replay):
+            return text
+        if not self.client or self.quota_exhausted:
             return None
 
-        self._throttle(estimated_tokens)
-
-        backoffs = [10, 30, 60]  # Retry delays in seconds
-
         for attempt in range(max_retries + 1):
+            # Retries are requests too, so each attempt waits for the shared limiter
+            reservation = self.reserve(prompt, max_output_tokens)
             try:
                 response = self.client.models.generate_content(
                     model=self.model,
@@ -120,25 +212,61 @@ class LLMClient:
                         max_output_tokens=max_output_tokens,
                     ),
                 )
+                self.record_usage(prompt, reservation, response, max_output_tokens)
+                text = self._response_text(response)
+                self.cache_store(key, text)
+                return text
+
+            except Exception as e:
+                wait = self._retry_delay(e, attempt, max_retries)
+                if wait is None:
+                    return None
+                time.sleep(wait)
+
+        return None
 
-                if response.text:
-                    return response.text
+    def _count_request(self, estimated_tokens: int) -> None:
+        """Record one API attempt in the usage counters."""
+        with self._usage_lock:
+            self.requests_sent += 1
+            self.tokens_sent += estimated_tokens
 
-                # No text but no exception - check finish reason
-                print(f"[WARNING] Gemini returned no text. Finish reason: {response.candidates[0].finish_reason if response.candidates else 'Unknown'}")
-                return None
+    @staticmethod
+    def _response_text(response) -> Optional[str]:
+        """Return the response text, or None (with a warning) if there is none."""
+        if response.text:
+            return response.text
 
-            except Exception as e:
-                error_str = str(e)
-                is_retryable = "429" in error_str or "503" in error_str or "overloaded" in error_str.lower()
+        # No text but no exception - check finish reason
+        print(f"[WARNING] Gemini returned no text. Finish reason: {response.candidates[0].finish_reason if response.candidates else 'Unknown'}")
+        return None
+
+    def _retry_delay(self, error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+        """
+        Decide how to handle a failed attempt.
 
-                if is_retryable and attempt < max_retries:
-                    wait = backoffs[min(attempt, len(backoffs) - 1)]
-                    print(f"[WARNING] Retryable error ({error_str[:50]}...). Retrying in {wait}s (attempt {attempt + 1}/{max_retries})...")
-                    time.sleep(wait)
-                    continue
+        Args:
+            error: The exception raised by the SDK.
+            attempt: Zero-based attempt number.
+            max_retries: Maximum number of retries.
+
+        Returns:
+            Seconds to wait before retrying, or None to give up.
+        """
+        backoffs = [10, 30, 60]  # Retry delays in seconds
+        error_str = str(error)
+        is_retryable = "429" in error_str or "503" in error_str or "overloaded" in error_str.lower()
+
+        # e.g. GenerateRequestsPerDayPerProjectPerModel-FreeTier
+        if "429" in error_str and "PerDay" in error_str:
+            print(f"[ERROR] Daily quota exhausted for {self.model}: {error_str[:120]}")
+            self.quota_exhausted = True
+            return None
 
-                print(f"[ERROR] LLM Error: {e}")
-                return None
+        if is_retryable and attempt < max_retries:
+            wait = backoffs[min(attempt, len(backoffs) - 1)]
+            print(f"[WARNING] Retryable error ({error_str[:50]}...). Retrying in {wait}s (attempt {attempt + 1}/{max_retries})...")
+            return wait
 
+        print(f"[ERROR] LLM Error: {error}")
         return None
@@ -0,0 +1,430 @@
+# llm/fake_genai.py
+"""
+Local stand-in for the Google GenAI API, for load and performance testing.
+
+Implements the subset of the SDK the pipeline uses:
+
+- genai.Client: models.generate_content, models.generate_content_stream,
+  models.embed_content and aio.models.generate_content
+- google.generativeai (legacy): embed_content, used by the embedders
+
+Every request takes a latency drawn from a configurable distribution, is
+checked against per-model RPM / TPM / RPD limits (exceeding one answers
+429 RESOURCE_EXHAUSTED, as the real API does; TPM counts input tokens),
+and fails with an injected 429 or 503 at configurable rates. Errors are the
+SDK's own exception types and responses carry usage metadata, so
+throttling, retries, token calibration and concurrency behave as they do
+against the live API, reproducibly and without quota or network.
+
+Enable with GLASSOPS_FAKE_LLM=1 (settings from ``fake_llm`` in config.json),
+or set it to inline JSON or a JSON file overriding them, e.g.
+GLASSOPS_FAKE_LLM='{"latency": {"median": 0.2}, "errors": {"503": 0.05}}'.
+In-process callers can use install_fake_backend() instead. While a fake is
+active, get_genai_client() returns its client and the embedders call its
+embed_content, and the LLM response cache is off so fake output is never
+recorded under real request keys. A GOOGLE_API_KEY must still be set
+(any value).
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from google.genai import errors, types
+
+from knowledge.llm.tokens import count_tokens
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.json"
+
+DEFAULT_SETTINGS = {
+    "seed": 0,
+    # Seconds to the first token, plus seconds per output token while streaming
+    "latency": {"distribution": "lognormal", "median": 0.5, "sigma": 0.4},
+    "seconds_per_output_token": 0.002,
+    "embed_latency": {"distribution": "lognormal", "median": 0.1, "sigma": 0.3},
+    "output_tokens": {"distribution": "lognormal", "median": 400, "sigma": 0.5},
+    "token_ratio": 1.1,  # provider tokens per local count_tokens() token
+    "errors": {"429": 0.0, "503": 0.0},  # injected error rate per request
+    "limits": {
+        "default": {"rpm": 30, "tpm": 15000, "rpd": None},
+        "models/text-embedding-004": {"rpm": 1500, "tpm": None, "rpd": None},
+    },
+    "embedding_dimensions": 768,
+}
+
+WORDS = ("the", "module", "function", "returns", "config", "request", "value", "client",
+         "error", "handles", "cache", "index", "parameter", "document", "service", "data")
+
+_backend: Optional["FakeBackend"] = None
+_installed = False
+_backend_lock = threading.Lock()
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """Deep-merge override into a copy of base."""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def sample(spec: Dict[str, Any], rng: random.Random) -> float:
+    """
+    Draw one value from a distribution spec.
+
+    Args:
+        spec: {"distribution": "fixed", "value"} | {"distribution": "uniform", "min", "max"}
+              | {"distribution": "lognormal", "median", "sigma"} | {"distribution": "exponential", "mean"}
+        rng: Random source.
+    """
+    kind = spec.get("distribution", "fixed")
+    if kind == "fixed":
+        return float(spec.get("value", spec.get("median", 0.0)))
+    if kind == "uniform":
+        return rng.uniform(spec["min"], spec["max"])
+    if kind == "lognormal":
+        return spec["median"] * math.exp(rng.gauss(0.0, spec["sigma"]))
+    if kind == "exponential":
+        return rng.expovariate(1.0 / spec["mean"])
+    raise ValueError(f"Unknown distribution: {kind!r}")
+
+
+def _text_of(contents: Any) -> str:
+    """Flatten SDK `contents` (str, list of str/Content/Part) into prompt text."""
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_text_of(item) for item in contents)
+    parts = getattr(contents, "parts", None)
+    if parts is not None:
+        return "\n".join(part.text or "" for part in parts)
+    return getattr(contents, "text", None) or str(contents)
+
+
+class _Call:
+    """One admitted request: its sampled latency, sizes and injected error."""
+
+    def __init__(self, latency: float, prompt_tokens: int, output_tokens: int, error: Optional[Exception]):
+        self.latency = latency
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.error = error
+
+
+class FakeBackend:
+    """
+    Shared state of the fake API: limits, random source and statistics. Thread-safe.
+    """
+
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            settings: Overrides for DEFAULT_SETTINGS.
+        """
+        self.settings = _merge(DEFAULT_SETTINGS, settings or {})
+        self._rng = random.Random(self.settings["seed"])
+        self._lock = threading.Lock()
+        self._windows: Dict[str, deque] = {}  # {model: deque of (time, input tokens)} for the last minute
+        self._daily: Counter = Counter()
+        self._stats: Counter = Counter()
+        self.client = FakeClient(self)
+        self.legacy = FakeLegacyModule(self)
+
+    def _limits(self, model: str) -> Dict[str, Optional[int]]:
+        limits = self.settings["limits"]
+        return {**limits.get("default", {}), **limits.get(model, {})}
+
+    @staticmethod
+    def _quota_error(model: str, quota: str) -> errors.ClientError:
+        return errors.ClientError(429, {"error": {
+            "code": 429,
+            "message": f"You exceeded your current quota. Quota exceeded for metric: {quota}, model: {model}",
+            "status": "RESOURCE_EXHAUSTED",
+        }})
+
+    def _admit(self, model: str, prompt_tokens: int, latency_spec: Dict[str, Any],
+               output_spec: Optional[Dict[str, Any]], max_output_tokens: Optional[int]) -> _Call:
+        """Apply the model's limits, then draw latency, output size and injected error."""
+        now = time.monotonic()
+        limits = self._limits(model)
+        with self._lock:
+            window = self._windows.setdefault(model, deque())
+            while window and window[0][0] <= now - 60.0:
+                window.popleft()
+            quota = None
+            if limits.get("rpd") and self._daily[model] >= limits["rpd"]:
+                quota = "GenerateRequestsPerDayPerProjectPerModel-FreeTier"
+            elif limits.get("rpm") and len(window) >= limits["rpm"]:
+                quota = "GenerateRequestsPerMinutePerProjectPerModel-FreeTier"
+            elif limits.get("tpm") and sum(t for _, t in window) + prompt_tokens > limits["tpm"]:
+                quota = "GenerateContentInputTokensPerModelPerMinute-FreeTier"
+            if quota:
+                self._stats["rejected_429"] += 1
+                raise self._quota_error(model, quota)
+            window.append((now, prompt_tokens))
+            self._daily[model] += 1
+
+            latency = max(0.0, sample(latency_spec, self._rng))
+            output_tokens = 0
+            if output_spec:
+                output_tokens = max(1, round(sample(output_spec, self._rng)))
+                if max_output_tokens:
+                    output_tokens = min(output_tokens, max_output_tokens)
+            error = None
+            draw = self._rng.random()
+            rates = self.settings["errors"]
+            if draw < rates.get("429", 0.0):
+                self._stats["injected_429"] += 1
+                error = self._quota_error(model, "GenerateRequestsPerMinutePerProjectPerModel-FreeTier")
+            elif draw < rates.get("429", 0.0) + rates.get("503", 0.0):
+                self._stats["injected_503"] += 1
+                error = errors.ServerError(503, {"error": {
+                    "code": 503, "message": "The model is overloaded. Please try again later.", "status": "UNAVAILABLE",
+                }})
+            else:
+                self._stats["prompt_tokens"] += prompt_tokens
+                self._stats["output_tokens"] += output_tokens
+            self._stats["requests"] += 1
+        return _Call(latency, prompt_tokens, output_tokens, error)
+
+    def _generate_call(self, model: str, contents: Any, config: Any) -> Tuple[str, _Call]:
+        prompt = _text_of(contents)
+        prompt_tokens = max(1, round(count_tokens(prompt) * self.settings["token_ratio"]))
+        max_output_tokens = getattr(config, "max_output_tokens", None) if config else None
+        call = self._admit(model, prompt_tokens, self.settings["latency"], self.settings["output_tokens"], max_output_tokens)
+        return prompt, call
+
+    def _duration(self, call: _Call) -> float:
+        return call.latency + call.output_tokens * self.settings["seconds_per_output_token"]
+
+    def _text(self, prompt: str, output_tokens: int) -> str:
+        """Deterministic markdown of about `output_tokens` tokens (one section per packed file)."""
+        files = re.findall(r"^<<<FILE (\d+): ([^>\n]*)>>>", prompt, re.MULTILINE)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+        def body(tokens: int) -> str:
+            words = [rng.choice(WORDS) for _ in range(max(tokens - 4, 12))]
+            lines = [" ".join(words[i:i + 12]).capitalize() + "." for i in range(0, len(words), 12)]
+            return "## Overview\n\n" + "\n".join(lines)
+
+        if not files:
+            return "# Documentation\n\n" + body(output_tokens)
+        share = max(output_tokens // len(files), 60)
+        return "\n\n".join(
+            f"<<<FILE {n}>>>\n# {path}\n\n{body(share)}\n<<<END FILE {n}>>>" for n, path in files
+        )
+
+    @staticmethod
+    def _response(text: str, call: _Call, usage: bool = True) -> types.GenerateContentResponse:
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(
+                content=types.Content(parts=[types.Part(text=text)], role="model"),
+                finish_reason=types.FinishReason.STOP,
+            )],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=call.prompt_tokens,
+                candidates_token_count=call.output_tokens,
+                total_token_count=call.prompt_tokens + call.output_tokens,
+            ) if usage else None,
+        )
+
+    def generate(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        """Blocking generate_content."""
+        prompt, call = self._generate_call(model, contents, config)
+        time.sleep(self._duration(call) if not call.error else call.latency)
+        if call.error:
+            raise call.error
+        return self._response(self._text(prompt, call.output_tokens), call)
+
+    async def agenerate(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        """Awaitable generate_content."""
+        prompt, call = self._generate_call(model, contents, config)
+        await asyncio.sleep(self._duration(call) if not call.error else call.latency)
+        if call.error:
+            raise call.error
+        return self._response(self._text(prompt, call.output_tokens), call)
+
+    def generate_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[types.GenerateContentResponse]:
+        """generate_content_stream: chunks of ~20 tokens; usage metadata on the last chunk."""
+        prompt, call = self._generate_call(model, contents, config)
+        time.sleep(call.latency)
+        if call.error:
+            raise call.error
+        text = self._text(prompt, call.output_tokens)
+        pieces = re.findall(r"(?:\S+\s*){1,20}", text) or [text]
+        for i, piece in enumerate(pieces):
+            time.sleep(self.settings["seconds_per_output_token"] * call.output_tokens / len(pieces))
+            yield self._response(piece, call, usage=i == len(pieces) - 1)
+
+    def embedding(self, text: str) -> List[float]:
+        """Deterministic unit vector for a text (identical texts embed identically)."""
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).hexdigest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.settings["embedding_dimensions"])]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_texts(self, model: str, texts: List[str]) -> List[List[float]]:
+        """Embed texts as one request (blocking)."""
+        tokens = sum(max(1, round(count_tokens(t) * self.settings["token_ratio"])) for t in texts)
+        call = self._admit(model, tokens, self.settings["embed_latency"], None, None)
+        with self._lock:
+            self._stats["embed_requests"] += 1
+            self._stats["embedded_texts"] += len(texts)
+        time.sleep(call.latency)
+        if call.error:
+            raise call.error
+        return [self.embedding(text) for text in texts]
+
+    def embed(self, model: str, contents: Any, config: Any = None) -> types.EmbedContentResponse:
+        """embed_content of the genai.Client interface."""
+        texts = [contents] if isinstance(contents, str) else [_text_of(item) for item in contents]
+        return types.EmbedContentResponse(
+            embeddings=[types.ContentEmbedding(values=vector) for vector in self.embed_texts(model, texts)]
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return request statistics.
+
+        Returns:
+            {"requests", "rejected_429", "injected_429", "injected_503", "prompt_tokens",
+            "output_tokens", "embed_requests", "embedded_texts"}; tokens count successful requests.
+        """
+        keys = ("requests", "rejected_429", "injected_429", "injected_503", "prompt_tokens",
+                "output_tokens", "embed_requests", "embedded_texts")
+        with self._lock:
+            return {key: self._stats[key] for key in keys}
+
+
+class _Models:
+    """client.models of the fake genai.Client."""
+
+    def __init__(self, backend: FakeBackend):
+        self._backend = backend
+
+    def generate_content(self, model: str, contents: Any, config: Any = None):
+        return self._backend.generate(model, contents, config)
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None):
+        return self._backend.generate_stream(model, contents, config)
+
+    def embed_content(self, model: str, contents: Any, config: Any = None):
+        return self._backend.embed(model, contents, config)
+
+
+class _AsyncModels:
+    """client.aio.models of the fake genai.Client."""
+
+    def __init__(self, backend: FakeBackend):
+        self._backend = backend
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None):
+        return await self._backend.agenerate(model, contents, config)
+
+    async def embed_content(self, model: str, contents: Any, config: Any = None):
+        return await asyncio.to_thread(self._backend.embed, model, contents, config)
+
+
+class _Aio:
+    def __init__(self, backend: FakeBackend):
+        self.models = _AsyncModels(backend)
+
+
+class FakeClient:
+    """Drop-in for genai.Client (the parts the pipeline calls)."""
+
+    def __init__(self, backend: FakeBackend):
+        self.models = _Models(backend)
+        self.aio = _Aio(backend)
+
+
+class FakeLegacyModule:
+    """Drop-in for the google.generativeai module functions the embedders call."""
+
+    def __init__(self, backend: FakeBackend):
+        self._backend = backend
+
+    def configure(self, **kwargs) -> None:
+        pass
+
+    def embed_content(self, model: str, content: Any, task_type: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        if isinstance(content, str):
+            return {"embedding": self._backend.embed_texts(model, [content])[0]}
+        return {"embedding": self._backend.embed_texts(model, list(content))}
+
+
+def fake_settings() -> Optional[Dict[str, Any]]:
+    """
+    Return the settings overrides requested by GLASSOPS_FAKE_LLM, or None when it is unset.
+
+    ``fake_llm`` in config.json applies first, then inline JSON or a JSON file from the variable.
+    """
+    value = os.getenv("GLASSOPS_FAKE_LLM", "").strip()
+    if not value or value.lower() in ("0", "off", "false", "no"):
+        return None
+    settings: Dict[str, Any] = {}
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            settings = json.load(f).get("fake_llm", {})
+    except Exception:
+        pass
+    if value.startswith("{"):
+        settings = _merge(settings, json.loads(value))
+    elif value.lower() not in ("1", "on", "true", "yes"):
+        settings = _merge(settings, json.loads(Path(value).read_text(encoding="utf-8")))
+    return settings
+
+
+def install_fake_backend(settings: Optional[Dict[str, Any]] = None) -> FakeBackend:
+    """
+    Route this process's GenAI calls to a new fake backend.
+
+    Clients created earlier keep their backend; create LLMClients after installing.
+
+    Args:
+        settings: Overrides for DEFAULT_SETTINGS.
+
+    Returns:
+        The installed backend (for its stats()).
+    """
+    global _backend, _installed
+    with _backend_lock:
+        _backend = FakeBackend(settings)
+        _installed = True
+        return _backend
+
+
+def uninstall_fake_backend() -> None:
+    """Stop routing calls to the installed fake backend."""
+    global _backend, _installed
+    with _backend_lock:
+        _backend = None
+        _installed = False
+
+
+def active_fake_backend() -> Optional[FakeBackend]:
+    """Return the fake backend in use (installed, or enabled by GLASSOPS_FAKE_LLM), else None."""
+    global _backend
+    with _backend_lock:
+        if _installed:
+            return _backend
+        settings = fake_settings()
+        if settings is None:
+            return None
+        if _backend is None:
+            _backend = FakeBackend(settings)
+            print("[FAKE] GenAI calls go to the local fake backend (GLASSOPS_FAKE_LLM)")
+        return _backend
@@ -0,0 +1,308 @@
+# llm/rate_limiter.py
+"""
+Sliding-window rate limiter shared by every LLM caller using the same API key.
+
+Each (API key, model) pair is limited in requests per minute, tokens per
+minute and (optionally) requests per day, over trailing windows: no 60s
+window ever holds more than the RPM / TPM limit, so a burst at startup
+cannot overshoot the way a bucket that starts full and keeps refilling
+would. The minute window is a log of reservations (at most RPM entries);
+the day window counts requests in one-minute bins (at most 1440).
+Reservations are held for a second past the minute: they are made just
+before a request is sent, while the server's window counts from its
+arrival, so an entry freed at exactly 60s would let a request in before
+the server's copy of the old one expired.
+
+Within a process, all callers get the same RateLimiter instance
+(get_rate_limiter). Across processes on the same host, the window lives in
+a small state file under a lock file, so the generator, the query engine
+and parallel workers draw from one budget instead of each assuming they
+own the whole quota. Set GLASSOPS_RATE_LIMIT_DIR to move the state files
+(e.g. onto a volume shared by containers).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from knowledge.utils import FileLock
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.json"
+
+# Effective limits, kept a little below the published free-tier quotas.
+# Override per model with "llm_rate_limits" in config.json.
+DEFAULT_LIMITS = {
+    "default": {"rpm": 28, "tpm": 14000, "rpd": None},
+}
+
+WINDOW = 60.0
+HOLD = WINDOW + 1.0  # seconds a reservation counts against the minute limits (see module docstring)
+DAY = 86400.0
+BIN = 60.0  # seconds per bin of the daily count
+MIN_WAIT = 0.01
+REASONS = {"rpm": "RPM Limit", "tpm": "TPM Limit", "rpd": "RPD Limit"}
+
+_LIMITERS: Dict[Tuple[str, str], "RateLimiter"] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limits_for_model(model: str) -> Dict[str, Optional[int]]:
+    """
+    Return the {"rpm", "tpm", "rpd"} limits for a model.
+
+    Config entries for the model override "default", which overrides DEFAULT_LIMITS.
+    """
+    configured = {}
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            configured = json.load(f).get("llm_rate_limits", {})
+    except Exception:
+        pass
+    limits = dict(DEFAULT_LIMITS["default"])
+    limits.update(configured.get("default", {}))
+    limits.update(DEFAULT_LIMITS.get(model, {}))
+    limits.update(configured.get(model, {}))
+    return limits
+
+
+class RateLimiter:
+    """
+    RPM / TPM / RPD limits over trailing windows, optionally persisted in a shared state file.
+
+    Thread-safe. With a state_path, also safe across processes: every
+    reservation reads, prunes and writes the window under a file lock.
+    """
+
+    def __init__(self, rpm: int, tpm: int, rpd: Optional[int] = None, state_path: Optional[Path] = None):
+        """
+        Initialize the limiter with empty windows.
+
+        Args:
+            rpm: Requests per minute.
+            tpm: Tokens per minute.
+            rpd: Requests per day (None = no daily limit).
+            state_path: JSON file holding the shared windows (None = this process only).
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rpd = rpd
+        self.state_path = Path(state_path) if state_path else None
+        self._file_lock = FileLock(str(self.state_path) + ".lock") if self.state_path else None
+        self._lock = threading.Lock()
+        self._log: List[List[float]] = []  # [[reservation time, tokens]] of the last HOLD seconds
+        self._days: Dict[int, int] = {}  # {bin index: requests} of the last DAY seconds
+
+    def _load(self) -> None:
+        """Read the shared windows (missing or unreadable state means empty windows)."""
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self._log = [[float(t), float(tokens)] for t, tokens in state["log"]]
+            self._days = {int(index): int(count) for index, count in state["days"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self._log = []
+            self._days = {}
+
+    def _save(self) -> None:
+        """Write the shared windows (atomically, so a crash never leaves a torn file)."""
+        tmp_path = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"log": self._log, "days": self._days}), encoding="utf-8")
+        os.replace(tmp_path, self.state_path)
+
+    def _prune(self, now: float) -> None:
+        """Drop reservations that left the windows."""
+        self._log = [entry for entry in self._log if entry[0] > now - HOLD]
+        # A bin is dropped once its last second is a day old
+        self._days = {index: count for index, count in self._days.items() if (index + 1) * BIN > now - DAY}
+
+    def _locked(self, fn):
+        """Run fn(now) with the windows loaded and pruned, under the locks."""
+        with self._lock:
+            if not self._file_lock:
+                now = time.time()
+                self._prune(now)
+                return fn(now)
+            with self._file_lock:
+                self._load()
+                now = time.time()
+                self._prune(now)
+                result = fn(now)
+                try:
+                    self._save()
+                except OSError as e:
+                    print(f"[WARNING] Could not write rate limit state {self.state_path}: {e}")
+                return result
+
+    def _wait(self, now: float, tokens: int) -> Tuple[float, str]:
+        """Seconds until a request of `tokens` fits in every window, and the limiting reason."""
+        waits = {}
+        if len(self._log) >= self.rpm:
+            # The request fits once enough of the oldest reservations expire
+            waits["rpm"] = self._log[len(self._log) - self.rpm][0] + HOLD - now
+        # A request larger than the limit runs alone in an otherwise empty window
+        need = min(float(tokens), float(self.tpm))
+        used = sum(t for _, t in self._log)
+        if used + need > self.tpm:
+            for time_, t in self._log:
+                used -= t
+                if used + need <= self.tpm:
+                    waits["tpm"] = time_ + HOLD - now
+                    break
+        if self.rpd and sum(self._days.values()) >= self.rpd:
+            excess = sum(self._days.values()) - self.rpd + 1
+            for index in sorted(self._days):
+                excess -= self._days[index]
+                if excess <= 0:
+                    waits["rpd"] = (index + 1) * BIN + DAY - now
+                    break
+        if not waits:
+            return 0.0, ""
+        name = max(waits, key=waits.get)
+        return max(waits[name], MIN_WAIT), REASONS[name]
+
+    def try_reserve(self, tokens: int) -> Tuple[float, str, Optional[float]]:
+        """
+        Record one request of `tokens` tokens if every window has room.
+
+        Args:
+            tokens: Estimated tokens of the request.
+
+        Returns:
+            (0.0, "", reservation time) when reserved, else (seconds to wait,
+            limiting reason, None) and nothing is recorded.
+        """
+        def take(now):
+            wait, reason = self._wait(now, tokens)
+            if wait > 0:
+                return wait, reason, None
+            self._log.append([now, float(tokens)])
+            index = int(now // BIN)
+            self._days[index] = self._days.get(index, 0) + 1
+            return 0.0, "", now
+
+        return self._locked(take)
+
+    def reserve(self, tokens: int) -> Tuple[float, str]:
+        """
+        Take one request and `tokens` tokens if every window has room.
+
+        Args:
+            tokens: Estimated tokens of the request.
+
+        Returns:
+            (0.0, "") when reserved, else (seconds to wait, limiting
+            reason) and nothing is taken.
+        """
+        return self.try_reserve(tokens)[:2]
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> float:
+        """
+        Block until a request of `tokens` tokens fits, then reserve it.
+
+        Args:
+            tokens: Estimated tokens of the request.
+            timeout: Maximum seconds to wait (None = no limit).
+
+        Returns:
+            The reservation time (pass it to adjust()).
+
+        Raises:
+            TimeoutError: If the request does not fit within `timeout`.
+        """
+        start = time.monotonic()
+        while True:
+            wait, reason, reserved_at = self.try_reserve(tokens)
+            if reserved_at is not None:
+                return reserved_at
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise TimeoutError(f"{reason}: no capacity within {timeout:.1f}s")
+            print(f"[THROTTLE] {reason}: Waiting {wait:.1f}s...")
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int, timeout: Optional[float] = None) -> float:
+        """
+        Async variant of acquire(): waits with asyncio.sleep instead of blocking the loop.
+
+        Reservations take the thread and file locks, which block while
+        another thread or process holds them, so they run in a worker thread.
+        """
+        start = time.monotonic()
+        while True:
+            wait, reason, reserved_at = await asyncio.to_thread(self.try_reserve, tokens)
+            if reserved_at is not None:
+                return reserved_at
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise TimeoutError(f"{reason}: no capacity within {timeout:.1f}s")
+            print(f"[THROTTLE] {reason}: Waiting {wait:.1f}s...")
+            await asyncio.sleep(wait)
+
+    def adjust(self, tokens: int, reserved_at: float) -> None:
+        """
+        Correct a reservation's tokens once the request's real size is known.
+
+        The correction is booked on the reservation itself, so it leaves the
+        window together with it. Reservations that already left the window
+        are not corrected.
+
+        Args:
+            tokens: Actual minus reserved tokens; negative values refund.
+            reserved_at: Reservation time returned by acquire().
+        """
+        def book(now):
+            for entry in self._log:
+                if entry[0] == reserved_at:
+                    entry[1] = max(0.0, entry[1] + tokens)
+                    return
+
+        self._locked(book)
+
+    def headroom(self) -> Dict[str, float]:
+        """
+        Return the capacity currently available in each window.
+
+        Returns:
+            {"rpm": requests, "tpm": tokens, "rpd": requests} (rpd only with a daily limit).
+        """
+        def free(now):
+            result = {
+                "rpm": float(self.rpm - len(self._log)),
+                "tpm": round(self.tpm - sum(t for _, t in self._log), 1),
+            }
+            if self.rpd:
+                result["rpd"] = float(self.rpd - sum(self._days.values()))
+            return result
+
+        return self._locked(free)
+
+
+def state_dir() -> Path:
+    """Directory holding the shared limiter (and token calibration) state."""
+    return Path(os.getenv("GLASSOPS_RATE_LIMIT_DIR") or Path(tempfile.gettempdir()) / "glassops-ratelimit")
+
+
+def get_rate_limiter(api_key: str, model: str) -> RateLimiter:
+    """
+    Return the limiter shared by all callers of one API key and model.
+
+    The key is only used through a hash (for the registry and state file name).
+    """
+    key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get((key_id, model))
+        if limiter is None:
+            limits = limits_for_model(model)
+            state_path = state_dir() / f"{key_id}-{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}.json"
+            try:
+                state_path.parent.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                print(f"[WARNING] Rate limit state not shared across processes ({e})")
+                state_path = None
+            limiter = RateLimiter(limits["rpm"], limits["tpm"], limits.get("rpd"), state_path)
+            _LIMITERS[(key_id, model)] = limiter
+        return limiter
@@ -0,0 +1,246 @@
+# llm/response_cache.py
+"""
+Persistent LLM response cache with record/replay.
+
+Responses are stored in a SQLite database (WAL mode, shared by threads and
+processes) under a key derived from (kind, model, temperature, max output
+tokens, prompt hash), so an identical request is answered from disk instead
+of being sent and paid for again. Entries are evicted least-recently-used
+once the database outgrows its size limit.
+
+Modes (``llm_cache.mode`` in config.json, overridden by GLASSOPS_LLM_CACHE):
+
+- off:       no caching
+- readwrite: answer from the cache, send and store on a miss (default)
+- record:    always send, store every response (refreshes a recording)
+- replay:    answer only from the cache, never touch the network; a miss
+             fails like an unavailable model
+
+Record a run once, then replay it to run ``--generate`` or ``query_index``
+offline and deterministically (e.g. for benchmarks without network noise).
+GLASSOPS_LLM_CACHE_PATH points runs at a specific recording.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from knowledge.llm.fake_genai import active_fake_backend
+
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.json"
+
+MODES = ("off", "readwrite", "record", "replay")
+DEFAULT_SETTINGS = {
+    "mode": "readwrite",
+    "path": "config/llm-cache.sqlite",  # relative to the package root
+    "max_mb": 256,
+}
+EVICT_TO = 0.9  # eviction frees space down to this fraction of the limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,             -- generate | embed
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,            -- response text (JSON vector for embeddings)
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+"""
+
+_CACHES: Dict[Tuple[str, str], "ResponseCache"] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache shared by all threads of a process.
+    """
+
+    def __init__(self, db_path: Path, mode: str = "readwrite", max_bytes: int = 256 * 1024 * 1024):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path: Path to the SQLite file.
+            mode: One of MODES other than "off".
+            max_bytes: Size limit of the stored responses.
+        """
+        if mode not in MODES or mode == "off":
+            raise ValueError(f"Invalid response cache mode: {mode!r}")
+        self.db_path = Path(db_path)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30.0, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def replay(self) -> bool:
+        """True when requests must not reach the network."""
+        return self.mode == "replay"
+
+    @staticmethod
+    def key(kind: str, model: str, prompt: str, temperature: Optional[float] = None,
+            max_output_tokens: Optional[int] = None) -> str:
+        """
+        Cache key of a request.
+
+        Args:
+            kind: Request kind ("generate" or "embed").
+            model: Model name.
+            prompt: Prompt (or text to embed).
+            temperature: Sampling temperature (None = model default).
+            max_output_tokens: Output limit (None = model default).
+        """
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        material = json.dumps([kind, model, temperature, max_output_tokens, prompt_hash])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the stored response for a key (None on a miss, and always in record mode).
+
+        Args:
+            key: Cache key (see key()).
+        """
+        if self.mode == "record":
+            return None
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key: str, kind: str, model: str, value: str) -> None:
+        """
+        Store a response (ignored in replay mode) and evict old entries if over the limit.
+
+        Args:
+            key: Cache key (see key()).
+            kind: Request kind.
+            model: Model name.
+            value: Response text.
+        """
+        if self.replay:
+            return
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, model, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, value, size, now, now),
+            )
+            self.conn.commit()
+            self._size += size - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries down to EVICT_TO of the limit (called with the lock held)."""
+        # Other processes write to the same database; start from its real size
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_bytes * EVICT_TO
+        evicted = 0
+        for key, size in self.conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            if self._size <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            evicted += 1
+        self.conn.commit()
+        if evicted:
+            print(f"[CACHE] Evicted {evicted} LLM response(s) from {self.db_path.name}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache usage.
+
+        Returns:
+            {"entries", "bytes", "hits", "misses"}; hits and misses count this process only.
+        """
+        with self._lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self.conn.close()
+
+
+def cache_settings() -> Dict[str, object]:
+    """
+    Return the effective {"mode", "path", "max_mb"} settings.
+
+    Environment variables override ``llm_cache`` in config.json, which
+    overrides DEFAULT_SETTINGS.
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            settings.update(json.load(f).get("llm_cache", {}))
+    except Exception:
+        pass
+    settings["mode"] = os.getenv("GLASSOPS_LLM_CACHE") or settings["mode"]
+    path = Path(os.getenv("GLASSOPS_LLM_CACHE_PATH") or settings["path"])
+    settings["path"] = path if path.is_absolute() else Path(__file__).parent.parent / path
+    return settings
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache, or None when caching is off.
+
+    Caching is also off while the fake GenAI backend is active: its responses
+    would otherwise be stored under the same keys as real ones. Settings are
+    re-read on each call, so changing GLASSOPS_LLM_CACHE takes effect for
+    clients created afterwards.
+    """
+    settings = cache_settings()
+    mode = settings["mode"]
+    if mode == "off" or active_fake_backend():
+        return None
+    if mode not in MODES:
+        print(f"[WARNING] Unknown LLM cache mode {mode!r}; caching disabled")
+        return None
+    path = Path(settings["path"])
+    with _CACHES_LOCK:
+        cache = _CACHES.get((mode, str(path)))
+        if cache is None:
+            try:
+                cache = ResponseCache(path, mode, int(float(settings["max_mb"]) * 1024 * 1024))
+            except (OSError, sqlite3.Error) as e:
+                if mode == "replay":
+                    raise
+                print(f"[WARNING] LLM response cache unavailable ({e}); caching disabled")
+                return None
+            _CACHES[(mode, str(path))] = cache
+            if mode != "readwrite":
+                print(f"[CACHE] LLM responses: {mode} mode ({path.name})")
+        return cache
@@ -0,0 +1,178 @@
+# llm/tokens.py
+"""
+Token estimation for rate limiting, calibrated from provider usage metadata.
+
+The local approximation splits text the way SentencePiece-style tokenizers
+tend to: common words are one token, long identifiers and camelCase parts
+split further, digits and punctuation count individually, and runs of
+indentation or newlines are one token each. Code therefore costs more per
+character than prose, unlike a flat ``len(text) // 4``.
+
+Each model keeps two running averages (EWMA) learned from the
+``usage_metadata`` of real responses:
+
+- input ratio: actual prompt tokens / local approximation
+- output tokens: actual completion (and thinking) tokens per request,
+  kept separately per max_output_tokens setting (a 240-token summary and
+  an 8192-token document have very different typical lengths)
+
+Estimates only size the rate-limiter reservation; after each response the
+client books the actual token count back into the limiter (see
+LLMClient.record_usage), so errors in an estimate never accumulate.
+Calibration is persisted next to the rate limiter state, so new processes
+start calibrated.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Words, digit runs, whitespace runs that carry layout (newlines, indentation), single symbols
+_PIECES = re.compile(r"[A-Za-z]+|\d|\n[ \t]*|[ \t]{2,}|[^\sA-Za-z\d]")
+_CAMEL = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])")
+
+# Characters per token for alphabetic runs once a word no longer fits one token
+WORD_CHARS_PER_TOKEN = 6
+
+# Starting point before any usage metadata has been seen
+INITIAL_OUTPUT_TOKENS = 512
+ALPHA = 0.1  # EWMA weight of each new observation
+SAVE_EVERY = 20
+
+_ESTIMATORS: Dict[str, "TokenEstimator"] = {}
+_ESTIMATORS_LOCK = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Local token approximation of `text` (uncalibrated)."""
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        if piece[0].isalpha():
+            for part in _CAMEL.findall(piece) or [piece]:
+                tokens += max(1, math.ceil(len(part) / WORD_CHARS_PER_TOKEN))
+        else:
+            tokens += 1
+    return tokens
+
+
+def usage_tokens(response) -> Optional[Tuple[int, int]]:
+    """
+    Read (prompt tokens, output tokens) from a response's usage_metadata.
+
+    Output includes thinking tokens, which count towards TPM as well.
+    Returns None when the response carries no usage metadata.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    prompt = getattr(usage, "prompt_token_count", None) if usage else None
+    if not prompt:
+        return None
+    output = (getattr(usage, "candidates_token_count", None) or 0) + (getattr(usage, "thoughts_token_count", None) or 0)
+    return prompt, output
+
+
+class TokenEstimator:
+    """
+    Per-model token estimator with continuous calibration. Thread-safe.
+    """
+
+    def __init__(self, model: str, state_path: Optional[Path] = None):
+        """
+        Args:
+            model: Model name.
+            state_path: JSON file persisting the calibration (None = not persisted).
+        """
+        self.model = model
+        self.state_path = Path(state_path) if state_path else None
+        self.input_ratio = 1.0
+        self.output_tokens: Dict[str, float] = {}  # {str(max_output_tokens): EWMA}
+        self.observations = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        """Start from the persisted calibration, if any."""
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            state = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self.input_ratio = float(state["input_ratio"])
+            self.output_tokens = {k: float(v) for k, v in state["output_tokens"].items()}
+            self.observations = int(state.get("observations", 0))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[WARNING] Ignoring token calibration {self.state_path}: {e}")
+
+    def _save(self) -> None:
+        """Persist the calibration (called with the lock held)."""
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps({
+                "model": self.model,
+                "input_ratio": self.input_ratio,
+                "output_tokens": self.output_tokens,
+                "observations": self.observations,
+            }), encoding="utf-8")
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"[WARNING] Could not save token calibration {self.state_path}: {e}")
+
+    def estimate_input(self, text: str) -> int:
+        """Calibrated prompt token estimate."""
+        return max(1, round(count_tokens(text) * self.input_ratio))
+
+    def estimate_output(self, max_output_tokens: Optional[int] = None) -> int:
+        """Expected completion tokens, capped at max_output_tokens."""
+        expected = round(self.output_tokens.get(str(max_output_tokens or 0), INITIAL_OUTPUT_TOKENS))
+        return min(expected, max_output_tokens) if max_output_tokens else expected
+
+    def estimate_request(self, prompt: str, max_output_tokens: Optional[int] = None) -> int:
+        """Tokens to reserve for one request: calibrated prompt plus expected output."""
+        return self.estimate_input(prompt) + self.estimate_output(max_output_tokens)
+
+    def observe(self, prompt: str, prompt_tokens: int, output_tokens: int,
+                max_output_tokens: Optional[int] = None) -> None:
+        """
+        Calibrate from one response's usage metadata.
+
+        Args:
+            prompt: The prompt that was sent.
+            prompt_tokens: Actual prompt tokens reported by the provider.
+            output_tokens: Actual output tokens reported by the provider.
+            max_output_tokens: The request's output limit.
+        """
+        local = count_tokens(prompt)
+        with self._lock:
+            # The first observations move the averages faster than the steady-state ALPHA
+            alpha = max(ALPHA, 1.0 / (self.observations + 1))
+            if local:
+                self.input_ratio += alpha * (prompt_tokens / local - self.input_ratio)
+            key = str(max_output_tokens or 0)
+            current = self.output_tokens.get(key)
+            self.output_tokens[key] = float(output_tokens) if current is None \
+                else current + alpha * (output_tokens - current)
+            self.observations += 1
+            if self.state_path and self.observations % SAVE_EVERY == 0:
+                self._save()
+
+
+def get_token_estimator(model: str, state_dir: Optional[Path] = None) -> TokenEstimator:
+    """
+    Return the process-wide estimator of a model.
+
+    Args:
+        model: Model name.
+        state_dir: Directory for the persisted calibration (first call only).
+    """
+    with _ESTIMATORS_LOCK:
+        estimator = _ESTIMATORS.get(model)
+        if estimator is None:
+            state_path = None
+            if state_dir:
+                state_path = Path(state_dir) / f"tokens-{re.sub(r'[^A-Za-z0-9_.-]', '_', model)}.json"
+            estimator = TokenEstimator(model, state_path)
+            _ESTIMATORS[model] = estimator
+        return estimator
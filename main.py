@@ -23,8 +23,11 @@ if str(PACKAGE_ROOT) not in sys.path:
 from knowledge.ingestion.federated_loader import discover_and_chunk_docs
 from knowledge.embeddings.router_embedding import get_embeddings_for_docs
 from knowledge.ingestion.index_builder import build_or_update_index
+from knowledge.ingestion.summarizer import summarize_chunks
+from knowledge.ingestion.index_versions import active_version, default_index_dir, migrate_index
 from knowledge.drift.detect_drift import detect_drift
-from knowledge.rag.query_engine import query_index
+from knowledge.rag.query_engine import query_index, stream_query_index
+from knowledge.rag.filters import build_where_filter
 from knowledge.generation import Generator
 
 # Optional: load config
@@ -40,23 +43,125 @@ with open(CONFIG_PATH, "r", encoding="utf-8") as f:
 
 import argparse
 
-def run_generate(patterns: list[str]) -> None:
-    """Run documentation generation for the given patterns."""
+def run_generate(patterns: list[str], workers: int = 1, chunk_workers: int = 4, reduce: bool = False,
+                 pack: bool = False, plan_only: bool = False, plan_out: str | None = None,
+                 from_plan: str | None = None, enqueue: bool = False, worker: bool = False,
+                 queue: str | None = None, worker_id: str | None = None, lease_seconds: float = 900.0,
+                 api_key_env: str = "GOOGLE_API_KEY", max_requests: int | None = None,
+                 max_tokens: int | None = None) -> None:
+    """Run documentation generation for the given patterns (or plan it without calling the LLM)."""
+    generator = Generator(str(ROOT_DIR), workers=workers, chunk_workers=chunk_workers, reduce=reduce, pack=pack,
+                          api_key_env=api_key_env, priority=config.get("generation_priority"),
+                          max_requests=max_requests, max_tokens=max_tokens)
+    queue_path = Path(queue) if queue else ROOT_DIR / "config" / "generation-queue.sqlite"
+
+    # Distributed mode: one --enqueue, then any number of --worker processes
+    if worker:
+        generator.work(queue_path, worker_id=worker_id, lease_seconds=lease_seconds)
+        return
+
+    plan = None
+    if from_plan:
+        with open(from_plan, "r", encoding="utf-8") as f:
+            plan = json.load(f)
+
+    if enqueue:
+        generator.enqueue(queue_path, patterns=patterns, plan=plan)
+        print(f"[SUCCESS] Start workers with --generate --worker --queue {queue_path}")
+        return
+
+    if plan is not None:
+        print("[INFO] Starting documentation generation from plan...")
+        generator.run_plan(plan)
+        return
+
+    if plan_only or plan_out:
+        plan = generator.plan(patterns)
+        Generator.print_plan(plan)
+        if plan_out:
+            with open(plan_out, "w", encoding="utf-8") as f:
+                json.dump(plan, f, indent=2)
+            print(f"[SUCCESS] Plan written to {plan_out} (run it with --generate --from-plan {plan_out})")
+        return
+
     print("[INFO] Starting documentation generation...")
-    generator = Generator(str(ROOT_DIR))
     generator.run(patterns)
 
 
+def print_streamed_query(query: str, where: dict | None = None, auto_filter: bool = False) -> None:
+    """Run a RAG query and print the answer incrementally as tokens arrive."""
+    for fragment in stream_query_index(query, where=where, auto_filter=auto_filter):
+        print(fragment, end="", flush=True)
+    print("\n")
+
+
 def run_pipeline():
     parser = argparse.ArgumentParser(description="GlassOps Knowledge Pipeline")
     parser.add_argument("--query", "-q", type=str, help="Run a RAG query against the knowledge base")
     parser.add_argument("query_pos", nargs="*", help="Positional query string (joined by space)")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Print the RAG answer only once the full completion has arrived")
+    parser.add_argument("--domain", type=str, help="Only retrieve chunks whose frontmatter domain matches")
+    parser.add_argument("--type", type=str, dest="doc_type", help="Only retrieve chunks whose frontmatter type matches (e.g. ADR)")
+    parser.add_argument("--path-prefix", type=str, help="Only retrieve chunks from files under this directory")
+    parser.add_argument("--auto-filter", action="store_true",
+                        help="Infer a domain filter from the question when no explicit filter is given")
     parser.add_argument("--index", "-i", action="store_true", help="Force re-indexing of documents")
+    parser.add_argument("--summarize", action="store_true",
+                        help="Precompute per-chunk summaries while indexing (also enabled by summaries.enabled in config)")
+    parser.add_argument("--migrate-embeddings", type=str, metavar="MODEL",
+                        help="Re-embed the index with MODEL into a new version, then switch to it atomically")
+    parser.add_argument("--migrate-batches", type=int, default=None,
+                        help="Stop a migration after N batches (resume by running it again)")
+    parser.add_argument("--migrate-delay", type=float, default=0.0,
+                        help="Seconds to pause between migration batches to spread quota use")
+    parser.add_argument("--no-activate", action="store_true",
+                        help="Build the migrated version without switching queries to it")
     parser.add_argument("--generate", "-g", action="store_true", help="Generate documentation from source code")
     parser.add_argument("--pattern", "-p", type=str, action="append", dest="patterns",
                         help="Glob pattern(s) for --generate (can be specified multiple times)")
+    parser.add_argument("--workers", "-w", type=int, default=config.get("generation_workers", 1),
+                        help="Files to generate concurrently with --generate (shared rate limit)")
+    parser.add_argument("--chunk-workers", type=int, default=config.get("generation_chunk_workers", 4),
+                        help="Chunks of one file to generate concurrently with --generate (shared rate limit)")
+    parser.add_argument("--reduce", action="store_true", default=config.get("generation_reduce", False),
+                        help="Merge the chunk outputs of large files into one document with an extra LLM call")
+    parser.add_argument("--pack", action="store_true", default=config.get("generation_pack", False),
+                        help="Generate several small files per LLM request (split and validated per file)")
+    parser.add_argument("--plan", action="store_true",
+                        help="With --generate: report files, chunks, token and time estimates without calling the LLM")
+    parser.add_argument("--plan-out", type=str, metavar="PATH",
+                        help="With --generate: write the plan as JSON to PATH (implies --plan)")
+    parser.add_argument("--from-plan", type=str, metavar="PATH",
+                        help="With --generate: generate exactly the files in a plan written by --plan-out")
+    parser.add_argument("--max-requests", type=int, default=config.get("generation_max_requests"),
+                        help="With --generate: request budget; lower-priority files that do not fit are deferred")
+    parser.add_argument("--max-tokens", type=int, default=config.get("generation_max_tokens"),
+                        help="With --generate: estimated token budget; lower-priority files that do not fit are deferred")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="With --generate: add changed files (or --from-plan files) to a shared work queue")
+    parser.add_argument("--worker", action="store_true",
+                        help="With --generate: process files from the work queue until it is drained")
+    parser.add_argument("--queue", type=str, metavar="PATH",
+                        help="Work queue database for --enqueue/--worker (default: config/generation-queue.sqlite)")
+    parser.add_argument("--worker-id", type=str, help="Lease owner name for --worker (default: host-pid)")
+    parser.add_argument("--lease-seconds", type=float, default=900.0,
+                        help="Lease duration for --worker; expired leases are reclaimed by other workers")
+    parser.add_argument("--api-key-env", type=str, default="GOOGLE_API_KEY", metavar="VAR",
+                        help="Environment variable holding the API key (e.g. one key per worker)")
     args = parser.parse_args()
 
+    # Embedding model migration mode (queries keep using the active version meanwhile)
+    if args.migrate_embeddings:
+        migrate_index(
+            args.migrate_embeddings,
+            batch_size=config.get("batch_size", 10),
+            max_batches=args.migrate_batches,
+            batch_delay=args.migrate_delay,
+            activate=not args.no_activate,
+        )
+        return
+
     # Documentation generation mode
     if args.generate:
         patterns = args.patterns if args.patterns else [
@@ -79,7 +184,11 @@ def run_pipeline():
             "!**/venv/**",
             "!**/__pycache__/**",
         ]
-        run_generate(patterns)
+        run_generate(patterns, workers=args.workers, chunk_workers=args.chunk_workers, reduce=args.reduce,
+                     pack=args.pack, plan_only=args.plan, plan_out=args.plan_out, from_plan=args.from_plan,
+                     enqueue=args.enqueue, worker=args.worker, queue=args.queue, worker_id=args.worker_id,
+                     lease_seconds=args.lease_seconds, api_key_env=args.api_key_env,
+                     max_requests=args.max_requests, max_tokens=args.max_tokens)
         return
 
     # Consolidate query from flag OR positional args
@@ -99,9 +208,22 @@ def run_pipeline():
         docs = discover_and_chunk_docs()
         print(f"Found {len(docs)} docs.")
 
+        # Optional: precompute compact chunk summaries (cached by chunk hash)
+        summary_cfg = config.get("summaries", {})
+        if args.summarize or summary_cfg.get("enabled"):
+            print("Summarizing chunks...")
+            summarize_chunks(
+                docs,
+                model=summary_cfg.get("model", "gemma-3-27b-it"),
+                min_chars=summary_cfg.get("min_chars", 1500),
+            )
+
         # Step 2: Compute embeddings using router (Gemini primary, fallback Gemma)
         print("Generating embeddings...")
-        embeddings = get_embeddings_for_docs(docs, batch_size=config.get("batch_size", 10))
+        _, active_info = active_version(default_index_dir())
+        embeddings = get_embeddings_for_docs(
+            docs, batch_size=config.get("batch_size", 10), model=active_info.get("model")
+        )
         print(f"Generated embeddings for {len(embeddings)} docs.")
 
         # Step 3: Build or update vector store
@@ -122,8 +244,13 @@ def run_pipeline():
     # Step 5: RAG query (Example OR User provided)
     if final_query:
         print(f"Query: {final_query}")
-        response = query_index(final_query)
-        print(f"\nRAG Response:\n{response}\n")
+        where = build_where_filter(domain=args.domain, doc_type=args.doc_type, path_prefix=args.path_prefix)
+        if args.no_stream:
+            response = query_index(final_query, where=where, auto_filter=args.auto_filter)
+            print(f"\nRAG Response:\n{response}\n")
+        else:
+            print("\nRAG Response:")
+            print_streamed_query(final_query, where=where, auto_filter=args.auto_filter)
     elif args.index:
         print("Re-indexing complete. Use --query '...' to ask questions.")
     else:
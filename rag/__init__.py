@@ -1,6 +1,7 @@
 # knowledge/rag/__init__.py
 # Expose RAG query engine
 
-from .query_engine import query_index
+from .query_engine import query_index, stream_query_index, aquery_index
+from .filters import build_where_filter, infer_domain_filter
 
-__all__ = ["query_index"]
+__all__ = ["query_index", "stream_query_index", "aquery_index", "build_where_filter", "infer_domain_filter"]
@@ -0,0 +1,106 @@
+# filters.py
+# Metadata pre-filters for retrieval, pushed down into the Chroma `where` clause
+
+import json
+import os
+import re
+from pathlib import Path
+
+# Number of leading path components indexed as `path_prefix_<n>` metadata
+PATH_PREFIX_DEPTH = 6
+
+# Sidecar written next to the index listing the distinct facet values
+FACETS_FILENAME = "index_facets.json"
+FACET_KEYS = ("domain", "type")
+
+
+def path_prefix_fields(source_file):
+    """
+    Expand a source path into scalar prefix fields so prefix filters can be
+    expressed as equality matches (Chroma has no `startswith` on metadata).
+    e.g. "packages/knowledge/docs/a.md" ->
+        {"path_prefix_1": "packages", "path_prefix_2": "packages/knowledge", ...}
+    """
+    parts = Path(source_file).as_posix().split("/")[:-1]  # directories only
+    fields = {}
+    for depth in range(1, min(len(parts), PATH_PREFIX_DEPTH) + 1):
+        fields[f"path_prefix_{depth}"] = "/".join(parts[:depth])
+    return fields
+
+
+def build_where_filter(domain=None, doc_type=None, path_prefix=None, where=None):
+    """
+    Combine the convenience filters with an optional raw Chroma `where` clause.
+    returns: a Chroma where dict, or None if no filter applies
+    """
+    clauses = []
+    if where:
+        clauses.append(where)
+    if domain:
+        clauses.append({"domain": domain})
+    if doc_type:
+        clauses.append({"type": doc_type})
+    if path_prefix:
+        parts = [p for p in Path(path_prefix).as_posix().split("/") if p and p != "."]
+        if len(parts) > PATH_PREFIX_DEPTH:
+            print(f"Warning: path prefix deeper than {PATH_PREFIX_DEPTH} levels, filtering on '{'/'.join(parts[:PATH_PREFIX_DEPTH])}'")
+            parts = parts[:PATH_PREFIX_DEPTH]
+        if parts:
+            clauses.append({f"path_prefix_{len(parts)}": "/".join(parts)})
+
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
+def update_facets(persist_dir, metadatas):
+    """Merge the facet values of freshly indexed metadata into the sidecar file."""
+    facets = load_facets(persist_dir)
+    for meta in metadatas:
+        for key in FACET_KEYS:
+            value = meta.get(key)
+            if isinstance(value, str) and value:
+                facets.setdefault(key, set()).add(value)
+
+    path = os.path.join(persist_dir, FACETS_FILENAME)
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({k: sorted(v) for k, v in facets.items()}, f, indent=2)
+    except Exception as e:
+        print(f"Warning: Could not write index facets: {e}")
+
+
+def load_facets(persist_dir):
+    """returns: {facet_key: set(values)} from the sidecar, empty if missing"""
+    path = os.path.join(persist_dir, FACETS_FILENAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {k: set(v) for k, v in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Warning: Could not read index facets: {e}")
+        return {}
+
+
+def infer_domain_filter(query, known_domains):
+    """
+    Lightweight keyword classifier: if the question names one or more known
+    domains (e.g. "how does the runtime retry?"), restrict retrieval to them.
+    returns: a Chroma where dict, or None if no domain is mentioned
+    """
+    words = set(re.findall(r"[a-z0-9]+(?:[-_][a-z0-9]+)*", query.lower()))
+    matches = sorted(
+        d for d in known_domains
+        if d != "global" and (
+            d.lower() in words
+            or ("-" in d and d.lower().replace("-", " ") in query.lower())
+        )
+    )
+    if not matches:
+        return None
+    if len(matches) == 1:
+        return {"domain": matches[0]}
+    return {"domain": {"$in": matches}}
@@ -1,104 +1,222 @@
 # query_engine.py
+import asyncio
 import chromadb
 import os
-from google import genai
-from google.genai import types
+import threading
+import weakref
 import json
 from pathlib import Path
-from knowledge.embeddings.router_embedding import get_embeddings_for_docs
+from knowledge.embeddings.router_embedding import get_embeddings_for_docs, aget_embeddings_for_docs
+from knowledge.llm.async_client import AsyncLLMClient
+from knowledge.llm.client import LLMClient
+from knowledge.llm.response_cache import get_response_cache
+from knowledge.rag.filters import infer_domain_filter, load_facets
+from knowledge.ingestion.index_versions import active_version
+from knowledge.ingestion.index_store import close_chroma_client, current_generation_dir
 
-def query_index(query, n_results=5):
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.json"
+GENERATION_MODEL = 'gemma-3-12b-it'
+DEFAULT_QUERY_CONCURRENCY = 8
+DEFAULT_QUERY_DEADLINE = 60.0  # seconds per async answer, including throttling and retries
+
+# Pooled per process: opening a PersistentClient per question re-reads the
+# index metadata from disk, which dominates latency for concurrent callers.
+_collections = {}  # (persist_dir, collection name) -> (client, collection)
+# Clients of the generation superseded last, kept open for queries still running on it
+_retired_clients = []
+_collections_lock = threading.Lock()
+
+# One limiter per event loop (asyncio primitives are bound to their loop)
+_query_limiters = weakref.WeakKeyDictionary()
+
+
+def _load_config():
+    """Load config.json, returning an empty dict if it cannot be read."""
+    try:
+        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not load config: {e}")
+        return {}
+
+
+def _replaying():
+    """True when LLM responses come only from a recording (no API key needed)."""
+    cache = get_response_cache()
+    return bool(cache and cache.replay)
+
+
+def _inject_trigger_files(query, context_chunks, sources, cfg):
+    """Post-retrieval: prepend config-based trigger files (e.g. drift_report.md) to the context."""
+    try:
+        triggers = cfg.get("retrieval_triggers", {})
+
+        project_root = Path(__file__).parent.parent.parent.parent
+        injected_files = set()
+
+        for keyword, rel_path in triggers.items():
+            if keyword.lower() in query.lower():
+                # Resolve path relative to project root
+                abs_path = project_root / rel_path
+                if abs_path.exists() and str(abs_path) not in injected_files:
+                    try:
+                        content = abs_path.read_text(encoding="utf-8")
+                        # Prepend to context (high priority)
+                        context_chunks.insert(0, f"--- START SYSTEM REPORT ({rel_path}) ---\n{content}\n--- END SYSTEM REPORT ---\n")
+                        sources.insert(0, str(abs_path))
+                        injected_files.add(str(abs_path))
+                        print(f"DEBUG: Trigger '{keyword}' detected. Injected {rel_path}.")
+                    except Exception as e:
+                        print(f"Warning: Failed to inject trigger file {rel_path}: {e}")
+
+    except Exception as e:
+        print(f"Warning: Trigger mechanism failed: {e}")
+
+
+def _index_dir():
+    """The published index generation (resolved per query so reindexing never blocks readers)."""
+    return current_generation_dir()
+
+
+def _get_collection():
     """
-    query: string
-    returns: summarized answer from RAG
+    Return (collection, embedding_model) for the active index version,
+    or (None, None) if the index does not exist.
     """
-    print(f"DEBUG: Querying for '{query}'...")
-    
-    # 1. Embed the query
+    persist_dir = _index_dir()
+    if persist_dir is None or not os.path.exists(persist_dir):
+        return None, None
+
+    # Re-read on every call so a version switch is picked up without a restart
+    name, info = active_version(persist_dir)
+    with _collections_lock:
+        entry = _collections.get((persist_dir, name))
+        if entry is None:
+            superseded = [k for k in _collections if k[0] != persist_dir]
+            if superseded:
+                # Chroma keeps a system (with open sqlite handles) per persist dir until
+                # its clients are closed; release the generation before the one being
+                # superseded now, so every publish does not leak one.
+                for client in _retired_clients:
+                    close_chroma_client(client)
+                _retired_clients[:] = [_collections.pop(k)[0] for k in superseded]
+            client = chromadb.PersistentClient(path=persist_dir)
+            entry = (client, client.get_or_create_collection(name=name))
+            _collections[(persist_dir, name)] = entry
+        return entry[1], info.get("model")
+
+
+def _get_query_limiter(cfg):
+    """Return the concurrency limiter for the running event loop."""
+    loop = asyncio.get_running_loop()
+    limiter = _query_limiters.get(loop)
+    if limiter is None:
+        limiter = asyncio.Semaphore(cfg.get("query_concurrency", DEFAULT_QUERY_CONCURRENCY))
+        _query_limiters[loop] = limiter
+    return limiter
+
+
+def _resolve_where(query, where, auto_filter):
+    """Apply the domain classifier when no explicit filter was given."""
+    if where is None and auto_filter:
+        persist_dir = _index_dir()
+        known_domains = load_facets(persist_dir).get("domain", set()) if persist_dir else set()
+        where = infer_domain_filter(query, known_domains)
+        if where:
+            print(f"DEBUG: Inferred retrieval filter {where}.")
+    return where
+
+
+def _select_context(documents, metadatas, cfg):
+    """
+    Pick what to send to the generator for each hit, per summaries.query_context:
+    - "full": raw chunk text (default)
+    - "summary": precomputed chunk summaries where available
+    - "summary_top_full": full text for the top hit, summaries for the rest
+    """
+    mode = cfg.get("summaries", {}).get("query_context", "full")
+    if mode == "full":
+        return list(documents)
+
+    selected = []
+    for rank, (doc, meta) in enumerate(zip(documents, metadatas or [None] * len(documents))):
+        summary = (meta or {}).get("summary")
+        if not summary or (mode == "summary_top_full" and rank == 0):
+            selected.append(doc)
+        else:
+            selected.append(summary)
+    return selected
+
+
+def _unpack_results(query, results, cfg):
+    """Turn a ChromaDB query result into (context_chunks, sources) and apply trigger injection."""
+    metadatas = results['metadatas'][0] if results.get('metadatas') else None
+    context_chunks = _select_context(results['documents'][0], metadatas, cfg)
+    sources = results['ids'][0]
+
+    _inject_trigger_files(query, context_chunks, sources, cfg)
+    return context_chunks, sources
+
+
+def _retrieve_context(query, n_results, cfg, where=None, auto_filter=False):
+    """
+    Embed the query, search ChromaDB (pre-filtered by `where`) and apply trigger injection.
+    returns: (context_chunks, sources, error) where error is a user-facing string or None
+    """
+    collection, model = _get_collection()
+    if collection is None:
+        return [], [], "Error: Index not found. Please run with --index first."
+
+    # 1. Embed the query (with the model that produced the active version's vectors)
     # We strip it into a list wrapper because our embedding function expects list[str]
     # unpacking the list of list result [ [0.1, ...] ] -> [0.1, ...]
     try:
-        query_embeddings = get_embeddings_for_docs([{"content": query}])[0][1]
+        query_embeddings = get_embeddings_for_docs([{"content": query}], model=model)[0][1]
     except Exception as e:
-        return f"Error generating embedding: {e}"
+        return [], [], f"Error generating embedding: {e}"
 
     # 2. Query ChromaDB
-    persist_dir = os.path.join(os.getcwd(), "glassops_index")
-    if not os.path.exists(persist_dir):
-        return "Error: Index not found. Please run with --index first."
-        
-    client = chromadb.PersistentClient(path=persist_dir)
-    collection = client.get_or_create_collection(name="glassops_knowledge")
-    
+
     results = collection.query(
         query_embeddings=[query_embeddings],
-        n_results=n_results
+        n_results=n_results,
+        where=_resolve_where(query, where, auto_filter)
     )
-    
+
     # 3. Construct Context
-    context_chunks = results['documents'][0]
-    sources = results['ids'][0]
+    context_chunks, sources = _unpack_results(query, results, cfg)
+    return context_chunks, sources, None
 
-    # Post-retrieval: Check for config-based file injection
-    try:
-        config_path = Path(__file__).parent.parent / "config" / "config.json"
-        with open(config_path, "r", encoding="utf-8") as f:
-            cfg = json.load(f)
-            triggers = cfg.get("retrieval_triggers", {})
-            
-            project_root = Path(__file__).parent.parent.parent.parent
-            injected_files = set()
-            
-            for keyword, rel_path in triggers.items():
-                if keyword.lower() in query.lower():
-                    # Resolve path relative to project root
-                    abs_path = project_root / rel_path
-                    if abs_path.exists() and str(abs_path) not in injected_files:
-                        try:
-                            content = abs_path.read_text(encoding="utf-8")
-                            # Prepend to context (high priority)
-                            context_chunks.insert(0, f"--- START SYSTEM REPORT ({rel_path}) ---\n{content}\n--- END SYSTEM REPORT ---\n")
-                            sources.insert(0, str(abs_path))
-                            injected_files.add(str(abs_path))
-                            print(f"DEBUG: Trigger '{keyword}' detected. Injected {rel_path}.")
-                        except Exception as e:
-                            print(f"Warning: Failed to inject trigger file {rel_path}: {e}")
 
+async def _aretrieve_context(query, n_results, cfg, where=None, auto_filter=False):
+    """Awaitable variant of _retrieve_context."""
+    collection, model = _get_collection()
+    if collection is None:
+        return [], [], "Error: Index not found. Please run with --index first."
+
+    try:
+        query_embeddings = (await aget_embeddings_for_docs([{"content": query}], model=model))[0][1]
     except Exception as e:
-        print(f"Warning: Trigger mechanism failed: {e}")
+        return [], [], f"Error generating embedding: {e}"
 
-    if not context_chunks:
-        return "I couldn't find any relevant information in the knowledge base."
-    
-    context_text = "\n\n---\n\n".join(context_chunks)
-    
-    # 4. Generate Answer with Gemini
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        return f"Context found ({len(context_chunks)} chunks), but GOOGLE_API_KEY not set for generation.\n\nTop Source: {sources[0]}"
+    # Chroma has no async local client; keep the loop free while HNSW search runs
+    results = await asyncio.to_thread(
+        collection.query,
+        query_embeddings=[query_embeddings],
+        n_results=n_results,
+        where=_resolve_where(query, where, auto_filter)
+    )
+
+    context_chunks, sources = _unpack_results(query, results, cfg)
+    return context_chunks, sources, None
 
-    # Provide global context about the repository structure to the LLM
-    # Load from config or use default
-    config_path = Path(__file__).parent.parent / "config" / "config.json"
-    
+
+def _build_prompt(query, context_text, cfg):
+    """Build the generation prompt, providing global repository context to the LLM."""
     # Default prompt if config fails
-    system_context = "You are an expert for the GlassOps platform."
-    
-    try:
-         with open(config_path, "r", encoding="utf-8") as f:
-             cfg = json.load(f)
-             if "system_context" in cfg:
-                 system_context = cfg["system_context"]
-    except Exception as e:
-         # Fallback
-         print(f"Warning: Could not load system_context from config: {e}")
+    system_context = cfg.get("system_context", "You are an expert for the GlassOps platform.")
 
-    try:
-        client = genai.Client(api_key=api_key)
-        # Using user-specified model
-        model_name = 'gemma-3-12b-it'
-        
-        prompt = f"""{system_context}
+    return f"""{system_context}
 
 Answer the user's question based strictly on the provided context.
 If the answer is not in the context, say you don't know.
@@ -110,12 +228,146 @@ Question:
 {query}
 
 Answer:"""
-        
-        response = client.models.generate_content(
-            model=model_name,
+
+
+def query_index(query, n_results=5, where=None, auto_filter=False):
+    """
+    query: string
+    where: optional Chroma metadata filter (see rag.filters.build_where_filter)
+    auto_filter: infer a domain filter from the question when `where` is not given
+    returns: summarized answer from RAG
+    """
+    print(f"DEBUG: Querying for '{query}'...")
+
+    cfg = _load_config()
+    context_chunks, sources, error = _retrieve_context(query, n_results, cfg, where, auto_filter)
+    if error:
+        return error
+
+    if not context_chunks:
+        return "I couldn't find any relevant information in the knowledge base."
+
+    context_text = "\n\n---\n\n".join(context_chunks)
+
+    # 4. Generate Answer with Gemini
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and not _replaying():
+        return f"Context found ({len(context_chunks)} chunks), but GOOGLE_API_KEY not set for generation.\n\nTop Source: {sources[0]}"
+
+    # Shares the per-key quota (and response cache) with the generator and other processes
+    llm = LLMClient(model=GENERATION_MODEL)
+    prompt = _build_prompt(query, context_text, cfg)
+    answer = llm.generate(prompt, temperature=None, max_output_tokens=None)
+    if answer is None:
+        return f"Error generating response: no answer from {GENERATION_MODEL}\n\nContext:\n{context_text[:500]}..."
+    return f"{answer}\n\nSources:\n- " + "\n- ".join(sources)
+
+
+def stream_query_index(query, n_results=5, where=None, auto_filter=False):
+    """
+    Streaming variant of query_index.
+    query: string
+    yields: text fragments - the sources block first, then answer tokens as they arrive
+    """
+    print(f"DEBUG: Streaming query for '{query}'...")
+
+    cfg = _load_config()
+    context_chunks, sources, error = _retrieve_context(query, n_results, cfg, where, auto_filter)
+    if error:
+        yield error
+        return
+
+    if not context_chunks:
+        yield "I couldn't find any relevant information in the knowledge base."
+        return
+
+    # Sources are known before generation starts, so emit them up front
+    yield "Sources:\n- " + "\n- ".join(sources) + "\n\n"
+
+    context_text = "\n\n---\n\n".join(context_chunks)
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and not _replaying():
+        yield f"Context found ({len(context_chunks)} chunks), but GOOGLE_API_KEY not set for generation."
+        return
+
+    llm = LLMClient(model=GENERATION_MODEL)
+    prompt = _build_prompt(query, context_text, cfg)
+
+    # A cached (or replayed) answer arrives in one piece
+    key, answer = llm.cache_lookup(prompt)
+    if answer is not None or _replaying():
+        yield answer if answer is not None else f"Error generating response: no recorded answer from {GENERATION_MODEL}"
+        return
+
+    streamed = []
+    reservation = None
+    try:
+        reservation = llm.reserve(prompt)
+        chunk = None
+        for chunk in llm.client.models.generate_content_stream(
+            model=GENERATION_MODEL,
+            contents=prompt
+        ):
+            if chunk.text:
+                streamed.append(chunk.text)
+                yield chunk.text
+        # The last chunk carries the usage of the whole stream
+        llm.record_usage(prompt, reservation, chunk)
+        llm.cache_store(key, "".join(streamed))
+        return
+    except Exception as e:
+        if streamed:
+            # Partial answer already delivered; retrying would duplicate text
+            yield f"\n\nError: stream interrupted: {e}"
+            return
+        print(f"Warning: Streaming unavailable ({e}), falling back to full response.")
+
+    # Fallback: whole response in one piece, under the stream's reservation (one answer, booked once)
+    try:
+        if reservation is None:
+            reservation = llm.reserve(prompt)
+        response = llm.client.models.generate_content(
+            model=GENERATION_MODEL,
             contents=prompt
         )
-        return f"{response.text}\n\nSources:\n- " + "\n- ".join(sources)
-        
+        llm.record_usage(prompt, reservation, response)
+        llm.cache_store(key, response.text)
+        yield response.text or ""
     except Exception as e:
-         return f"Error generating response: {e}\n\nContext:\n{context_text[:500]}..."
+        yield f"Error generating response: {e}\n\nContext:\n{context_text[:500]}..."
+
+
+async def aquery_index(query, n_results=5, where=None, auto_filter=False):
+    """
+    Async variant of query_index for concurrent callers (e.g. a web front end).
+    Embedding, vector search and generation are awaited, clients are pooled and
+    the number of in-flight questions per event loop is capped by `query_concurrency`.
+    query: string
+    returns: summarized answer from RAG
+    """
+    print(f"DEBUG: Async querying for '{query}'...")
+
+    cfg = _load_config()
+    async with _get_query_limiter(cfg):
+        context_chunks, sources, error = await _aretrieve_context(query, n_results, cfg, where, auto_filter)
+        if error:
+            return error
+
+        if not context_chunks:
+            return "I couldn't find any relevant information in the knowledge base."
+
+        context_text = "\n\n---\n\n".join(context_chunks)
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key and not _replaying():
+            return f"Context found ({len(context_chunks)} chunks), but GOOGLE_API_KEY not set for generation.\n\nTop Source: {sources[0]}"
+
+        # Throttle waits and retry backoff are awaited; the deadline bounds both
+        llm = AsyncLLMClient(model=GENERATION_MODEL)
+        prompt = _build_prompt(query, context_text, cfg)
+        answer = await llm.agenerate(prompt, temperature=None, max_output_tokens=None,
+                                     deadline=cfg.get("query_deadline_seconds", DEFAULT_QUERY_DEADLINE))
+        if answer is None:
+            return f"Error generating response: no answer from {GENERATION_MODEL}\n\nContext:\n{context_text[:500]}..."
+        return f"{answer}\n\nSources:\n- " + "\n- ".join(sources)
@@ -1,6 +1,8 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 # Add 'packages' to sys.path so 'knowledge' package can be imported
 # This file is in packages/knowledge/tests/
 # We want to add packages/ (which is ../../ from here)
@@ -11,3 +13,9 @@ PACKAGES_DIR = TEST_DIR.parent.parent
 if str(PACKAGES_DIR) not in sys.path:
     print(f"Adding to sys.path: {PACKAGES_DIR}")
     sys.path.insert(0, str(PACKAGES_DIR))
+
+
+@pytest.fixture(autouse=True)
+def _no_llm_response_cache(monkeypatch):
+    # Tests use fake clients; never read or record the package's LLM response cache
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE", "off")
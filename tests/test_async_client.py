@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import types
+
+from knowledge.llm.async_client import AsyncLLMClient
+from knowledge.utils import FileLock
+
+
+class FakeModels:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        if contents == "flaky" and self.calls == 1:
+            raise RuntimeError("503 UNAVAILABLE")
+        await asyncio.sleep(1.0 if contents == "slow" else 0.05)
+        return types.SimpleNamespace(text=f"re: {contents}", candidates=[])
+
+
+def make_client(monkeypatch, tmp_path):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setenv("GLASSOPS_RATE_LIMIT_DIR", str(tmp_path))
+    llm = AsyncLLMClient(model="test-model")
+    models = FakeModels()
+    llm.client = types.SimpleNamespace(aio=types.SimpleNamespace(models=models))
+    return llm, models
+
+
+def test_agenerate_many_runs_concurrently_and_honours_deadlines(monkeypatch, tmp_path):
+    llm, _ = make_client(monkeypatch, tmp_path)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        answers = await llm.agenerate_many([f"p{i}" for i in range(10)], concurrency=10)
+        elapsed = loop.time() - start
+        return answers, elapsed, await llm.agenerate("slow", deadline=0.1)
+
+    answers, elapsed, late = asyncio.run(main())
+    assert answers == [f"re: p{i}" for i in range(10)]
+    assert elapsed < 0.5
+    assert late is None
+    assert llm.requests_sent == 11
+
+
+def test_retry_backoff_is_awaited(monkeypatch, tmp_path):
+    llm, models = make_client(monkeypatch, tmp_path)
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr("knowledge.llm.async_client.asyncio.sleep", fake_sleep)
+    assert asyncio.run(llm.agenerate("flaky")) == "re: flaky"
+    assert models.calls == 2 and sleeps[0] == 10
+
+
+def test_locked_limiter_state_does_not_stall_the_loop(monkeypatch, tmp_path):
+    llm, _ = make_client(monkeypatch, tmp_path)
+    # Another process holds the shared limiter state while this loop has work to do
+    other = FileLock(str(llm.rate_limiter.state_path) + ".lock")
+    other.acquire()
+    threading.Timer(0.5, other.release).start()
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        answer = await llm.agenerate("p")
+        task.cancel()
+        return answer, ticks
+
+    answer, ticks = asyncio.run(main())
+    assert answer == "re: p"
+    assert ticks >= 20
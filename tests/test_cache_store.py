@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+from knowledge.adapters.python import PythonAdapter
+from knowledge.generation.generator import Generator
+
+NAMES = ["load", "save", "merge", "validate"]
+
+
+class ChunkLLM:
+    """Stands in for LLMClient: documents each chunk's functions; fails once `fail_after` calls have succeeded."""
+
+    model = "fake-model"
+
+    def __init__(self, fail_after=None):
+        self.prompts = []
+        self.fail_after = fail_after
+
+    def generate(self, prompt, **kwargs):
+        if self.fail_after is not None and len(self.prompts) == self.fail_after:
+            raise RuntimeError("connection lost")
+        self.prompts.append(prompt)
+        names = re.findall(r"def (\w+)\(", prompt)
+        return "\n\n".join(f"## {name}\n\nDocuments {name} and the value it returns." for name in names)
+
+
+def start(root, llm):
+    generator = Generator(str(root), workers=1, chunk_workers=1)
+    generator.llm = llm
+    generator._load_cache()
+    generator._load_prompts()
+    return generator
+
+
+def test_reopened_store_keeps_chunks_finished_before_a_crash(tmp_path, monkeypatch):
+    monkeypatch.setattr(PythonAdapter, "TARGET_CHUNK_SIZE", 60)
+    source = tmp_path / "packages" / "a" / "store.py"
+    source.parent.mkdir(parents=True)
+    source.write_text("".join(f"def {name}(value):\n    return value\n\n" for name in NAMES))
+
+    # The first run dies on the third chunk without saving or closing the cache
+    crashing = ChunkLLM(fail_after=2)
+    with pytest.raises(RuntimeError):
+        start(tmp_path, crashing).generate_for_file(source)
+    assert len(crashing.prompts) == 2
+
+    resumed = ChunkLLM()
+    generator = start(tmp_path, resumed)
+    try:
+        assert generator._process_files([source]) == (1, 0)
+    finally:
+        generator._save_cache()
+
+    # Only the chunks that were not finished go back to the LLM
+    chunks = PythonAdapter().parse(source, source.read_text())
+    assert len(chunks) > 2
+    assert len(resumed.prompts) == len(chunks) - 2
+    assert not set(resumed.prompts) & set(crashing.prompts)
+    doc = generator._get_output_path(source).read_text()
+    for name in NAMES:
+        assert f"Documents {name}" in doc
@@ -0,0 +1,70 @@
+import os
+import subprocess
+
+from knowledge.generation.change_detector import ChangeDetector
+
+
+def git(root, *args):
+    return subprocess.run(
+        ["git", "-C", str(root), "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        capture_output=True, text=True, check=True,
+    ).stdout.strip()
+
+
+def write(root, name, text):
+    path = root / name
+    path.write_text(text)
+    return path
+
+
+def test_git_mode_uses_blob_ids_for_unmodified_tracked_files(tmp_path):
+    git(tmp_path, "init", "-q")
+    for name in ["a.py", "b.py", "c.py"]:
+        write(tmp_path, name, f"def {name[0]}():\n    return 1\n")
+    git(tmp_path, "add", ".")
+    git(tmp_path, "commit", "-q", "-m", "initial")
+    blob_c = git(tmp_path, "rev-parse", "HEAD:c.py")
+
+    write(tmp_path, "b.py", "def b():\n    return 2\n")
+    git(tmp_path, "mv", "c.py", "d.py")
+    write(tmp_path, "e.py", "def e():\n    return 1\n")
+
+    detector = ChangeDetector(tmp_path)
+    files = [tmp_path / name for name in ["a.py", "b.py", "d.py", "e.py"]]
+    result = detector.fingerprints(files)
+
+    assert detector.mode == "git"
+    assert result["a.py"] == f"git:{git(tmp_path, 'rev-parse', 'HEAD:a.py')}"
+    assert result["b.py"].startswith("stat:")  # modified: the index blob is stale
+    assert result["d.py"] == f"git:{blob_c}"  # renamed unchanged: same blob under the new path
+    assert result["e.py"].startswith("stat:")  # untracked
+    assert detector.fingerprints(files) == result
+
+
+def test_stat_mode_outside_git(tmp_path):
+    a = write(tmp_path, "a.py", "def a():\n    return 1\n")
+    b = write(tmp_path, "b.py", "def b():\n    return 1\n")
+    c = write(tmp_path, "c.py", "def c():\n    return 1\n")
+
+    detector = ChangeDetector(tmp_path, use_git=False)
+    before = detector.fingerprints([a, b, c])
+    assert detector.mode == "stat"
+    assert all(f.startswith("stat:") for f in before.values())
+
+    b.write_text("def b():\n    return 22\n")
+    d = tmp_path / "d.py"
+    os.rename(c, d)
+    after = detector.fingerprints([a, b, d])
+
+    assert after["a.py"] == before["a.py"]  # unmodified
+    assert after["b.py"] != before["b.py"]
+    # A rename keeps the stat signature, but under a path the cache has not seen
+    assert after["d.py"] == before["c.py"]
+    assert "c.py" not in after
+
+
+def test_falls_back_to_stat_when_root_is_not_a_work_tree(tmp_path):
+    a = write(tmp_path, "a.py", "def a():\n    return 1\n")
+    detector = ChangeDetector(tmp_path)
+    assert detector.fingerprints([a])["a.py"].startswith("stat:")
+    assert detector.mode == "stat"
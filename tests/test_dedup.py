@@ -0,0 +1,60 @@
+import re
+import threading
+import time
+
+from knowledge.generation.generator import Generator
+
+SOURCE = "# {path}\ndef load(config):\n    return config.get('value', 0)\n"
+
+
+class EchoLLM:
+    """Stands in for LLMClient: documents the source's header line, slowly enough for requests to overlap."""
+
+    model = "fake-model"
+
+    def __init__(self):
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+        time.sleep(0.2)
+        header = re.search(r"^# (\S+)$", prompt, re.MULTILINE).group(1)
+        return f"# load\n\nDefined in {header}. Returns the configured value, or 0 when it is not set."
+
+
+def write_sources(root, paths):
+    for path in paths:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(SOURCE.format(path=path))
+    return [root / path for path in paths]
+
+
+def run(root, files, llm):
+    generator = Generator(str(root), workers=len(files))
+    generator.llm = llm
+    generator._load_cache()
+    generator._load_prompts()
+    try:
+        return generator._process_files(files)
+    finally:
+        generator._save_cache()
+
+
+def test_identical_files_share_one_request_and_keep_their_own_paths(tmp_path):
+    paths = ["packages/a/config.py", "packages/b/config.py", "packages/c/lib/config.py"]
+    llm = EchoLLM()
+    # Copies differ only in their own path, which is neutralized in the cache key
+    assert run(tmp_path, write_sources(tmp_path, paths), llm) == (3, 0)
+    assert len(llm.prompts) == 1
+
+    # A copy added later reuses the stored output instead of calling the LLM again
+    later = EchoLLM()
+    assert run(tmp_path, write_sources(tmp_path, ["packages/d/config.py"]), later) == (1, 0)
+    assert later.prompts == []
+
+    generator = Generator(str(tmp_path))
+    for path in paths + ["packages/d/config.py"]:
+        doc = generator._get_output_path(tmp_path / path).read_text()
+        assert f"Defined in {path}." in doc
@@ -0,0 +1,65 @@
+import numpy as np
+from knowledge.drift.detect_drift import detect_drift, normalize_rows
+
+def _doc(path, h):
+    return {"path": path, "hash": h}
+
+def test_normalize_rows_unit_length():
+    m = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+    assert m.dtype == np.float32
+    assert np.allclose(m[0], [0.6, 0.8])
+    assert np.all(np.isfinite(m))
+
+def test_first_run_writes_snapshot_without_drift(tmp_path):
+    snapshot = tmp_path / "snap.npz"
+    report = tmp_path / "report.md"
+    drifted = detect_drift([(_doc("a#0", "h1"), [1.0, 0.0])], snapshot_path=str(snapshot), report_path=str(report))
+    assert drifted == []
+    assert snapshot.exists()
+
+def test_detects_changed_chunk_below_threshold(tmp_path):
+    kwargs = {"snapshot_path": str(tmp_path / "snap.npz"), "report_path": str(tmp_path / "report.md")}
+    detect_drift([(_doc("a#0", "h1"), [1.0, 0.0]), (_doc("b#0", "h2"), [1.0, 0.0])], **kwargs)
+
+    drifted = detect_drift([
+        (_doc("a#0", "h1-new"), [0.0, 1.0]),   # changed and moved: drift
+        (_doc("b#0", "h2-new"), [1.0, 0.1]),   # changed but similar: no drift
+    ], threshold=0.85, **kwargs)
+
+    assert drifted == ["a#0"]
+    assert "`a#0`" in (tmp_path / "report.md").read_text(encoding="utf-8")
+
+def test_unchanged_hash_is_never_drift(tmp_path):
+    kwargs = {"snapshot_path": str(tmp_path / "snap.npz"), "report_path": str(tmp_path / "report.md")}
+    detect_drift([(_doc("a#0", "h1"), [1.0, 0.0])], **kwargs)
+    # Same text, different (e.g. mock) vector
+    assert detect_drift([(_doc("a#0", "h1"), [0.0, 1.0])], **kwargs) == []
+
+def test_edited_chunk_is_compared_when_its_source_hash_is_unchanged(tmp_path):
+    # Chunks of generated docs carry their source file's hash; the chunk text decides
+    kwargs = {"snapshot_path": str(tmp_path / "snap.npz"), "report_path": str(tmp_path / "report.md")}
+    detect_drift([({"path": "a#1", "hash": "src", "content": "Old body"}, [1.0, 0.0])], **kwargs)
+    drifted = detect_drift([({"path": "a#1", "hash": "src", "content": "New body"}, [0.0, 1.0])], **kwargs)
+    assert drifted == ["a#1"]
+
+def test_history_tracks_when_drift_started(tmp_path):
+    from knowledge.drift.history import DriftHistory
+    kwargs = {"snapshot_path": str(tmp_path / "snap.npz"), "report_path": str(tmp_path / "report.md")}
+    detect_drift([(_doc("a#0", "v1"), [1.0, 0.0, 0.0]), (_doc("b#0", "b1"), [0.0, 0.0, 1.0])], **kwargs)
+    detect_drift([(_doc("a#0", "v2"), [0.0, 1.0, 0.0]), (_doc("b#0", "b1"), [0.0, 0.0, 1.0])], **kwargs)
+    detect_drift([(_doc("a#0", "v3"), [1.0, 0.0, 0.0]), (_doc("c#0", "c1"), [0.0, 0.0, 1.0])], **kwargs)
+
+    history = DriftHistory(str(tmp_path / "drift_history.sqlite"))
+    try:
+        runs = history.recent_runs()
+        assert [r["id"] for r in runs] == [3, 2, 1]
+        assert (runs[0]["changed"], runs[0]["drifted"], runs[0]["added"], runs[0]["removed"]) == (1, 1, 1, 1)
+        rows = history.drifted_in_run(3, 0.85)
+        assert rows[0][0] == "a#0" and rows[0][2] == 2   # first drifted in run 2
+        assert history.top_movers()[0][:2] == ("a#0", 2)
+    finally:
+        history.close()
+
+    report = (tmp_path / "report.md").read_text(encoding="utf-8")
+    assert "drifting since" in report
+    assert "## Change Rate" in report
@@ -0,0 +1,51 @@
+import pytest
+from google.genai import errors, types
+
+from knowledge.llm.client import get_genai_client
+from knowledge.llm.fake_genai import FakeBackend, install_fake_backend, uninstall_fake_backend
+from knowledge.llm.tokens import usage_tokens
+
+FAST = {
+    "latency": {"distribution": "fixed", "value": 0.0},
+    "embed_latency": {"distribution": "fixed", "value": 0.0},
+    "seconds_per_output_token": 0.0,
+    "output_tokens": {"distribution": "fixed", "value": 50},
+}
+
+
+def test_limits_answer_429_like_the_api():
+    backend = FakeBackend({**FAST, "limits": {"default": {"rpm": 2, "tpm": 100000}}})
+    models = backend.client.models
+    response = models.generate_content(model="m", contents="hello there",
+                                       config=types.GenerateContentConfig(max_output_tokens=20))
+    assert response.text and usage_tokens(response)[1] == 20
+    models.generate_content(model="m", contents="hello there")
+    with pytest.raises(errors.ClientError) as raised:
+        models.generate_content(model="m", contents="hello there")
+    assert "429" in str(raised.value) and "PerMinute" in str(raised.value)
+    # Limits are per model
+    models.generate_content(model="other", contents="hello there")
+    assert backend.stats()["rejected_429"] == 1 and backend.stats()["requests"] == 3
+
+
+def test_injected_errors_and_streams():
+    backend = FakeBackend({**FAST, "errors": {"503": 1.0}})
+    with pytest.raises(errors.ServerError):
+        backend.client.models.generate_content(model="m", contents="hi")
+
+    backend = FakeBackend(FAST)
+    chunks = list(backend.client.models.generate_content_stream(model="m", contents="hi"))
+    assert len(chunks) > 1
+    assert [usage_tokens(c) is not None for c in chunks] == [False] * (len(chunks) - 1) + [True]
+
+
+def test_installed_backend_serves_clients_and_embeddings():
+    backend = install_fake_backend(FAST)
+    try:
+        assert get_genai_client("any-key") is backend.client
+        first = backend.legacy.embed_content(model="models/e", content=["a", "b"])["embedding"]
+        again = backend.client.models.embed_content(model="models/e", contents="a").embeddings[0].values
+        assert len(first) == 2 and first[0] == again and first[0] != first[1]
+    finally:
+        uninstall_fake_backend()
+    assert get_genai_client("any-key") is not backend.client
@@ -0,0 +1,25 @@
+from knowledge.rag.filters import build_where_filter, infer_domain_filter, path_prefix_fields
+
+def test_path_prefix_fields():
+    fields = path_prefix_fields("./packages/knowledge/docs/a.md")
+    assert fields == {
+        "path_prefix_1": "packages",
+        "path_prefix_2": "packages/knowledge",
+        "path_prefix_3": "packages/knowledge/docs",
+    }
+
+def test_build_where_filter_empty():
+    assert build_where_filter() is None
+
+def test_build_where_filter_single_clause():
+    assert build_where_filter(domain="runtime") == {"domain": "runtime"}
+
+def test_build_where_filter_combines_clauses():
+    where = build_where_filter(doc_type="ADR", path_prefix="packages/knowledge/")
+    assert where == {"$and": [{"type": "ADR"}, {"path_prefix_2": "packages/knowledge"}]}
+
+def test_infer_domain_filter():
+    domains = {"runtime", "knowledge", "agent", "global"}
+    assert infer_domain_filter("How does the runtime retry?", domains) == {"domain": "runtime"}
+    assert infer_domain_filter("Which reagents are used?", domains) is None
+    assert infer_domain_filter("Compare agent and runtime", domains) == {"domain": {"$in": ["agent", "runtime"]}}
@@ -0,0 +1,83 @@
+import os
+
+import chromadb
+import pytest
+from chromadb.api.client import SharedSystemClient
+
+from knowledge.ingestion import index_store
+from knowledge.ingestion.index_store import close_chroma_client, current_generation_dir, staged_generation
+from knowledge.rag import query_engine
+
+
+def write_generation(root, text):
+    with staged_generation(root) as staging:
+        with open(os.path.join(staging, "data.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+    return current_generation_dir(root)
+
+
+def read(directory):
+    with open(os.path.join(directory, "data.txt"), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_readers_see_the_previous_generation_until_publish(tmp_path):
+    root = str(tmp_path)
+    first = write_generation(root, "v1")
+
+    with staged_generation(root) as staging:
+        assert read(staging) == "v1"  # a copy of the current generation
+        with open(os.path.join(staging, "data.txt"), "w", encoding="utf-8") as f:
+            f.write("v2")
+        assert current_generation_dir(root) == first
+        assert read(first) == "v1"
+
+    second = current_generation_dir(root)
+    assert second == staging != first
+    assert read(second) == "v2"
+    assert not os.path.exists(os.path.join(root, index_store.CURRENT_FILENAME + ".tmp"))
+
+
+def test_failed_build_discards_staging_and_keeps_current(tmp_path):
+    root = str(tmp_path)
+    first = write_generation(root, "v1")
+
+    with pytest.raises(RuntimeError):
+        with staged_generation(root) as staging:
+            with open(os.path.join(staging, "data.txt"), "w", encoding="utf-8") as f:
+                f.write("half-written")
+            raise RuntimeError("embedding failed")
+
+    assert not os.path.exists(staging)
+    assert current_generation_dir(root) == first
+    assert read(first) == "v1"
+
+
+def test_old_generations_are_collected(tmp_path):
+    root = str(tmp_path)
+    for i in range(5):
+        latest = write_generation(root, f"v{i}")
+
+    names = sorted(os.listdir(os.path.join(root, index_store.GENERATIONS_DIRNAME)))
+    assert len(names) == index_store.KEEP_GENERATIONS
+    assert os.path.basename(latest) == names[-1]
+
+
+def test_reader_releases_chroma_systems_of_superseded_generations(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(query_engine, "_collections", {})
+    monkeypatch.setattr(query_engine, "_retired_clients", [])
+
+    generations = []
+    for i in range(3):
+        with staged_generation(keep=5) as staging:
+            client = chromadb.PersistentClient(path=staging)
+            client.get_or_create_collection(name="docs").upsert(ids=[f"d{i}"], embeddings=[[0.1, 0.2]])
+            close_chroma_client(client)
+        generations.append(staging)
+        assert query_engine._get_collection()[0] is not None
+
+    systems = SharedSystemClient._identifier_to_system
+    assert generations[0] not in systems
+    assert generations[1] in systems  # superseded last: queries may still be running on it
+    assert generations[2] in systems
@@ -0,0 +1,57 @@
+import numpy as np
+from knowledge.drift.detect_drift import detect_drift, normalize_rows
+from knowledge.drift.near_duplicates import find_near_duplicates, hyperplane_parameters, simhash_signatures
+
+def test_simhash_ignores_dates_and_whitespace():
+    a, b, c = simhash_signatures([
+        "Release  notes for 2024-01-05\nDeploy the runtime with helm.",
+        "release notes for 2025-11-30 deploy the runtime   with helm.",
+        "Completely unrelated text about drift reports and embeddings.",
+    ])
+    assert a == b
+    assert a != c
+
+def test_hyperplane_parameters_scale_with_corpus():
+    small_bands, small_rows = hyperplane_parameters(1000, 0.95)
+    large_bands, large_rows = hyperplane_parameters(300000, 0.95)
+    assert large_rows > small_rows
+    assert large_bands >= small_bands
+
+def test_find_near_duplicates_clusters_and_verifies():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 32))
+    vectors[1] = vectors[0] + 0.01 * rng.standard_normal(32)   # paraphrase of 0
+    vectors[2] = vectors[0] + 0.01 * rng.standard_normal(32)   # and another
+    matrix = normalize_rows(vectors)
+    texts = [f"chunk {i} " + " ".join(f"w{i}x{k}" for k in range(20)) for i in range(50)]
+    texts[7] = texts[6]   # same text, unrelated vectors: rejected by cosine check
+
+    clusters = find_near_duplicates([f"doc{i}" for i in range(50)], texts, matrix, threshold=0.95)
+
+    assert len(clusters) == 1
+    members, min_sim = clusters[0]
+    assert members == ["doc0", "doc1", "doc2"]
+    assert min_sim >= 0.95
+
+def test_report_lists_clusters(tmp_path):
+    report = tmp_path / "report.md"
+    embeddings = [
+        ({"path": "a#0", "hash": "1", "content": "Deploy on 2024-01-01"}, [1.0, 0.0, 0.0]),
+        ({"path": "b#0", "hash": "2", "content": "Deploy on 2025-02-02"}, [1.0, 0.01, 0.0]),
+        ({"path": "c#0", "hash": "3", "content": "Something else"}, [0.0, 0.0, 1.0]),
+    ]
+    detect_drift(embeddings, snapshot_path=str(tmp_path / "snap.npz"), report_path=str(report))
+    text = report.read_text(encoding="utf-8")
+    assert "## Near-Duplicate Clusters" in text
+    assert "`a#0`, `b#0`" in text
+
+def test_chunks_sharing_a_source_hash_are_all_clustered(tmp_path):
+    # Chunks of generated docs can all carry their source file's hash
+    report = tmp_path / "report.md"
+    embeddings = [
+        ({"path": "a#0", "hash": "src", "content": "Intro to the service"}, [0.0, 0.0, 1.0]),
+        ({"path": "a#1", "hash": "src", "content": "Deploy on 2024-01-01"}, [1.0, 0.0, 0.0]),
+        ({"path": "b#0", "hash": "other", "content": "Deploy on 2025-02-02"}, [1.0, 0.01, 0.0]),
+    ]
+    detect_drift(embeddings, snapshot_path=str(tmp_path / "snap.npz"), report_path=str(report))
+    assert "`a#1`, `b#0`" in report.read_text(encoding="utf-8")
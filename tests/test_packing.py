@@ -0,0 +1,99 @@
+import re
+import threading
+import types
+
+from knowledge.generation.generator import Generator
+
+DOC = "# {name}\n\nDocuments {name}: what it does, how it is configured and how it is used by callers."
+
+
+class FakeLLM:
+    """Stands in for LLMClient: answers packed prompts with the given sections, others with one doc."""
+
+    model = "fake-model"
+
+    def __init__(self, packed_sections=None):
+        self.packed_sections = packed_sections
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def _estimate_tokens(self, text):
+        return len(text) // 4
+
+    def generate(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+        if "<<<FILE 1:" in prompt:
+            return self.packed_sections(re.findall(r"<<<FILE (\d+): [^>]*/(\w+)\.py>>>", prompt))
+        return DOC.format(name=re.findall(r"def (\w+)\(", prompt)[0])
+
+
+def section(idx, name, end=None):
+    return f"<<<FILE {idx}>>>\n{DOC.format(name=name)}\n<<<END FILE {end or idx}>>>"
+
+
+def test_split_keeps_well_formed_sections_in_any_order(tmp_path):
+    generator = Generator(str(tmp_path))
+    text = "```markdown\n" + "\n".join([section(2, "b"), section(1, "a")]) + "\n```"
+    assert generator._split_packed_output(text, 2) == {1: DOC.format(name="a"), 2: DOC.format(name="b")}
+
+
+def test_split_drops_missing_duplicate_short_and_malformed_sections(tmp_path):
+    generator = Generator(str(tmp_path))
+    text = "\n".join([
+        section(1, "a"),
+        section(2, "b"), section(2, "b"),  # twice: ambiguous
+        "<<<FILE 3>>>\ntoo short\n<<<END FILE 3>>>",
+        section(4, "d", end=5),  # mismatched end marker
+        f"<<<FILE 5>>>\n{DOC.format(name='e')}\n<<<FILE 8>>>\n<<<END FILE 5>>>",  # stray delimiter
+        section(6, "f"),  # beyond the files in the request
+    ])
+    assert generator._split_packed_output(text, 5) == {1: DOC.format(name="a")}
+
+
+def test_files_missing_from_a_packed_response_are_generated_individually(tmp_path):
+    package = tmp_path / "packages" / "app"
+    package.mkdir(parents=True)
+    names = ["alpha", "beta", "gamma"]
+    for name in names:
+        (package / f"{name}.py").write_text(f"def {name}(value):\n    return value\n")
+
+    generator = Generator(str(tmp_path), pack=True)
+    # Only the first file's section comes back
+    generator.llm = FakeLLM(lambda files: section(files[0][0], files[0][1]))
+    generator._load_cache()
+    generator._load_prompts()
+    files = sorted(package.glob("*.py"))
+    try:
+        assert generator._process_files(files) == (3, 0)
+    finally:
+        generator._save_cache()
+
+    packed = [p for p in generator.llm.prompts if "<<<FILE 1:" in p]
+    single = [p for p in generator.llm.prompts if "<<<FILE 1:" not in p]
+    assert len(packed) == 1
+    assert sorted(re.findall(r"def (\w+)\(", p)[0] for p in single) == ["beta", "gamma"]
+    for name in names:
+        assert DOC.format(name=name) in (package / "docs" / f"{name}.md").read_text()
+
+
+def test_packs_go_through_the_quota_budget_once(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setenv("GLASSOPS_RATE_LIMIT_DIR", str(tmp_path))
+    package = tmp_path / "packages" / "app"
+    package.mkdir(parents=True)
+    for name in ["alpha", "beta", "gamma"]:
+        (package / f"{name}.py").write_text(f"def {name}(value):\n    return value\n")
+
+    # One request fits the budget: the pack of all three files
+    generator = Generator(str(tmp_path), pack=True, max_requests=1)
+    fake = FakeLLM(lambda files: "\n".join(section(idx, name) for idx, name in files))
+    generator.llm.client = types.SimpleNamespace(models=types.SimpleNamespace(
+        generate_content=lambda model, contents, config: types.SimpleNamespace(
+            text=fake.generate(contents), candidates=[]),
+    ))
+    generator.run(["packages/**/*.py"])
+
+    assert generator.llm.requests_sent == 1
+    for name in ["alpha", "beta", "gamma"]:
+        assert DOC.format(name=name) in (package / "docs" / f"{name}.md").read_text()
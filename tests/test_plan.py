@@ -0,0 +1,38 @@
+import hashlib
+import json
+
+from knowledge.generation.cache_store import CacheStore
+from knowledge.generation.generator import Generator
+
+
+def digest(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_plan_leaves_the_cache_unchanged(tmp_path):
+    (tmp_path / "packages" / "app").mkdir(parents=True)
+    (tmp_path / "packages" / "app" / "main.py").write_text("def main():\n    return 1\n")
+    store = CacheStore(tmp_path / "config" / "doc-cache.sqlite")
+    # Entries for a deleted source file are pruned by a real run, never by a plan
+    store.put_file("packages/app/deleted.py", {"hash": "h", "generatedFiles": [], "timestamp": "t"})
+    store.put_chunk("packages/app/deleted.py", "key", "output")
+    store.close()
+    before = digest(tmp_path / "config" / "doc-cache.sqlite")
+
+    plan = Generator(str(tmp_path)).plan(["packages/**/*.py"])
+    assert [entry["path"] for entry in plan["files"]] == ["packages/app/main.py"]
+    assert digest(tmp_path / "config" / "doc-cache.sqlite") == before
+    store = CacheStore(tmp_path / "config" / "doc-cache.sqlite")
+    assert store.get_file("packages/app/deleted.py") and store.find_chunk("key") == "output"
+    store.close()
+
+
+def test_plan_does_not_import_legacy_caches(tmp_path):
+    (tmp_path / "packages" / "app").mkdir(parents=True)
+    (tmp_path / "packages" / "app" / "main.py").write_text("def main():\n    return 1\n")
+    (tmp_path / "config").mkdir()
+    (tmp_path / "config" / "doc-cache.json").write_text(json.dumps({
+        "packages/app/other.py": {"hash": "h", "generatedFiles": [], "timestamp": "t"},
+    }))
+    Generator(str(tmp_path)).plan(["packages/**/*.py"])
+    assert not (tmp_path / "config" / "doc-cache.sqlite").exists()
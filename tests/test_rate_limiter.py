@@ -0,0 +1,62 @@
+import pytest
+from knowledge.llm.rate_limiter import RateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("knowledge.llm.rate_limiter.time.time", lambda: now[0])
+    return now
+
+
+def test_requests_leave_the_window_after_a_minute(clock):
+    limiter = RateLimiter(rpm=2, tpm=1000, rpd=3)
+    assert limiter.reserve(400) == (0.0, "")
+    clock[0] += 20
+    assert limiter.reserve(400) == (0.0, "")
+    wait, reason = limiter.reserve(100)
+    # Reservations are held a second past the minute, for the send delay
+    assert reason == "RPM Limit" and wait == pytest.approx(41.0)
+
+    clock[0] += 41
+    assert limiter.reserve(100) == (0.0, "")
+    assert limiter.headroom() == {"rpm": 0.0, "tpm": 500.0, "rpd": 0.0}
+
+    # The daily limit frees up once the first request's minute bin is a day old
+    clock[0] += 60
+    wait, reason = limiter.reserve(100)
+    # (bins round up, so the wait is at most one bin longer than exact)
+    assert reason == "RPD Limit" and 86400 - 120 <= wait <= 86400 - 120 + 60
+
+
+def test_no_minute_window_exceeds_the_limits(clock):
+    limiter = RateLimiter(rpm=28, tpm=15000)
+    granted = []
+    while clock[0] < 1000.0 + 300:
+        wait, _ = limiter.reserve(400)
+        if wait:
+            clock[0] += wait
+        else:
+            granted.append(clock[0])
+    assert sum(1 for t in granted if t < 1060.0) == 28
+    for start in granted:
+        in_window = [t for t in granted if start <= t < start + 60]
+        assert len(in_window) <= 28 and 400 * len(in_window) <= 15000
+
+
+def test_oversized_request_runs_alone_in_the_window(clock):
+    limiter = RateLimiter(rpm=10, tpm=1000)
+    assert limiter.reserve(5000) == (0.0, "")
+    wait, reason = limiter.reserve(5000)
+    assert reason == "TPM Limit" and wait == pytest.approx(61.0)
+
+
+def test_state_file_is_shared_between_limiters(tmp_path, clock):
+    # Two instances on one state file stand in for two processes
+    first = RateLimiter(rpm=3, tpm=10000, state_path=tmp_path / "state.json")
+    second = RateLimiter(rpm=3, tpm=10000, state_path=tmp_path / "state.json")
+    assert first.reserve(10)[0] == 0
+    assert second.reserve(10)[0] == 0
+    assert first.reserve(10)[0] == 0
+    assert second.reserve(10)[1] == "RPM Limit"
+    assert second.headroom()["tpm"] == 9970.0
@@ -0,0 +1,78 @@
+import types
+
+from knowledge.embeddings.router_embedding import RPDLimitError, _cached_embeddings
+from knowledge.llm.client import LLMClient
+from knowledge.llm.fake_genai import install_fake_backend, uninstall_fake_backend
+from knowledge.llm.response_cache import ResponseCache, get_response_cache
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_bytes=250)
+    for name in ("a", "b", "c"):
+        cache.put(name, "generate", "m", name * 100)
+        if name == "b":
+            assert cache.get("a") == "a" * 100  # "a" is now more recent than "b"
+    assert cache.get("b") is None
+    assert cache.get("a") == "a" * 100 and cache.get("c") == "c" * 100
+    assert cache.stats()["bytes"] == 200
+
+
+def test_key_covers_request_parameters():
+    key = ResponseCache.key
+    assert key("generate", "m", "p", 0.2, 100) == key("generate", "m", "p", 0.2, 100)
+    assert len({key("generate", "m", "p", 0.2, 100), key("generate", "m", "p", None, 100),
+                key("generate", "m", "p", 0.2, None), key("generate", "n", "p", 0.2, 100),
+                key("embed", "m", "p", 0.2, 100)}) == 5
+
+
+def test_recorded_responses_replay_without_api_key(monkeypatch, tmp_path):
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE_PATH", str(tmp_path / "recording.sqlite"))
+    monkeypatch.setenv("GLASSOPS_RATE_LIMIT_DIR", str(tmp_path))
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE", "record")
+    llm = LLMClient(model="test-model")
+    llm.client = types.SimpleNamespace(models=types.SimpleNamespace(
+        generate_content=lambda model, contents, config: types.SimpleNamespace(text=f"re: {contents}", candidates=[]),
+    ))
+    assert llm.generate("question") == "re: question"
+
+    monkeypatch.delenv("GOOGLE_API_KEY")
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE", "replay")
+    offline = LLMClient(model="test-model")
+    assert offline.client is None
+    assert offline.generate("question") == "re: question"
+    assert offline.generate("question", temperature=0.7) is None  # never recorded
+    assert offline.requests_sent == 0
+
+
+def test_only_vectors_returned_by_the_primary_model_are_cached(monkeypatch, tmp_path):
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE", "readwrite")
+
+    def embedder(vectors):
+        return types.SimpleNamespace(api_key="test-key", genai=object(), get_embeddings=lambda texts: list(vectors))
+
+    primary = embedder([[1.0, 0.0], None])  # second request failed
+    vectors = _cached_embeddings(["ok", "failed"], "m", primary, embedder([]))
+    assert vectors[0] == [1.0, 0.0] and len(vectors[1]) == 2  # placeholder keeps docs aligned
+    cache = get_response_cache()
+    assert cache.get(cache.key("embed", "m", "ok")) is not None
+    assert cache.get(cache.key("embed", "m", "failed")) is None
+
+    def over_quota(texts):
+        raise RPDLimitError()
+
+    primary.get_embeddings = over_quota
+    assert _cached_embeddings(["other"], "m", primary, embedder([[0.0, 1.0]])) == [[0.0, 1.0]]
+    assert cache.get(cache.key("embed", "m", "other")) is None  # fallback output is not the primary model's
+
+
+def test_cache_is_off_while_the_fake_backend_is_active(monkeypatch, tmp_path):
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setenv("GLASSOPS_LLM_CACHE", "readwrite")
+    install_fake_backend()
+    try:
+        assert get_response_cache() is None
+    finally:
+        uninstall_fake_backend()
+    assert get_response_cache() is not None
@@ -0,0 +1,98 @@
+import glob
+from pathlib import Path
+
+import pathspec
+import pytest
+from knowledge.generation.scanner import FileScanner, glob_to_regex
+
+IGNORED = {"node_modules", "dist", ".git", "__pycache__"}
+
+PATTERNS = [
+    "packages/**/*.py",
+    "packages/**/*.ts",
+    "packages/**/Dockerfile",
+    "packages/*/.config/*.yml",
+    "!**/node_modules/**",
+    "!**/legacy/**",
+]
+
+FILES = [
+    "packages/a/main.py",
+    "packages/a/src/util.ts",
+    "packages/a/src/.hidden.py",
+    "packages/a/.cache/x.py",
+    "packages/a/.config/app.yml",
+    "packages/a/node_modules/lib/index.ts",
+    "packages/a/legacy/old.py",
+    "packages/a/build/out.py",
+    "packages/b/Dockerfile",
+    "packages/b/dist/bundle.ts",
+    "packages/b/deep/er/still.py",
+    "node_modules/x/y.ts",
+    "other/skip.py",
+    "top.py",
+]
+
+
+def legacy_scan(root, patterns, spec):
+    """The glob-per-pattern implementation FileScanner replaces."""
+    matched = set()
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            continue
+        for match in glob.glob(str(root / pattern), recursive=True):
+            path = Path(match)
+            rel = path.relative_to(root)
+            if path.is_file() and not any(p in IGNORED for p in rel.parts) \
+                    and not spec.match_file(rel.as_posix()):
+                matched.add(path)
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            for match in glob.glob(str(root / pattern[1:]), recursive=True):
+                matched.discard(Path(match))
+    return sorted(matched)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for rel in FILES:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("x")
+    return tmp_path
+
+
+def test_scan_matches_glob_semantics(tree):
+    spec = pathspec.PathSpec.from_lines("gitwildmatch", ["build/"])
+    expected = legacy_scan(tree, PATTERNS, spec)
+    assert FileScanner(tree, PATTERNS, IGNORED, spec).scan() == expected
+    assert [p.relative_to(tree).as_posix() for p in expected] == [
+        "packages/a/.config/app.yml",
+        "packages/a/main.py",
+        "packages/a/src/util.ts",
+        "packages/b/Dockerfile",
+        "packages/b/deep/er/still.py",
+    ]
+
+
+def test_scan_prunes_excluded_directories(tree, monkeypatch):
+    visited = []
+    real_scandir = __import__("os").scandir
+    monkeypatch.setattr("knowledge.generation.scanner.os.scandir",
+                        lambda p: visited.append(Path(p)) or real_scandir(p))
+    FileScanner(tree, PATTERNS, IGNORED).scan()
+    names = {p.name for p in visited}
+    assert not names & {"node_modules", "legacy", "dist", "other", ".cache"}
+
+
+@pytest.mark.parametrize("pattern,path,expected", [
+    ("**/*.py", "a.py", True),
+    ("**/*.py", "a/b/c.py", True),
+    ("**/*.py", ".a/c.py", False),
+    ("a/[!b]x.py", "a/cx.py", True),
+    ("a/[!b]x.py", "a/bx.py", False),
+    ("a/?.py", "a/bb.py", False),
+])
+def test_glob_to_regex(pattern, path, expected):
+    import re
+    assert bool(re.fullmatch(glob_to_regex(pattern), path)) is expected
@@ -0,0 +1,43 @@
+import json
+
+from knowledge.generation.scheduler import PriorityScheduler
+
+
+def entry(path, requests=1, tokens=100, **extra):
+    return {"path": path, "requests": requests, "input_tokens": tokens, "output_tokens": 0, **extra}
+
+
+def test_admit_defers_what_does_not_fit_but_keeps_filling():
+    scheduler = PriorityScheduler("/repo")
+    entries = [
+        entry("a.py", requests=2),
+        entry("big.py", requests=5),
+        entry("b.py", requests=0, packed=True, pack_group=0),
+        entry("c.py", requests=0, packed=True, pack_group=0),
+        entry("d.py", requests=1),
+    ]
+    admitted, deferred = scheduler.admit(entries, max_requests=4)
+    # Packed files share one request; the expensive file does not block cheaper ones after it
+    assert [e["path"] for e in admitted] == ["a.py", "b.py", "c.py", "d.py"]
+    assert [e["path"] for e in deferred] == ["big.py"]
+    assert scheduler.admit(entries, max_tokens=250)[0] == entries[:2]
+
+
+def test_order_uses_adrs_package_weights_and_backlog(tmp_path):
+    for rel in ["packages/core/src/a.py", "packages/core/src/b.py", "packages/ui/c.py", "packages/ui/d.py"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("x = 1\n")
+    (tmp_path / "packages/core/adr").mkdir()
+    (tmp_path / "packages/core/adr/0001-retries.md").write_text("Retries live in src/b.py.\n")
+    backlog = tmp_path / "config" / "generation-backlog.json"
+    backlog.parent.mkdir()
+    backlog.write_text(json.dumps({"files": [{"path": "packages/ui/d.py"}]}))
+
+    scheduler = PriorityScheduler(
+        tmp_path,
+        {"recency": 0, "package_weights": {"packages/ui/**": 0.5}},
+        backlog_path=backlog,
+    )
+    files = sorted(tmp_path.glob("packages/**/*.py"))
+    ordered = [f.relative_to(tmp_path).as_posix() for f in scheduler.order(files)]
+    assert ordered == ["packages/core/src/b.py", "packages/ui/d.py", "packages/core/src/a.py", "packages/ui/c.py"]
@@ -0,0 +1,26 @@
+import types
+
+from knowledge.llm.client import LLMClient
+from knowledge.rag import query_engine
+
+
+def test_stream_fallback_reuses_the_reservation(monkeypatch, tmp_path):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setenv("GLASSOPS_RATE_LIMIT_DIR", str(tmp_path))
+    monkeypatch.setattr(query_engine, "_retrieve_context", lambda *args: (["Deploys run nightly."], ["docs/a.md"], None))
+
+    def fail_stream(model, contents):
+        raise RuntimeError("stream unavailable")
+
+    fake = types.SimpleNamespace(models=types.SimpleNamespace(
+        generate_content_stream=fail_stream,
+        generate_content=lambda model, contents: types.SimpleNamespace(text="Nightly.", candidates=[]),
+    ))
+    monkeypatch.setattr("knowledge.llm.client.get_genai_client", lambda api_key: fake)
+    reservations = []
+    reserve = LLMClient.reserve
+    monkeypatch.setattr(LLMClient, "reserve", lambda self, *args: reservations.append(1) or reserve(self, *args))
+
+    output = "".join(query_engine.stream_query_index("When do deploys run?"))
+    assert output.endswith("Nightly.")
+    assert len(reservations) == 1
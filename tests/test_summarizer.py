@@ -0,0 +1,50 @@
+from knowledge.ingestion.federated_loader import discover_and_chunk_docs, hash_content
+from knowledge.ingestion.summarizer import summarize_chunks
+
+GENERATED_DOC = """---
+path: packages/app/config.py
+hash: 1234abcd
+type: code
+---
+# config.py
+
+Intro paragraph.
+
+## Loading
+
+How configuration is loaded.
+
+## Defaults
+
+Which defaults apply.
+"""
+
+
+class CountingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return f"summary {len(self.prompts)}"
+
+
+def test_frontmatter_does_not_replace_chunk_fields(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "config.md").write_text(GENERATED_DOC)
+    docs = discover_and_chunk_docs(str(tmp_path))
+    assert len(docs) == 3
+    assert [d["hash"] for d in docs] == [hash_content(d["content"]) for d in docs]
+    assert all(d["path"].endswith(f"#chunk-{i}") and d["type"] == "code" for i, d in enumerate(docs))
+
+
+def test_summaries_are_cached_per_chunk_content(tmp_path):
+    # Chunks sharing a (source file) hash must still get their own summaries
+    docs = [{"hash": "same", "content": f"chunk {i} " * 10} for i in range(3)]
+    llm = CountingLLM()
+    summarize_chunks(docs, cache_path=tmp_path / "cache.json", min_chars=10, llm=llm)
+    assert [d["summary"] for d in docs] == ["summary 1", "summary 2", "summary 3"]
+
+    again = [{"hash": "other", "content": d["content"]} for d in docs]
+    summarize_chunks(again, cache_path=tmp_path / "cache.json", min_chars=10, llm=llm)
+    assert len(llm.prompts) == 3 and [d["summary"] for d in again] == [d["summary"] for d in docs]
@@ -0,0 +1,45 @@
+import types
+
+import pytest
+from knowledge.llm.rate_limiter import RateLimiter
+from knowledge.llm.tokens import TokenEstimator, count_tokens, usage_tokens
+
+
+def test_code_costs_more_tokens_per_character_than_prose():
+    prose = "The generator writes one document for every source file it finds. " * 10
+    code = "def getUserById(user_id: int) -> Dict[str, Any]:\n    return self._cache[user_id]\n" * 10
+    assert len(prose) / count_tokens(prose) > 1.5 * len(code) / count_tokens(code)
+
+
+def test_estimator_converges_on_reported_usage(tmp_path):
+    estimator = TokenEstimator("test-model", tmp_path / "tokens.json")
+    prompt = "Summarize this module and its public functions. " * 20
+    local = count_tokens(prompt)
+    for _ in range(40):
+        estimator.observe(prompt, prompt_tokens=round(local * 1.3), output_tokens=200, max_output_tokens=256)
+
+    actual = round(local * 1.3) + 200
+    assert estimator.estimate_request(prompt, 256) == pytest.approx(actual, rel=0.02)
+    # Output lengths are learned per output limit
+    assert estimator.estimate_output(8192) == 512
+
+    # The calibration survives into a new process
+    assert TokenEstimator("test-model", tmp_path / "tokens.json").input_ratio == pytest.approx(1.3, rel=0.02)
+
+
+def test_usage_tokens_counts_thinking_as_output():
+    usage = types.SimpleNamespace(prompt_token_count=120, candidates_token_count=30, thoughts_token_count=50)
+    assert usage_tokens(types.SimpleNamespace(usage_metadata=usage)) == (120, 80)
+    assert usage_tokens(types.SimpleNamespace(usage_metadata=None)) is None
+
+
+def test_adjust_refunds_and_books_debt(monkeypatch):
+    monkeypatch.setattr("knowledge.llm.rate_limiter.time.time", lambda: 1000.0)
+    limiter = RateLimiter(rpm=10, tpm=1000)
+    reserved_at = limiter.acquire(600)
+    limiter.adjust(-400, reserved_at)  # the request used 200 tokens
+    assert limiter.headroom()["tpm"] == 800.0
+    limiter.adjust(1000, reserved_at)  # a response far above its reservation
+    assert limiter.headroom()["tpm"] == -200.0
+    limiter.adjust(-5000, reserved_at)  # refunds never go below zero
+    assert limiter.headroom()["tpm"] == 1000.0
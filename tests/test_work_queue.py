@@ -0,0 +1,56 @@
+import time
+
+from knowledge.generation.work_queue import WorkQueue
+from knowledge.utils import journal_mode
+
+
+def test_claims_are_exclusive_and_expired_leases_are_reclaimed(tmp_path, monkeypatch):
+    queue = WorkQueue(tmp_path / "queue.sqlite")
+    assert queue.enqueue(["a.py", "b.py", "c.py"]) == 3
+
+    assert queue.claim("w1", lease_seconds=60, limit=2) == ["a.py", "b.py"]
+    assert queue.claim("w2", lease_seconds=60, limit=2) == ["c.py"]
+    assert queue.claim("w2", lease_seconds=60) == []
+
+    # w1 stops renewing; once its lease runs out w2 takes its files over
+    now = time.time()
+    monkeypatch.setattr("knowledge.generation.work_queue.time.time", lambda: now + 120)
+    assert queue.renew("w2", ["c.py"], lease_seconds=600) == ["c.py"]
+    assert queue.claim("w2", lease_seconds=60, limit=5) == ["a.py", "b.py"]
+    assert queue.renew("w1", ["a.py"], lease_seconds=60) == []
+    assert not queue.complete("w1", "a.py")
+    assert queue.complete("w2", "a.py")
+
+
+def test_failures_are_retried_then_marked_failed(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite")
+    queue.enqueue(["a.py"])
+    assert queue.claim("w1", 60) == ["a.py"]
+    assert queue.fail("w1", "a.py", "boom", max_attempts=2) == "pending"
+    assert queue.claim("w1", 60) == ["a.py"]
+    assert queue.fail("w1", "a.py", "boom", max_attempts=2) == "failed"
+    assert queue.counts()["failed"] == 1
+
+    # Re-enqueueing resets finished items but leaves live leases alone
+    queue.enqueue(["b.py"])
+    queue.claim("w1", 60)
+    assert queue.enqueue(["a.py", "b.py"]) == 1
+    assert queue.counts() == {"pending": 1, "leased": 1, "done": 0, "failed": 0}
+
+
+def test_network_filesystems_use_the_rollback_journal(tmp_path, monkeypatch):
+    mounts = tmp_path / "mounts"
+    mounts.write_text(
+        "/dev/sda1 / ext4 rw 0 0\n"
+        "server:/export /mnt/shared nfs4 rw 0 0\n"
+        "/dev/sdb1 /mnt/shared/local ext4 rw 0 0\n"
+    )
+    assert journal_mode("/mnt/shared/repo/config/queue.sqlite", str(mounts)) == "DELETE"
+    assert journal_mode("/mnt/shared/local/queue.sqlite", str(mounts)) == "WAL"
+    assert journal_mode("/home/queue.sqlite", str(mounts)) == "WAL"
+
+    monkeypatch.setenv("GLASSOPS_SQLITE_JOURNAL", "delete")
+    queue = WorkQueue(tmp_path / "queue.sqlite")
+    assert queue.journal_mode == "DELETE"
+    assert queue.conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert queue.enqueue(["a.py"]) == 1 and queue.claim("w1", lease_seconds=60) == ["a.py"]
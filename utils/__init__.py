@@ -3,8 +3,13 @@
 
 from .file_hash import hash_file
 from .batch import batch_items
+from .file_lock import FileLock
+from .sqlite_journal import configure_journal, journal_mode
 
 __all__ = [
     "hash_file",
-    "batch_items"
+    "batch_items",
+    "FileLock",
+    "configure_journal",
+    "journal_mode"
 ]
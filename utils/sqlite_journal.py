@@ -0,0 +1,57 @@
+# sqlite-journal.py
+# Journal mode for SQLite databases that several processes (possibly on several hosts) open.
+#
+# WAL keeps readers and the writer out of each other's way, but its index lives in
+# shared memory, which only works between processes of one host. On a network
+# filesystem, databases use the rollback journal (DELETE), whose locking goes
+# through the file system itself. GLASSOPS_SQLITE_JOURNAL=wal|delete overrides the
+# detection; set it to delete on every host when a database on a volume is local
+# to one of them (that host would otherwise pick WAL).
+
+import os
+
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smbfs", "smb3", "9p", "afs", "ceph", "glusterfs",
+    "lustre", "gpfs", "beegfs", "fuse.sshfs", "fuse.glusterfs", "fuse.cephfs",
+}
+
+
+def filesystem_type(path, mounts_path="/proc/mounts"):
+    """returns: type of the filesystem holding `path` (longest matching mount point), or None if unknown"""
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open(mounts_path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                # Mount points escape spaces as \040
+                mount_point = fields[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) >= len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:  # not Linux
+        return None
+    return fstype
+
+
+def journal_mode(path, mounts_path="/proc/mounts"):
+    """returns: "WAL" for a database on a local disk, "DELETE" on a network filesystem"""
+    override = os.getenv("GLASSOPS_SQLITE_JOURNAL", "").strip().upper()
+    if override in ("WAL", "DELETE"):
+        return override
+    directory = os.path.dirname(os.path.abspath(path))
+    return "DELETE" if filesystem_type(directory, mounts_path) in NETWORK_FILESYSTEMS else "WAL"
+
+
+def configure_journal(conn, path):
+    """
+    Set the journal mode for `path` on a fresh connection.
+    returns: the journal mode in effect
+    """
+    mode = journal_mode(path)
+    conn.execute(f"PRAGMA journal_mode={mode}")
+    # WAL stays durable across crashes with NORMAL; the rollback journal needs FULL
+    conn.execute(f"PRAGMA synchronous={'NORMAL' if mode == 'WAL' else 'FULL'}")
+    return mode